@@ -41,6 +41,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la request completa (Server-Timing)
+    'core.instrumentation.MongoStatsMiddleware',
+    # Lee cada versión de caché una sola vez por request
+    'core.versions.VersionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     #'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +85,10 @@ DATABASES = {
     }
 }
 
+# Las pruebas corren contra MONGO_TEST_HOST (un mongod real, el de CI); sin
+# esa variable, contra el MongoDB en memoria de testing/fake_mongo
+TEST_RUNNER = 'testing.runner.MongoTestRunner'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -124,6 +132,91 @@ STATICFILES_DIRS = [
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
+# Paginación por cursor de los listados
+KEYSET_PAGE_SIZE = 25
+KEYSET_MAX_PAGE_SIZE = 200
+
+# Caché en memoria de niveles y ciclos (segundos). La versión que invalida
+# ese caché vive en el caché 'versions' (ver core/versions.py).
+REFERENCE_CACHE_TTL = 300
+
+# Versiones que invalidan los cachés de referencia y de fragmentos. Tienen
+# que ser compartidas por todos los workers: 'file' (misma máquina) o
+# 'redis' (VERSION_CACHE_URL, requiere el paquete redis). 'locmem' solo
+# sirve con un único proceso y en producción lo rechaza el system check.
+VERSION_CACHE_BACKEND = os.getenv('VERSION_CACHE_BACKEND', 'file')
+
+_VERSION_CACHES = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('VERSION_CACHE_DIR', str(BASE_DIR / 'cache' / 'versiones')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('VERSION_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versiones',
+    },
+}
+
+# Contenido del caché de fragmentos de plantilla (ver core/fragment_cache.py):
+# 'locmem' (por proceso) o 'file' (compartido entre workers de la misma
+# máquina). Las versiones que lo invalidan van siempre en 'versions'.
+FRAGMENT_CACHE_BACKEND = os.getenv('FRAGMENT_CACHE_BACKEND', 'locmem')
+FRAGMENT_CACHE_TIMEOUT = 3600
+
+_FRAGMENT_CACHES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragmentos',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('FRAGMENT_CACHE_DIR', str(BASE_DIR / 'cache' / 'fragmentos')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'fragments': _FRAGMENT_CACHES[FRAGMENT_CACHE_BACKEND],
+    'versions': _VERSION_CACHES[VERSION_CACHE_BACKEND],
+}
+
+# Bytes de las respuestas de Mongo en Server-Timing y en el log. Vuelve a
+# codificar cada respuesta a BSON, así que solo para medir (ver
+# core/instrumentation.py).
+MONGO_STATS_BYTES = os.getenv('MONGO_STATS_BYTES', '') == '1'
+
+# Resumen de percentiles por URL en /_stats/requests/ (desactivado por defecto)
+REQUEST_STATS_ENDPOINT = os.getenv('REQUEST_STATS_ENDPOINT', '') == '1'
+
+# Una línea JSON por request con el costo en MongoDB (logger core.requests).
+# Desactivado por defecto: con REQUEST_LOG=1 se registra en INFO.
+REQUEST_LOG = os.getenv('REQUEST_LOG', '') == '1'
+
+# Detector de consultas N+1 (ver core/nplusone.py). En modo estricto la
+# request falla en vez de solo registrar el aviso.
+NPLUSONE_DETECTOR = DEBUG
+NPLUSONE_STRICT = os.getenv('NPLUSONE_STRICT', '') == '1'
+NPLUSONE_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.requests': {'handlers': ['console'], 'level': 'INFO' if REQUEST_LOG else 'WARNING', 'propagate': False},
+        'core.nplusone': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
 
 DEFAULT_AUTO_FIELD = 'django_mongodb_backend.fields.ObjectIdAutoField'
\ No newline at end of file
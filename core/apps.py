@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Conecta las señales que invalidan el caché de niveles y ciclos, las
+        # que versionan los fragmentos de plantilla y las que refrescan grupo_stats
+        from . import fragment_cache, group_stats, reference_cache  # noqa: F401
+
+        # Antes de que se cree el cliente de Mongo
+        from . import instrumentation
+        instrumentation.register()
@@ -0,0 +1,287 @@
+import datetime
+import json
+import resource
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from . import fragment_cache, urls
+from .forms import AsistenciaGrupoForm, CalificacionGrupoForm
+from .instrumentation import percentile
+from .list_rows import roster_rows
+from .models import Catequizando, Grupo, Inscripcion
+
+
+# ==========================================
+# BENCHMARK DE VISTAS (EXTREMO A EXTREMO)
+# ==========================================
+# Recorre las URLs de core/urls.py con el cliente de pruebas de Django
+# (middleware, vista y plantilla completos) contra la base configurada, y
+# mide por vista: latencia (p50/p95/p99), comandos de Mongo, documentos y
+# bytes (vía response.mongo_stats de MongoStatsMiddleware), pico de heap de
+# Python (tracemalloc, en una pasada aparte) y pico de RSS del proceso.
+# Por defecto se mide sin caché de fragmentos: el camino de consultas es lo
+# que vigilan los presupuestos (--fragments on/both mide también aciertos).
+#
+# Los POST escriben de verdad (marcas de asistencia, notas): benchmark_views
+# solo los corre sobre las bases sintéticas de --sizes, o contra la base
+# actual con --allow-writes.
+
+# Máximo de comandos de Mongo por request. Las exportaciones no tienen tope
+# (hacen un getMore por lote, crecen con la colección).
+QUERY_BUDGETS = {
+    "catequizando_listar": 2,
+    "catequizando_buscar": 2,
+    "catequizando_detalle": 3,
+    "catequizando_editar": 2,
+    "catequizando_crear": 1,
+    "catequizando_importar": 1,
+    "grupo_listar": 2,
+    "grupo_buscar": 3,
+    "grupo_detail": 4,
+    "grupo_editar": 2,
+    "grupo_crear": 1,
+    "grupo_add_sesion": 2,
+    "grupo_asistencia": 6,
+    "grupo_calificaciones": 5,
+    "inscripcion_listar": 3,
+    "inscripcion_buscar": 3,
+    "inscripcion_crear": 3,
+    "inscripcion_detail": 4,
+    "inscripcion_editar": 2,
+    "inscripcion_asistencia": 3,
+    "inscripcion_nota": 3,
+    "ciclo_listar": 1,
+    "ciclo_crear": 1,
+    "ciclo_detalle": 2,
+    "ciclo_estadisticas": 3,  # + refresh y relectura si hay grupos pendientes
+    "ciclo_editar": 2,
+}
+
+# Rutas que no se miden: destructivas o de diagnóstico
+EXCLUDED = {
+    "catequizando_eliminar", "grupo_eliminar", "inscripcion_eliminar", "ciclo_eliminar", "request_stats",
+}
+
+
+class Case:
+    def __init__(self, url_name, label=None, method="GET", kwargs=None, query=None, data=None):
+        self.url_name = url_name
+        self.label = label or (url_name if method == "GET" else f"{url_name} POST")
+        self.method = method
+        self.kwargs = kwargs or {}
+        self.query = query or {}
+        self.data = data  # dict o callable() -> dict
+
+    @property
+    def url(self):
+        return reverse(self.url_name, kwargs=self.kwargs)
+
+    def request(self, client):
+        if self.method == "POST":
+            data = self.data() if callable(self.data) else self.data
+            return client.post(self.url, data or {})
+        return client.get(self.url, self.query)
+
+
+def _sample(model, projection, criteria=None):
+    return connection.get_collection(model._meta.db_table).find_one(criteria or {}, projection) or {}
+
+
+def build_cases():
+    """Casos para cada URL de core/urls.py, con ids tomados de la propia base."""
+    inscripcion = _sample(Inscripcion, {"catequizando_id": 1, "grupo_id": 1})
+    catequizando_id = inscripcion.get("catequizando_id") or _sample(Catequizando, {"_id": 1}).get("_id", "")
+    grupo_id = inscripcion.get("grupo_id") or _sample(Grupo, {"_id": 1}).get("_id", "")
+    grupo = _sample(Grupo, {"ciclo_id": 1, "nivel_id": 1, "nombre_grupo": 1, "catequistas": 1,
+                            "sesiones": {"$slice": 1}}, {"_id": grupo_id})
+    catequizando = _sample(Catequizando, {"primer_apellido": 1, "cedula": 1}, {"_id": catequizando_id})
+    sesion_id = (grupo.get("sesiones") or [{}])[0].get("sesion_id", 1)
+    ciclo_id = grupo.get("ciclo_id", "")
+    apellido = (catequizando.get("primer_apellido") or "a")[:3]
+    catequista = ((grupo.get("catequistas") or [{}])[0].get("nombre") or "a").split()[0]
+    inscripcion_kwargs = {"catequizando_id": catequizando_id, "grupo_id": grupo_id}
+
+    def asistencia_grupo():
+        roster = roster_rows(grupo_id, sesion_id)
+        return {AsistenciaGrupoForm.field_name(row["catequizando_id"]): "PRESENTE" for row in roster}
+
+    def calificaciones_grupo():
+        roster = roster_rows(grupo_id)
+        data = {"descripcion": "Benchmark", "valor": ""}
+        data.update({CalificacionGrupoForm.field_name(row["catequizando_id"]): "8.5" for row in roster})
+        return data
+
+    return [
+        Case("catequizando_listar"),
+        Case("catequizando_buscar", "catequizando_buscar apellido", query={"apellido": apellido}),
+        Case("catequizando_buscar", "catequizando_buscar cedula", query={"cedula": catequizando_id[:6]}),
+        Case("catequizando_detalle", kwargs={"pk": catequizando_id}),
+        Case("catequizando_editar", kwargs={"pk": catequizando_id}),
+        Case("catequizando_crear"),
+        Case("catequizando_importar"),
+        Case("catequizando_exportar"),
+        Case("grupo_listar"),
+        Case("grupo_buscar", "grupo_buscar nombre", query={"nombre": (grupo.get("nombre_grupo") or "a")[:4]}),
+        Case("grupo_buscar", "grupo_buscar nivel", query={"nivel_id": grupo.get("nivel_id", "")}),
+        Case("grupo_buscar", "grupo_buscar catequista", query={"catequista": catequista}),
+        Case("grupo_detail", kwargs={"pk": grupo_id}),
+        Case("grupo_editar", kwargs={"pk": grupo_id}),
+        Case("grupo_crear"),
+        Case("grupo_add_sesion", kwargs={"pk": grupo_id}),
+        Case("grupo_asistencia", kwargs={"pk": grupo_id, "sesion_id": sesion_id}),
+        Case("grupo_asistencia", method="POST", kwargs={"pk": grupo_id, "sesion_id": sesion_id},
+             data=asistencia_grupo),
+        Case("grupo_calificaciones", kwargs={"pk": grupo_id}),
+        Case("grupo_calificaciones", method="POST", kwargs={"pk": grupo_id}, data=calificaciones_grupo),
+        Case("inscripcion_listar"),
+        Case("inscripcion_buscar", "inscripcion_buscar grupo", query={"grupo_id": grupo_id}),
+        # Prefijo selectivo (filtro $in) y prefijo corto, que en las bases
+        # grandes supera CEDULA_IDS_LIMIT (filtro sobre las filas ordenadas)
+        Case("inscripcion_buscar", "inscripcion_buscar cedula", query={"cedula": catequizando_id[:8]}),
+        Case("inscripcion_buscar", "inscripcion_buscar cedula corta", query={"cedula": catequizando_id[:2]}),
+        Case("inscripcion_buscar", "inscripcion_buscar pendientes", query={"estado_pago": "PENDIENTE"}),
+        Case("inscripcion_exportar", query={"grupo_id": grupo_id}),
+        Case("inscripcion_crear"),
+        Case("inscripcion_detail", kwargs=inscripcion_kwargs),
+        Case("inscripcion_editar", kwargs=inscripcion_kwargs),
+        Case("inscripcion_asistencia", kwargs=inscripcion_kwargs),
+        Case("inscripcion_asistencia", method="POST", kwargs=inscripcion_kwargs,
+             data={"sesion_id": sesion_id, "estado": "PRESENTE"}),
+        Case("inscripcion_nota", kwargs=inscripcion_kwargs),
+        Case("inscripcion_nota", method="POST", kwargs=inscripcion_kwargs,
+             data={"descripcion": "Benchmark", "valor": "9"}),
+        Case("ciclo_listar"),
+        Case("ciclo_crear"),
+        Case("ciclo_detalle", kwargs={"pk": ciclo_id}),
+        Case("ciclo_estadisticas", kwargs={"pk": ciclo_id}),
+        Case("ciclo_editar", kwargs={"pk": ciclo_id}),
+    ]
+
+
+def uncovered(cases):
+    names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+    return sorted(names - EXCLUDED - {case.url_name for case in cases})
+
+
+def _consume(response):
+    # Las exportaciones son streaming: el costo está en leer el cuerpo
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _stats(response):
+    stats = getattr(response, "mongo_stats", None)
+    return (stats.commands, stats.documents, stats.bytes or 0) if stats else (0, 0, 0)
+
+
+def run_case(client, case, iterations, max_seconds):
+    # Una request de calentamiento (cachés de referencia, plantillas)
+    warm = case.request(client)
+    _consume(warm)
+
+    latencies, commands, documents, sizes, statuses = [], [], [], [], set()
+    started = time.monotonic()
+    while len(latencies) < iterations:
+        t0 = time.perf_counter()
+        response = case.request(client)
+        body = _consume(response)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        n_commands, n_documents, n_bytes = _stats(response)
+        commands.append(n_commands)
+        documents.append(n_documents)
+        sizes.append(n_bytes)
+        statuses.add(response.status_code)
+        if time.monotonic() - started > max_seconds:
+            break
+
+    # Memoria en una pasada aparte: tracemalloc distorsiona la latencia
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    _consume(case.request(client))
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    budget = QUERY_BUDGETS.get(case.url_name)
+    return {
+        "url_name": case.url_name,
+        "method": case.method,
+        "samples": len(latencies),
+        "status": sorted(statuses),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+        },
+        "commands": {"p50": percentile(commands, 50), "max": max(commands)},
+        "documents": {"p50": percentile(documents, 50), "max": max(documents)},
+        "bytes": {"p50": percentile(sizes, 50), "max": max(sizes)},
+        "response_bytes": body,
+        "py_heap_peak_kb": heap_peak // 1024,
+        "rss_peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "query_budget": budget,
+        "over_budget": budget is not None and max(commands) > budget,
+    }
+
+
+def _without_fragments():
+    # La request de calentamiento llenaría el caché de fragmentos y todas las
+    # iteraciones medirían un acierto en vez de las consultas de la vista
+    return {**settings.CACHES, fragment_cache.CACHE_ALIAS: {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def run(cases, iterations=20, max_seconds=10.0, fragments=False, log=print):
+    """Con fragments=False las plantillas no usan el caché de fragmentos."""
+    client = Client(SERVER_NAME="localhost")
+    results = {}
+    # Los bytes de Mongo solo se miden a pedido (ver instrumentation.py)
+    overrides = {"MONGO_STATS_BYTES": True}
+    if not fragments:
+        overrides["CACHES"] = _without_fragments()
+    for case in cases:
+        with override_settings(**overrides):
+            result = run_case(client, case, iterations, max_seconds)
+        results[case.label] = result
+        flag = "  SOBRE PRESUPUESTO" if result["over_budget"] else ""
+        log(
+            f"  {case.label:<38} p50={result['latency_ms']['p50']:>8.1f}ms "
+            f"p95={result['latency_ms']['p95']:>8.1f}ms cmds={result['commands']['max']:>3} "
+            f"status={result['status']}{flag}"
+        )
+    return results
+
+
+def report(results_by_size, **meta):
+    return {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        **meta,
+        "sizes": results_by_size,
+    }
+
+
+def compare(old, new, threshold=0.2):
+    """Líneas con las vistas cuya p95 o cantidad de comandos empeoró más de `threshold`."""
+    lines = []
+    for size, cases in new.get("sizes", {}).items():
+        previous = old.get("sizes", {}).get(size, {})
+        for label, result in cases.items():
+            before = previous.get(label)
+            if not before:
+                continue
+            p95_old, p95_new = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+            if p95_old and (p95_new - p95_old) / p95_old > threshold:
+                lines.append(f"{size} {label}: p95 {p95_old:.1f}ms -> {p95_new:.1f}ms")
+            if result["commands"]["max"] > before["commands"]["max"]:
+                lines.append(f"{size} {label}: comandos {before['commands']['max']} -> {result['commands']['max']}")
+    return lines
+
+
+def dump(data, path):
+    with open(path, "w", encoding="utf-8") as fileobj:
+        json.dump(data, fileobj, indent=2, sort_keys=True)
@@ -0,0 +1,86 @@
+import hashlib
+
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import Catequizando, Ciclo, Grupo, Inscripcion
+
+
+# ==========================================
+# GET CONDICIONAL EN LAS VISTAS DE DETALLE
+# ==========================================
+# Antes de cargar y renderizar el documento se consulta solo su updated_at
+# (y el de los documentos que la página también muestra) con una
+# proyección. Con eso se arman el ETag y el Last-Modified; si el navegador
+# ya tiene esa versión (If-None-Match / If-Modified-Since) se responde 304
+# sin más consultas. Cache-Control: no-cache obliga al navegador a
+# revalidar siempre en vez de reutilizar la página por heurística.
+#
+# Cada función de revisiones devuelve la lista de updated_at de los que
+# depende la página, o None si el documento no existe (la vista responde
+# 404 como siempre).
+
+def catequizando_revisiones(pk):
+    row = Catequizando.objects.filter(pk=pk).values_list("updated_at").first()
+    return list(row) if row else None
+
+
+def ciclo_revisiones(pk):
+    row = Ciclo.objects.filter(pk=pk).values_list("updated_at").first()
+    return list(row) if row else None
+
+
+def grupo_revisiones(pk):
+    # Un solo aggregate: los updated_at del nivel y del ciclo vienen por
+    # $lookup. El caché de referencia es por proceso y podría tener una
+    # copia vieja, lo que dejaría un ETag sin cambiar tras una edición.
+    row = (
+        Grupo.objects.filter(pk=pk)
+        .values_list("updated_at", "nivel__updated_at", "ciclo__updated_at")
+        .first()
+    )
+    return list(row) if row else None
+
+
+def inscripcion_revisiones(catequizando_id, grupo_id):
+    # Un solo aggregate: los updated_at del catequizando y del grupo vienen por $lookup
+    row = (
+        Inscripcion.objects.filter(catequizando_id=catequizando_id, grupo_id=grupo_id)
+        .values_list("updated_at", "catequizando__updated_at", "grupo__updated_at")
+        .first()
+    )
+    return list(row) if row else None
+
+
+def validators(revisiones):
+    """(etag, last_modified) o (None, None) si falta alguna revisión."""
+    if not revisiones or any(revision is None for revision in revisiones):
+        return None, None
+    etag = hashlib.md5("|".join(revision.isoformat() for revision in revisiones).encode()).hexdigest()
+    return etag, max(revisiones)
+
+
+def detail_condition(revisiones):
+    """
+    Decorador para el get() de una vista de detalle (con method_decorator).
+    `revisiones` recibe los kwargs de la URL; se consulta una sola vez por
+    request aunque condition() pida el ETag y el Last-Modified por separado.
+    """
+
+    def cached(request, **kwargs):
+        if not hasattr(request, "_validators"):
+            request._validators = validators(revisiones(**kwargs))
+        return request._validators
+
+    def etag(request, *args, **kwargs):
+        return cached(request, **kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return cached(request, **kwargs)[1]
+
+    def decorator(view):
+        return cache_control(private=True, no_cache=True)(
+            condition(etag_func=etag, last_modified_func=last_modified)(view)
+        )
+
+    return decorator
@@ -0,0 +1,36 @@
+from bson import ObjectId
+from django.utils import timezone
+
+from .search import catequista_keys, catequizando_keys_from_doc
+
+
+# ==========================================
+# TRANSFORMACIONES PARA run_migration
+# ==========================================
+# Cada función recibe el documento crudo de Mongo y devuelve los campos a
+# actualizar ($set) o None si el documento ya está bien.
+# Uso: python manage.py run_migration catequizandos core.data_migrations.claves_catequizando
+#      python manage.py run_migration inscripciones core.data_migrations.updated_at
+
+def claves_catequizando(doc):
+    claves = catequizando_keys_from_doc(doc)
+    if claves != doc.get("claves_busqueda"):
+        return {"claves_busqueda": claves}
+    return None
+
+
+def claves_grupo(doc):
+    claves = catequista_keys(doc.get("catequistas"))
+    if claves != doc.get("catequistas_busqueda"):
+        return {"catequistas_busqueda": claves}
+    return None
+
+
+def updated_at(doc):
+    # Documentos anteriores a UpdatedAtModel: con _id ObjectId se usa su fecha
+    # de creación; si no, la hora de la migración.
+    if doc.get("updated_at") is not None:
+        return None
+    if isinstance(doc["_id"], ObjectId):
+        return {"updated_at": doc["_id"].generation_time}
+    return {"updated_at": timezone.now()}
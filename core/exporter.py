@@ -0,0 +1,135 @@
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from .list_rows import inscripcion_pipeline
+from .models import Catequizando, Inscripcion
+
+
+# ==========================================
+# EXPORTACIÓN EN STREAMING (CSV / NDJSON)
+# ==========================================
+# Se recorre un cursor de Mongo en lotes y cada documento se aplana y se
+# escribe en cuanto llega: la memoria del worker no depende del tamaño de
+# la colección. Las columnas se fijan de antemano (el CSV necesita la
+# cabecera) como rutas con puntos dentro del documento.
+
+EXPORT_BATCH_SIZE = 500
+
+CATEQUIZANDO_COLUMNS = (
+    "id", "cedula", "primer_nombre", "segundo_nombre", "primer_apellido", "segundo_apellido",
+    "genero", "fecha_nacimiento", "lugar_nacimiento", "numero_hijo", "numero_hermanos",
+    "telefono_casa", "direccion",
+    "padre.nombres", "padre.apellidos", "padre.telefono", "padre.ocupacion",
+    "madre.nombres", "madre.apellidos", "madre.telefono", "madre.ocupacion",
+    "representante_legal.es_uno_de_los_padres", "representante_legal.nombres",
+    "representante_legal.apellidos", "representante_legal.telefono", "representante_legal.correo",
+    "informacion_salud.tipo_sangre", "informacion_salud.contacto_emergencia",
+    "informacion_salud.alergias", "informacion_salud.aspectos_a_considerar",
+    "fe_bautismo.fecha", "fe_bautismo.parroquia", "fe_bautismo.ciudad", "fe_bautismo.tomo",
+    "fe_bautismo.pagina", "fe_bautismo.sacerdote", "fe_bautismo.padrino", "fe_bautismo.madrina",
+    "sacramentos_realizados",
+    "escolaridad.escuela_colegio", "escolaridad.anio_en_curso",
+    "observaciones_generales",
+)
+
+INSCRIPCION_COLUMNS = (
+    "catequizando_id", "cedula", "primer_nombre", "primer_apellido",
+    "grupo_id", "nombre_grupo", "nivel_nombre",
+    "fecha_inscripcion", "estado_inscripcion", "estado_pago",
+    "asistencias_presente", "asistencias_falta", "asistencias_justificada", "porcentaje_asistencia",
+    "notas_cantidad", "promedio_notas",
+)
+
+# Campos que no se exportan (solo existen para el buscador)
+_CATEQUIZANDO_EXCLUDED = {"claves_busqueda": 0}
+
+
+def _value(value):
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, list):
+        # Listas de escalares (alergias, sacramentos) en una sola celda
+        return "; ".join(str(item) for item in value if item not in (None, ""))
+    return value
+
+
+def _resolve(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return _value(value)
+
+
+def flatten(doc, columns):
+    return {column: _resolve(doc, column) for column in columns}
+
+
+def _with_parents(doc):
+    # padres es un array [{relacion: PADRE|MADRE, ...}]; se exporta como
+    # columnas padre.* y madre.*
+    doc["id"] = doc.pop("_id", None)
+    for padre in doc.get("padres") or []:
+        relacion = (padre.get("relacion") or "").lower()
+        if relacion in ("padre", "madre"):
+            doc.setdefault(relacion, padre)
+    return doc
+
+
+def catequizando_export_rows():
+    collection = connection.get_collection(Catequizando._meta.db_table)
+    cursor = collection.find({}, _CATEQUIZANDO_EXCLUDED, batch_size=EXPORT_BATCH_SIZE).sort("_id", 1)
+    for doc in cursor:
+        yield flatten(_with_parents(doc), CATEQUIZANDO_COLUMNS)
+
+
+def inscripcion_export_rows(cedula=None, grupo_id=None, estado_pago=None):
+    pipeline = inscripcion_pipeline(
+        cedula=cedula, grupo_id=grupo_id, estado_pago=estado_pago,
+        extra_fields=(
+            "fecha_inscripcion", "asistencias_presente", "asistencias_falta",
+            "asistencias_justificada", "notas_cantidad",
+        ),
+    )
+    collection = connection.get_collection(Inscripcion._meta.db_table)
+    for doc in collection.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE):
+        yield flatten(doc, INSCRIPCION_COLUMNS)
+
+
+# ------------------------------------------
+# Serializadores: generan texto línea a línea
+# ------------------------------------------
+
+class _Echo:
+    # Pseudo-archivo: csv.writer devuelve la línea en vez de guardarla
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(columns)  # BOM para que Excel detecte UTF-8
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson"),
+}
+
+
+def export_lines(rows, columns, formato):
+    if formato == "ndjson":
+        return ndjson_lines(rows)
+    return csv_lines(rows, columns)
@@ -1,5 +1,9 @@
+import copy
+
 from django import forms
 from .models import Catequizando, Nivel, Ciclo, Grupo, Inscripcion
+from .reference_cache import niveles, ciclos
+from .search import catequizando_keys_from_doc
 
 ESTADO_GENERAL = [
     ('ABIERTO', 'Abierto'),
@@ -67,6 +71,45 @@ OPCIONES_GENERO = [
     ('F', 'Femenino')
 ]
 
+class ReferenceChoiceIterator(forms.models.ModelChoiceIterator):
+    # Igual de perezoso que ModelChoiceIterator, pero lee del caché
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.reference.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.reference.all()) + (self.field.empty_label is not None)
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField cuyas opciones y validación salen del caché de referencia."""
+    iterator = ReferenceChoiceIterator
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        super().__init__(queryset=reference.model.objects.none(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        obj = self.reference.get(str(value))
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+        return obj
+
+
+class GrupoChoiceField(forms.ModelChoiceField):
+    # str(grupo) consulta su ciclo; resolvemos el nombre desde el caché
+    def label_from_instance(self, obj):
+        return f"{obj.nombre_grupo} - {ciclos.get(obj.ciclo_id) or ''}"
+
+
 class CatequizandoUpdateMiniForm(forms.Form):
     telefono = forms.CharField(
         min_length=10,
@@ -366,18 +409,141 @@ class CatequizandoSPForm(forms.Form):
     def clean_telefonomadre(self):
         return self._validate_digits(self.cleaned_data.get('telefonomadre'), "El teléfono de la madre")
 
+    # -----------------------
+    # Construcción del documento
+    # -----------------------
+    def build_catequizando(self):
+        """
+        Catequizando (sin guardar) con los subdocumentos padres,
+        representante_legal, fe_bautismo, informacion_salud y escolaridad
+        armados a partir de cleaned_data. Lo usan el alta y la importación.
+        """
+        data = self.cleaned_data
+
+        padres = []
+        if data.get('nombrespadre'):
+            padre = {
+                "relacion": "PADRE",
+                "nombres": data.get('nombrespadre', '').strip(),
+                "apellidos": data.get('apellidospadre', '').strip(),
+                "telefono": data.get('telefonopadre', ''),
+                "ocupacion": data.get('ocupacionpadre', '')
+            }
+            padres.append(padre)
+        
+        if data.get('nombresmadre'):
+            madre = {
+                "relacion": "MADRE",
+                "nombres": data.get('nombresmadre', '').strip(),
+                "apellidos": data.get('apellidosmadre', '').strip(),
+                "telefono": data.get('telefonomadre', ''),
+                "ocupacion": data.get('ocupacionmadre', '')
+            }
+            padres.append(madre)
+
+        rep_legal = {}
+        if padres:
+            p = padres[0] 
+            rep_legal = {
+                "es_uno_de_los_padres": True,
+                "nombres": p['nombres'],
+                "apellidos": p['apellidos'],
+                "telefono": p['telefono'],
+                "correo": data.get('correopadre') if p['relacion'] == 'PADRE' else data.get('correomadre', '')
+            }
+        else:
+             rep_legal = {
+                "es_uno_de_los_padres": False,
+                "nombres": "Desconocido",
+                "apellidos": "Desconocido",
+                "telefono": "",
+                "correo": ""
+             }
+
+        fe_bautismo = {
+            "fecha": str(data.get('fechabautismo')) if data.get('fechabautismo') else None,
+            "parroquia": data.get('parroquiabautismoid', ''),
+            "ciudad": data.get('ciudadbautismo', ''), 
+            "tomo": data.get('numerotomo'),
+            "pagina": data.get('paginatomo'),
+            "sacerdote": data.get('sacerdotebautismo', ''),
+            "padrino": data.get('padrinobautismo', ''),
+            "madrina": data.get('madrinabautismo', '')
+        }
+
+        info_salud = {
+            "tipo_sangre": data.get('tiposangre'),
+            "contacto_emergencia": data.get('contacto_emergencia', ''),
+            "alergias": [data.get('alergia')] if data.get('alergia') else [],
+            "aspectos_a_considerar": ""
+        }
+
+        escolaridad = {
+            "escuela_colegio": data.get('escuelacolegio', ''),
+            "anio_en_curso": data.get('anioencurso')
+        }
+
+        return Catequizando(
+            id=data['cedula'], 
+            cedula=data['cedula'],
+            primer_nombre=data['primernombre'],
+            segundo_nombre=data['segundonombre'],
+            primer_apellido=data['primerapellido'],
+            segundo_apellido=data['segundoapellido'],
+            genero=data['genero'],
+            fecha_nacimiento=data['fechanacimiento'],
+            lugar_nacimiento=data['lugar_nacimiento'],
+            numero_hijo=data['numerohijo'],
+            numero_hermanos=data['numerohermanos'],
+            telefono_casa=data['telefono'],
+            direccion=data['direccion'],
+            
+            padres=padres,
+            representante_legal=rep_legal,
+            informacion_salud=info_salud,
+            fe_bautismo=fe_bautismo,
+            escolaridad=escolaridad,
+            observaciones_generales=data['comentario'],
+            claves_busqueda=catequizando_keys_from_doc({
+                "cedula": data['cedula'],
+                "primer_nombre": data['primernombre'],
+                "segundo_nombre": data['segundonombre'],
+                "primer_apellido": data['primerapellido'],
+                "segundo_apellido": data['segundoapellido'],
+            })
+        )
+
+class ImportarCatequizandosForm(forms.Form):
+    # La vista valida las filas dentro de la request, sin pool de procesos:
+    # los archivos grandes van por `manage.py import_catequizandos`
+    MAX_BYTES = 5 * 1024 * 1024
+
+    archivo = forms.FileField(
+        label="Archivo (.csv o .xlsx)",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if archivo.size > self.MAX_BYTES:
+            raise forms.ValidationError(
+                f"El archivo supera {self.MAX_BYTES // (1024 * 1024)} MB; "
+                "impórtelo con el comando import_catequizandos."
+            )
+        return archivo
+
 # ==========================================
 # 4. Formularios para GRUPOS
 # ==========================================
 
 class GrupoForm(forms.Form):
-    nivelcatequesis = forms.ModelChoiceField(
-        queryset=Nivel.objects.all(),
+    nivelcatequesis = ReferenceChoiceField(
+        niveles,
         label="Nivel",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
-    ciclo = forms.ModelChoiceField(
-        queryset=Ciclo.objects.all().order_by('-fecha_inicio'),
+    ciclo = ReferenceChoiceField(
+        ciclos,
         label="Ciclo",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
@@ -425,8 +591,8 @@ class InscripcionCreateForm(forms.Form):
         label="Catequizando",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
-    grupo = forms.ModelChoiceField(
-        queryset=Grupo.objects.filter(estado='ACTIVO'), # Changed to 'ACTIVO' matching model
+    grupo = GrupoChoiceField(
+        queryset=Grupo.objects.filter(estado='ACTIVO').only('id', 'nombre_grupo', 'ciclo_id'), # Changed to 'ACTIVO' matching model
         label="Grupo",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
@@ -474,6 +640,34 @@ class AsistenciaForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
+class AsistenciaGrupoForm(forms.Form):
+    """Una marca de asistencia por catequizando inscrito en el grupo."""
+
+    def __init__(self, *args, roster, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.roster = roster
+        for row in roster:
+            self.fields[self.field_name(row["catequizando_id"])] = forms.ChoiceField(
+                choices=ESTADO_ASISTENCIA,
+                initial=row.get("estado") or 'PRESENTE',
+                label=f"{row['primer_apellido']} {row['primer_nombre']}",
+                widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+            )
+
+    @staticmethod
+    def field_name(catequizando_id):
+        return f"estado_{catequizando_id}"
+
+    def rows(self):
+        # (fila del roster, campo del formulario) para la plantilla
+        return [(row, self[self.field_name(row["catequizando_id"])]) for row in self.roster]
+
+    def marcas(self):
+        return {
+            row["catequizando_id"]: self.cleaned_data[self.field_name(row["catequizando_id"])]
+            for row in self.roster
+        }
+
 class CalificacionForm(forms.Form):
     descripcion = forms.CharField(
         label="Descripción",
@@ -487,6 +681,38 @@ class CalificacionForm(forms.Form):
         widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.1'})
     )
 
+class CalificacionGrupoForm(CalificacionForm):
+    """
+    Una misma evaluación (descripcion) con una nota por catequizando.
+    Cada nota reutiliza el campo 'valor' de CalificacionForm (0 a 10); si se
+    deja en blanco no se registra nota para ese catequizando.
+    """
+
+    def __init__(self, *args, roster, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.roster = roster
+        del self.fields['valor']
+        for row in roster:
+            field = copy.deepcopy(CalificacionForm.base_fields['valor'])
+            field.required = False
+            field.label = f"{row['primer_apellido']} {row['primer_nombre']}"
+            self.fields[self.field_name(row["catequizando_id"])] = field
+
+    @staticmethod
+    def field_name(catequizando_id):
+        return f"valor_{catequizando_id}"
+
+    def rows(self):
+        return [(row, self[self.field_name(row["catequizando_id"])]) for row in self.roster]
+
+    def notas(self):
+        notas = {}
+        for row in self.roster:
+            valor = self.cleaned_data.get(self.field_name(row["catequizando_id"]))
+            if valor is not None:
+                notas[row["catequizando_id"]] = valor
+        return notas
+
 class SesionForm(forms.Form):
     sesion_id = forms.IntegerField(
         label="Número de Sesión",
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from . import versions as shared_versions
+from .models import Catequizando, Ciclo, Grupo, Inscripcion, Nivel
+
+
+# ==========================================
+# CACHÉ DE FRAGMENTOS VERSIONADO
+# ==========================================
+# Los listados y las páginas de detalle envuelven su contenido en
+# {% cache fragmento.ttl "nombre" fragmento.key using="fragments" %}. La
+# clave lleva la versión de cada "ámbito" del que depende el fragmento:
+# una colección completa ("catequizandos") o un documento
+# ("catequizandos:1700000001"). Escribir en la base publica una versión
+# nueva de esos ámbitos y los fragmentos viejos simplemente dejan de
+# usarse (vencen solos con el TTL).
+#
+# Las versiones viven en el caché compartido de core/versions.py, así que
+# una escritura en un worker invalida los fragmentos de todos. El contenido
+# de los fragmentos puede seguir siendo por proceso (FRAGMENT_CACHE_BACKEND):
+# como la clave lleva las versiones, un worker nunca sirve uno viejo.
+#
+# Las vistas pasan los datos de forma perezosa (SimpleLazyObject), así que
+# cuando el fragmento está en caché no se consulta la base ni se renderiza.
+#
+# save()/delete() actualizan la versión por señales; las escrituras que no
+# las disparan (update(), bulk_write, operaciones sobre arreglos,
+# bulk_create) llaman a bump()/bump_rows() explícitamente. Las cargas
+# masivas (generate_data, cambio de base en benchmark_views) usan
+# invalidate_all(): todas las claves llevan además el ámbito GLOBAL_SCOPE.
+
+CACHE_ALIAS = "fragments"
+GLOBAL_SCOPE = "*"
+
+
+def ttl():
+    return getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 3600)
+
+
+def collection(model):
+    return model._meta.db_table
+
+
+def row(model, *ids):
+    # Las inscripciones se identifican en las URLs por (catequizando, grupo)
+    return ":".join([model._meta.db_table, *map(str, ids)])
+
+
+def instance_row(instance):
+    if isinstance(instance, Inscripcion):
+        return row(Inscripcion, instance.catequizando_id, instance.grupo_id)
+    return row(type(instance), instance.pk)
+
+
+def _version_key(scope):
+    return f"fragver:{scope}"
+
+
+def versions(*scopes):
+    """{ámbito: versión}, leídas una vez por request del caché compartido."""
+    found = shared_versions.get_many(*(_version_key(scope) for scope in scopes))
+    return {scope: found[_version_key(scope)] for scope in scopes}
+
+
+def context(*scopes):
+    """Variable 'fragmento' de las plantillas: clave con las versiones y TTL."""
+    key = ";".join(f"{scope}={version}" for scope, version in versions(GLOBAL_SCOPE, *scopes).items())
+    return {"key": key, "ttl": ttl()}
+
+
+def bump(*scopes):
+    shared_versions.bump(*(_version_key(scope) for scope in scopes))
+
+
+def invalidate_all():
+    """Invalida todos los fragmentos, de colecciones y de documentos."""
+    bump(GLOBAL_SCOPE)
+    caches[CACHE_ALIAS].clear()
+
+
+def bump_rows(model, *rows):
+    """Nueva versión de la colección y de cada documento (filas = tuplas de ids)."""
+    bump(collection(model), *(row(model, *ids) for ids in rows))
+
+
+def _bump_on_write(sender, instance, **kwargs):
+    bump(collection(sender), instance_row(instance))
+
+
+for _model in (Catequizando, Ciclo, Grupo, Inscripcion, Nivel):
+    post_save.connect(_bump_on_write, sender=_model, dispatch_uid=f"fragments_save_{_model.__name__}")
+    post_delete.connect(_bump_on_write, sender=_model, dispatch_uid=f"fragments_delete_{_model.__name__}")
@@ -0,0 +1,161 @@
+from django.db.models.signals import post_delete, post_save
+
+from .models import Grupo, GrupoStats, Inscripcion
+
+
+# ==========================================
+# ESTADÍSTICAS MATERIALIZADAS POR GRUPO
+# ==========================================
+# grupo_stats guarda, por grupo, los conteos de inscripciones por estado y
+# pago y los totales de asistencia y notas (sumando los resúmenes que cada
+# inscripción ya mantiene). Un único aggregate sobre grupos lo calcula: un
+# $lookup indexado por grupo_id con un $group dentro, y $merge al final.
+# El tablero lee la colección con una sola consulta.
+#
+# Recalcular un grupo (refresh) cuesta un aggregate que recorre todas sus
+# inscripciones y reemplaza la fila con $merge. Hacerlo en cada escritura
+# de inscripciones repetiría ese costo por cada nota o marca de asistencia
+# (y por cada envío de las hojas del grupo), aunque nadie mire el tablero.
+# Por eso una escritura de inscripciones solo marca la fila como pendiente
+# (mark_stale: un update de un campo) y ciclo_rows recalcula, en un único
+# aggregate, las filas pendientes del ciclo al leerlas: muchas escrituras
+# seguidas sobre un grupo se pagan con un solo refresh.
+#
+# Las escrituras de grupos (pocas; cambian nombre, estado o crean la fila)
+# siguen recalculando en el momento. Una marca que llegue mientras corre el
+# refresh de ese grupo puede perderse; rebuild_grupo_stats lo corrige.
+
+def _count_if(field, value):
+    return {"$sum": {"$cond": [{"$eq": [f"${field}", value]}, 1, 0]}}
+
+
+_ESTADOS = {
+    "cursando": Inscripcion.EstadoInscripcion.CURSANDO,
+    "aprobados": Inscripcion.EstadoInscripcion.APROBADO,
+    "reprobados": Inscripcion.EstadoInscripcion.REPROBADO,
+    "retirados": Inscripcion.EstadoInscripcion.RETIRADO,
+}
+
+_TOTALES = {
+    "inscritos": {"$sum": 1},
+    "pagados": _count_if("estado_pago", Inscripcion.EstadoPago.PAGADO),
+    "pendientes": _count_if("estado_pago", Inscripcion.EstadoPago.PENDIENTE),
+    **{name: _count_if("estado_inscripcion", estado) for name, estado in _ESTADOS.items()},
+    "asistencias_presente": {"$sum": "$asistencias_presente"},
+    "asistencias_total": {"$sum": {"$add": [
+        {"$ifNull": ["$asistencias_presente", 0]},
+        {"$ifNull": ["$asistencias_falta", 0]},
+        {"$ifNull": ["$asistencias_justificada", 0]},
+    ]}},
+    "notas_suma": {"$sum": "$notas_suma"},
+    "notas_cantidad": {"$sum": "$notas_cantidad"},
+}
+
+
+def stats_pipeline(grupo_ids=None):
+    pipeline = []
+    if grupo_ids is not None:
+        pipeline.append({"$match": {"_id": {"$in": list(grupo_ids)}}})
+    pipeline += [
+        {"$lookup": {
+            "from": Inscripcion._meta.db_table,
+            "localField": "_id",
+            "foreignField": "grupo_id",
+            "pipeline": [{"$group": {"_id": None, **_TOTALES}}],
+            "as": "totales",
+        }},
+        {"$set": {"totales": {"$ifNull": [{"$first": "$totales"}, {}]}}},
+        {"$project": {
+            "ciclo_id": 1,
+            "nivel_id": 1,
+            "nombre_grupo": 1,
+            "estado": 1,
+            # Grupos sin inscripciones quedan en cero
+            **{name: {"$ifNull": [f"$totales.{name}", 0]} for name in _TOTALES},
+        }},
+        {"$set": {
+            "porcentaje_asistencia": {"$cond": [
+                {"$gt": ["$asistencias_total", 0]},
+                {"$round": [{"$multiply": [{"$divide": ["$asistencias_presente", "$asistencias_total"]}, 100]}, 1]},
+                None,
+            ]},
+            "promedio_notas": {"$cond": [
+                {"$gt": ["$notas_cantidad", 0]},
+                {"$round": [{"$divide": ["$notas_suma", "$notas_cantidad"]}, 2]},
+                None,
+            ]},
+            "actualizado": "$$NOW",
+            "pendiente": False,
+        }},
+        {"$merge": {"into": GrupoStats._meta.db_table, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    return pipeline
+
+
+def rebuild():
+    """Recalcula grupo_stats completo y borra las filas de grupos que ya no existen."""
+    grupos = Grupo.get_collection()
+    list(grupos.aggregate(stats_pipeline()))
+    return GrupoStats.objects.exclude(pk__in=grupos.distinct("_id")).delete()
+
+
+def refresh(*grupo_ids):
+    grupo_ids = [grupo_id for grupo_id in grupo_ids if grupo_id]
+    if grupo_ids:
+        list(Grupo.get_collection().aggregate(stats_pipeline(grupo_ids)))
+
+
+def mark_stale(*grupo_ids):
+    """Marca las filas para recalcularlas en la próxima lectura del tablero."""
+    grupo_ids = [grupo_id for grupo_id in grupo_ids if grupo_id]
+    if grupo_ids:
+        GrupoStats.objects.filter(pk__in=grupo_ids).update(pendiente=True)
+
+
+def _ciclo_rows(ciclo_id):
+    return list(GrupoStats.objects.filter(ciclo_id=ciclo_id).order_by("nombre_grupo").values())
+
+
+def ciclo_rows(ciclo_id):
+    # Sin pendientes, una consulta; con pendientes, el refresh y una relectura
+    rows = _ciclo_rows(ciclo_id)
+    stale = [row["id"] for row in rows if row["pendiente"]]
+    if stale:
+        refresh(*stale)
+        rows = _ciclo_rows(ciclo_id)
+    return rows
+
+
+def totals(rows):
+    # Totales del ciclo a partir de las filas ya leídas (sin otra consulta)
+    total = {name: sum(row[name] for row in rows) for name in _TOTALES}
+    total["porcentaje_asistencia"] = (
+        round(total["asistencias_presente"] * 100 / total["asistencias_total"], 1)
+        if total["asistencias_total"] else None
+    )
+    total["promedio_notas"] = (
+        round(total["notas_suma"] / total["notas_cantidad"], 2) if total["notas_cantidad"] else None
+    )
+    return total
+
+
+# save()/delete() disparan las señales; las vistas que escriben con
+# queryset.update() o con los métodos de EmbeddedArrayMixin llaman a
+# mark_stale() (inscripciones) o refresh() (grupos) explícitamente.
+
+def _mark_inscripcion(sender, instance, **kwargs):
+    mark_stale(instance.grupo_id)
+
+
+def _refresh_grupo(sender, instance, **kwargs):
+    refresh(instance.pk)
+
+
+def _delete_grupo(sender, instance, **kwargs):
+    GrupoStats.objects.filter(pk=instance.pk).delete()
+
+
+post_save.connect(_mark_inscripcion, sender=Inscripcion, dispatch_uid="grupo_stats_inscripcion_save")
+post_delete.connect(_mark_inscripcion, sender=Inscripcion, dispatch_uid="grupo_stats_inscripcion_delete")
+post_save.connect(_refresh_grupo, sender=Grupo, dispatch_uid="grupo_stats_grupo_save")
+post_delete.connect(_delete_grupo, sender=Grupo, dispatch_uid="grupo_stats_grupo_delete")
@@ -0,0 +1,195 @@
+import csv
+import datetime
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import connection
+from pymongo.errors import BulkWriteError
+
+from . import fragment_cache
+from .forms import CatequizandoSPForm
+from .models import Catequizando
+
+
+# ==========================================
+# IMPORTACIÓN MASIVA DE CATEQUIZANDOS
+# ==========================================
+# Las columnas de la hoja son los nombres de campo de CatequizandoSPForm
+# (cedula, primernombre, primerapellido, fechanacimiento, ...). Cada fila se
+# valida con ese mismo formulario y se arma con build_catequizando(), igual
+# que en el alta manual. Las filas válidas se insertan en lotes (insert_many
+# con ordered=False); una cédula ya registrada es un error de esa fila.
+
+BATCH_SIZE = 1000
+VALIDATION_CHUNK_SIZE = 200
+VALIDATION_CHUNKS_PER_WORKER = 2
+
+DUPLICATE_KEY = 11000
+
+
+class ImportResult:
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.errors = []  # [(numero_de_fila, {campo: [mensajes]})]
+
+    def add_error(self, row_number, errors):
+        self.errors.append((row_number, errors))
+
+
+def _cell(value):
+    # openpyxl entrega fechas y números; el formulario espera texto
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_csv(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    for row in csv.DictReader(text):
+        yield {key.strip(): _cell(value) for key, value in row.items() if key}
+
+
+def read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ValueError("Para importar archivos .xlsx se necesita el paquete 'openpyxl'.") from exc
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_cell(name) for name in next(rows, ())]
+        for values in rows:
+            if not any(value not in (None, "") for value in values):
+                continue
+            yield {key: _cell(value) for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def read_rows(fileobj, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        return read_csv(fileobj)
+    if extension in (".xlsx", ".xlsm"):
+        return read_xlsx(fileobj)
+    raise ValueError(f"Formato no soportado: '{extension}'. Use .csv o .xlsx.")
+
+
+def validate_row(item):
+    """(numero_de_fila, fila) -> (numero_de_fila, cleaned_data | None, errores | None)"""
+    row_number, row = item
+    form = CatequizandoSPForm(data=row)
+    if form.is_valid():
+        return row_number, form.cleaned_data, None
+    errors = {field: [str(message) for message in messages] for field, messages in form.errors.items()}
+    return row_number, None, errors
+
+
+def validate_chunk(items):
+    return [validate_row(item) for item in items]
+
+
+def _validated(rows, workers):
+    # La fila 1 es el encabezado
+    numbered = enumerate(rows, start=2)
+    if not workers or workers <= 1:
+        yield from map(validate_row, numbered)
+        return
+    # pool.map consumiría todo el archivo para encolar las tareas: se envían
+    # lotes de VALIDATION_CHUNK_SIZE filas, con a lo sumo
+    # VALIDATION_CHUNKS_PER_WORKER por proceso en vuelo, y los resultados
+    # salen en el orden del archivo.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            while len(pending) < workers * VALIDATION_CHUNKS_PER_WORKER:
+                chunk = list(islice(numbered, VALIDATION_CHUNK_SIZE))
+                if not chunk:
+                    break
+                pending.append(pool.submit(validate_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def _document(obj):
+    # El mismo documento que escribiría bulk_create (auto_now incluido)
+    return {
+        field.column: field.get_db_prep_save(field.pre_save(obj, True), connection)
+        for field in obj._meta.concrete_fields
+    }
+
+
+def _flush(batch, result):
+    # Sin consultar antes qué cédulas existen: entre esa lectura y el insert
+    # otra importación o un alta manual podría registrar la misma cédula. Se
+    # inserta con ordered=False y decide el índice único de _id; cada fila
+    # rechazada vuelve como un writeError con su posición en el lote.
+    collection = connection.get_collection(Catequizando._meta.db_table)
+    try:
+        collection.insert_many([_document(obj) for _, obj in batch], ordered=False)
+        inserted, write_errors = len(batch), []
+    except BulkWriteError as exc:
+        if exc.details.get("writeConcernErrors"):
+            raise
+        inserted, write_errors = exc.details["nInserted"], exc.details["writeErrors"]
+    if inserted:
+        # El insert crudo no dispara señales
+        fragment_cache.bump_rows(Catequizando)
+        result.created += inserted
+    for error in write_errors:
+        row_number, obj = batch[error["index"]]
+        if error["code"] == DUPLICATE_KEY:
+            result.add_error(row_number, {"cedula": [f"Ya existe un catequizando con cédula {obj.pk}."]})
+        else:
+            result.add_error(row_number, {NON_FIELD_ERRORS: [error["errmsg"]]})
+
+
+def import_catequizandos(rows, workers=None, batch_size=BATCH_SIZE):
+    result = ImportResult()
+    seen = set()
+    batch = []
+    for row_number, data, errors in _validated(rows, workers):
+        result.total += 1
+        if errors:
+            result.add_error(row_number, errors)
+            continue
+        form = CatequizandoSPForm()
+        form.cleaned_data = data
+        obj = form.build_catequizando()
+        if obj.pk in seen:
+            result.add_error(row_number, {"cedula": [f"Cédula {obj.pk} repetida en el archivo."]})
+            continue
+        seen.add(obj.pk)
+        batch.append((row_number, obj))
+        if len(batch) >= batch_size:
+            _flush(batch, result)
+            batch = []
+    if batch:
+        _flush(batch, result)
+    result.errors.sort(key=lambda error: error[0])
+    return result
+
+
+def write_error_report(result, fileobj):
+    writer = csv.writer(fileobj)
+    writer.writerow(["fila", "campo", "error"])
+    for row_number, errors in result.errors:
+        for field, messages in errors.items():
+            for message in messages:
+                writer.writerow([row_number, field, message])
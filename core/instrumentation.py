@@ -0,0 +1,192 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+import bson
+from django.conf import settings
+from pymongo import monitoring
+
+from . import nplusone
+
+
+# ==========================================
+# INSTRUMENTACIÓN DE MONGODB POR REQUEST
+# ==========================================
+# Un CommandListener de pymongo (registrado en CoreConfig.ready, antes de
+# que se cree el cliente) acumula en la request en curso: comandos, tiempo
+# de base de datos, documentos devueltos y, con MONGO_STATS_BYTES, bytes de
+# las respuestas. El middleware lo publica en la cabecera Server-Timing y,
+# con REQUEST_LOG=1, en una línea de log JSON; además guarda muestras por
+# nombre de URL para el resumen de percentiles.
+#
+# Los bytes se miden volviendo a codificar cada respuesta a BSON (pymongo no
+# expone el tamaño recibido): cuesta tanto como la propia decodificación,
+# así que solo se activa para medir (benchmark_views lo enciende).
+#
+# En StreamingHttpResponse solo se cuenta lo ejecutado antes de enviar las
+# cabeceras (el cursor se sigue leyendo después).
+
+logger = logging.getLogger("core.requests")
+
+_current = contextvars.ContextVar("mongo_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("commands", "failed", "db_micros", "documents", "bytes", "nplusone")
+
+    def __init__(self, nplusone_tracker=None, count_bytes=False):
+        self.nplusone = nplusone_tracker
+        self.commands = 0
+        self.failed = 0
+        self.db_micros = 0
+        self.documents = 0
+        # None: no se midieron
+        self.bytes = 0 if count_bytes else None
+
+    @property
+    def db_ms(self):
+        return self.db_micros / 1000
+
+
+def _documents(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        return len(batch) if batch is not None else 0
+    # distinct devuelve "values"; los writes, "n"
+    if "values" in reply:
+        return len(reply["values"])
+    return reply.get("n", 0) if isinstance(reply.get("n"), int) else 0
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None and stats.nplusone is not None:
+            stats.nplusone.observe(event.command_name, event.command)
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.commands += 1
+        stats.db_micros += event.duration_micros
+        reply = event.reply
+        stats.documents += _documents(reply)
+        if stats.bytes is not None:
+            stats.bytes += len(bson.encode(reply))
+
+    def failed(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.commands += 1
+        stats.failed += 1
+        stats.db_micros += event.duration_micros
+
+
+_listener = CommandStatsListener()
+
+
+def register():
+    monitoring.register(_listener)
+
+
+# ------------------------------------------
+# Muestras por URL para el resumen (en memoria, por proceso)
+# ------------------------------------------
+
+SAMPLES_PER_URL = 1000
+
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_URL))
+_samples_lock = threading.Lock()
+
+
+def record(url_name, total_ms, stats):
+    with _samples_lock:
+        _samples[url_name].append((total_ms, stats.db_ms, stats.commands, stats.documents, stats.bytes))
+
+
+def percentile(values, pct):
+    # Nearest-rank; las muestras sin medir (None) no cuentan
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summary(url_names):
+    """{url_name: {count, total_ms: {p50,p90,p99}, db_ms: {...}, ...}} para cada nombre."""
+    with _samples_lock:
+        snapshot = {name: list(_samples.get(name, ())) for name in url_names}
+    result = {}
+    for name, samples in snapshot.items():
+        columns = list(zip(*samples)) or [()] * 5
+        result[name] = {"count": len(samples)}
+        for label, values in zip(("total_ms", "db_ms", "commands", "documents", "bytes"), columns):
+            result[name][label] = {f"p{pct}": percentile(values, pct) for pct in (50, 90, 99)}
+    return result
+
+
+# ------------------------------------------
+# Middleware
+# ------------------------------------------
+
+class MongoStatsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats(nplusone.Tracker() if nplusone.enabled() else None, count_bytes=bytes_enabled())
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        # Disponible para el cliente de pruebas (benchmark_views, tests)
+        response.mongo_stats = stats
+
+        timings = [
+            f"total;dur={total_ms:.1f}",
+            f"db;dur={stats.db_ms:.1f};desc=\"{stats.commands} cmds\"",
+            f"db-docs;desc=\"{stats.documents}\"",
+        ]
+        if stats.bytes is not None:
+            timings.append(f"db-bytes;desc=\"{stats.bytes}\"")
+        response["Server-Timing"] = ", ".join(timings)
+
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match else None
+        if url_name:
+            record(url_name, total_ms, stats)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "url_name": url_name,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 1),
+                "db_ms": round(stats.db_ms, 1),
+                "db_commands": stats.commands,
+                "db_failed": stats.failed,
+                "db_documents": stats.documents,
+                "db_bytes": stats.bytes,
+            }))
+        if stats.nplusone is not None:
+            stats.nplusone.report(request)
+        return response
+
+
+def bytes_enabled():
+    return getattr(settings, "MONGO_STATS_BYTES", False)
+
+
+def endpoint_enabled():
+    return getattr(settings, "REQUEST_STATS_ENDPOINT", False)
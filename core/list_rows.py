@@ -0,0 +1,258 @@
+from django.db import connection
+from django.db.models.fields.json import KT
+
+from .models import Catequizando, Grupo, Inscripcion, Nivel
+from .pagination import keyset_paginate_pipeline
+from .reference_cache import ciclos, niveles
+from .search import APELLIDO_TAG, CEDULA_TAG, fold_words, prefix_patterns, rank_fields
+
+
+# ==========================================
+# FILAS LIGERAS PARA LOS LISTADOS
+# ==========================================
+# Los listados solo muestran unos pocos campos escalares. Proyectando con
+# values() evitamos traer (y decodificar en instancias de modelo) los JSON
+# grandes como padres, informacion_salud, sesiones o calificaciones.
+# Cada fila es un dict, accesible desde las plantillas con la misma sintaxis.
+
+CATEQUIZANDO_ROW_FIELDS = ("id", "cedula", "primer_nombre", "primer_apellido")
+
+GRUPO_ROW_FIELDS = ("pk", "nombre_grupo", "estado")
+
+INSCRIPCION_ROW_FIELDS = (
+    "catequizando_id", "grupo_id", "estado_inscripcion", "estado_pago",
+    "porcentaje_asistencia", "promedio_notas",
+)
+
+# Orden estable para la paginación por cursor: el _id desempata apellidos
+# (o nombres de grupo) iguales. Los índices cateq_apellido_id_idx y
+# grupo_nombre_id_idx cubren estos órdenes.
+CATEQUIZANDO_PAGE_KEYS = ("primer_apellido", "id")
+
+GRUPO_PAGE_KEYS = ("nombre_grupo", "pk")
+
+
+def catequizando_rows(queryset):
+    return queryset.values(
+        *CATEQUIZANDO_ROW_FIELDS,
+        anio_en_curso=KT("escolaridad__anio_en_curso"),
+    )
+
+
+def catequizando_search_terms(cedula=None, apellido=None):
+    terms = [CEDULA_TAG + word for word in fold_words(cedula)]
+    terms += [APELLIDO_TAG + word for word in fold_words(apellido)]
+    return terms
+
+
+def catequizando_search_filter(terms):
+    return {"claves_busqueda": {"$all": prefix_patterns(terms)}}
+
+
+# Orden del buscador (ver search.rank_fields); `id` desempata
+CATEQUIZANDO_SEARCH_KEYS = (("exactas", -1), ("inicia", -1), ("apellido_orden", 1), ("id", 1))
+
+
+def catequizando_search_pipeline(terms):
+    """
+    Búsqueda por prefijo, sin tildes ni mayúsculas, sobre el índice multikey
+    'claves_busqueda'. La relevancia se calcula en el servidor, así que
+    todos los resultados quedan ordenados y se pueden paginar por cursor
+    (pagination.keyset_paginate_pipeline con CATEQUIZANDO_SEARCH_KEYS).
+    """
+    return [
+        {"$match": catequizando_search_filter(terms)},
+        {"$project": {
+            "_id": 0,
+            "id": "$_id",
+            **{field: 1 for field in CATEQUIZANDO_ROW_FIELDS[1:]},
+            "anio_en_curso": "$escolaridad.anio_en_curso",
+            **rank_fields(terms),
+        }},
+    ]
+
+
+def grupo_rows(queryset):
+    return queryset.values(*GRUPO_ROW_FIELDS, "nivel_id", "ciclo_id")
+
+
+def with_reference_names(rows):
+    # Los nombres de nivel y ciclo salen del caché de referencia, sin $lookup;
+    # una sola lectura de cada copia para todas las filas
+    nivel_por_id, ciclo_por_id = niveles.snapshot(), ciclos.snapshot()
+    for row in rows:
+        nivel = niveles.get(row["nivel_id"], nivel_por_id)
+        ciclo = ciclos.get(row["ciclo_id"], ciclo_por_id)
+        row["nivel_nombre"] = nivel.nombre if nivel else ""
+        row["ciclo_nombre"] = ciclo.nombre if ciclo else ""
+    return rows
+
+
+def _lookup_one(collection, local_field, alias, project, pipeline=()):
+    # $lookup que trae del documento relacionado solo los campos proyectados.
+    # Si el relacionado no existe la fila se conserva con esas columnas en
+    # blanco: un $unwind simple la descartaría sin avisar.
+    return [
+        {"$lookup": {
+            "from": collection,
+            "localField": local_field,
+            "foreignField": "_id",
+            "pipeline": [*pipeline, {"$project": project}],
+            "as": alias,
+        }},
+        {"$unwind": {"path": f"${alias}", "preserveNullAndEmptyArrays": True}},
+    ]
+
+
+# Tope de la fase 1 de la búsqueda por cédula: un prefijo corto ("1", "17")
+# coincide con buena parte de la colección y el $in sería enorme
+CEDULA_IDS_LIMIT = 1000
+
+
+def catequizando_ids_por_cedula(cedula):
+    """
+    Fase 1 de la búsqueda por cédula: ids de catequizandos cuyo número
+    empieza por `cedula`, resuelto sobre el índice de claves_busqueda.
+    None si son más de CEDULA_IDS_LIMIT.
+    """
+    terms = catequizando_search_terms(cedula=cedula)
+    if not terms:
+        return []
+    collection = connection.get_collection(Catequizando._meta.db_table)
+    ids = [doc["_id"] for doc in collection.aggregate([
+        {"$match": catequizando_search_filter(terms)},
+        {"$project": {"_id": 1}},
+        {"$limit": CEDULA_IDS_LIMIT + 1},
+    ], batchSize=CEDULA_IDS_LIMIT + 1)]
+    return ids if len(ids) <= CEDULA_IDS_LIMIT else None
+
+
+def _cedula_scan(cedula):
+    # Prefijo con demasiados catequizandos para el $in: cada inscripción, ya
+    # en el orden del listado, se cruza con su catequizando. Si el prefijo es
+    # tan frecuente, la página se completa tras pocas filas.
+    terms = catequizando_search_terms(cedula=cedula)
+    return [
+        {"$lookup": {
+            "from": Catequizando._meta.db_table,
+            "localField": "catequizando_id",
+            "foreignField": "_id",
+            "pipeline": [{"$match": catequizando_search_filter(terms)}, {"$project": {"_id": 1}}],
+            "as": "_cedula",
+        }},
+        {"$match": {"_cedula": {"$ne": []}}},
+        {"$unset": "_cedula"},
+    ]
+
+
+# Orden de los listados de inscripciones: el índice único
+# (catequizando_id, grupo_id) resuelve el orden sin ordenar en memoria
+INSCRIPCION_PAGE_KEYS = (("catequizando_id", 1), ("grupo_id", 1))
+
+
+def inscripcion_filters(cedula=None, grupo_id=None, estado_pago=None):
+    """
+    Filtros de los listados de inscripciones como (match, scan): stages que
+    van antes del orden y stages que se evalúan sobre las filas ordenadas
+    (ver pagination.keyset_pipeline). El filtro por cédula no hace
+    join+regex sobre todas las inscripciones: primero resuelve los
+    catequizandos por índice y luego filtra inscripciones por
+    catequizando_id con $in, también indexado. Solo si el prefijo coincide
+    con más de CEDULA_IDS_LIMIT catequizandos pasa a `scan`.
+    """
+    match, scan = {}, []
+    if cedula:
+        ids = catequizando_ids_por_cedula(cedula)
+        if ids is None:
+            scan = _cedula_scan(cedula)
+        else:
+            match["catequizando_id"] = {"$in": ids}
+    if grupo_id:
+        match["grupo_id"] = grupo_id
+    if estado_pago:
+        match["estado_pago"] = estado_pago
+    return ([{"$match": match}] if match else []), scan
+
+
+def inscripcion_join(extra_fields=()):
+    """
+    Stages que agregan catequizando, grupo y nivel a cada inscripción: el
+    join se resuelve en el servidor, de modo que una página cuesta un solo
+    comando sin importar cuántas filas muestre.
+    """
+    pipeline = _lookup_one(
+        Catequizando._meta.db_table, "catequizando_id", "catequizando",
+        {"cedula": 1, "primer_nombre": 1, "primer_apellido": 1},
+    )
+    pipeline += _lookup_one(
+        Grupo._meta.db_table, "grupo_id", "grupo",
+        {"nombre_grupo": 1, "nivel_nombre": "$nivel.nombre"},
+        pipeline=_lookup_one(Nivel._meta.db_table, "nivel_id", "nivel", {"nombre": 1}),
+    )
+    pipeline.append({"$project": {
+        "_id": 0,
+        **{field: 1 for field in (*INSCRIPCION_ROW_FIELDS, *extra_fields)},
+        "primer_nombre": "$catequizando.primer_nombre",
+        "primer_apellido": "$catequizando.primer_apellido",
+        "cedula": "$catequizando.cedula",
+        "nombre_grupo": "$grupo.nombre_grupo",
+        "nivel_nombre": "$grupo.nivel_nombre",
+    }})
+    return pipeline
+
+
+def inscripcion_pipeline(cedula=None, grupo_id=None, estado_pago=None, extra_fields=()):
+    """Todas las filas que cumplen el filtro, sin paginar (exportación)."""
+    match, scan = inscripcion_filters(cedula, grupo_id, estado_pago)
+    return match + scan + inscripcion_join(extra_fields)
+
+
+def inscripcion_page(request, cedula=None, grupo_id=None, estado_pago=None):
+    """
+    Una página del listado de inscripciones (KeysetPage): filtro, orden y
+    $limit primero y el join solo sobre las filas de la página.
+    """
+    match, scan = inscripcion_filters(cedula, grupo_id, estado_pago)
+    return keyset_paginate_pipeline(
+        connection.get_collection(Inscripcion._meta.db_table),
+        match, request, INSCRIPCION_PAGE_KEYS, tail=inscripcion_join(), scan=scan,
+    )
+
+
+def roster_rows(grupo_id, sesion_id=None):
+    """
+    Catequizandos inscritos en el grupo (un aggregate), con la marca que
+    tengan registrada para `sesion_id` si se indica.
+    """
+    project = {
+        "_id": 0,
+        "inscripcion_id": "$_id",
+        "catequizando_id": 1,
+        "primer_nombre": "$catequizando.primer_nombre",
+        "primer_apellido": "$catequizando.primer_apellido",
+        "cedula": "$catequizando.cedula",
+    }
+    if sesion_id is not None:
+        project["estado"] = {"$getField": {"field": "estado", "input": {"$arrayElemAt": [
+            {"$filter": {
+                "input": {"$ifNull": ["$registro_asistencia", []]},
+                "cond": {"$eq": ["$$this.sesion_id", sesion_id]},
+            }},
+            -1,
+        ]}}}
+    pipeline = [{"$match": {"grupo_id": grupo_id}}]
+    pipeline += _lookup_one(
+        Catequizando._meta.db_table, "catequizando_id", "catequizando",
+        {"cedula": 1, "primer_nombre": 1, "primer_apellido": 1},
+    )
+    pipeline += [
+        {"$project": project},
+        {"$sort": {"primer_apellido": 1, "primer_nombre": 1}},
+    ]
+    collection = connection.get_collection(Inscripcion._meta.db_table)
+    return list(collection.aggregate(pipeline))
+
+
+def choice_rows(queryset, label_field):
+    # Opciones de los <select> de filtros: solo pk y etiqueta
+    return queryset.values("pk", label_field)
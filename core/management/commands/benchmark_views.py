@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import subprocess
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark, fragment_cache, reference_cache
+from core.models import Catequizando
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cada vista de core/urls.py (latencia p50/p95/p99, comandos de Mongo, bytes, memoria) "
+        "con el cliente de pruebas, opcionalmente sobre bases sintéticas de varios tamaños, y escribe un reporte JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", help="Tamaños separados por comas, p. ej. 1000,10000,100000. "
+                                            "Cada uno usa su propia base <prefijo>_<tamaño>.")
+        parser.add_argument("--database-prefix", default="catequesis_bench")
+        parser.add_argument("--reseed", action="store_true", help="Regenera los datos aunque ya existan.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos para generate_data.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--max-seconds", type=float, default=10.0, help="Tope de tiempo por vista.")
+        parser.add_argument("--only", help="Solo los casos cuyo nombre contenga este texto.")
+        parser.add_argument("--output", "-o", default="benchmark.json")
+        parser.add_argument("--compare", help="Reporte anterior contra el cual comparar.")
+        parser.add_argument("--fail-on-budget", action="store_true",
+                            help="Termina con error si alguna vista supera su presupuesto de comandos.")
+        parser.add_argument("--fragments", choices=("off", "on", "both"), default="off",
+                            help="Caché de fragmentos durante la medición: off mide el camino de consultas "
+                                 "(el que cubren los presupuestos), on mide aciertos, both reporta ambos.")
+        parser.add_argument("--allow-writes", action="store_true",
+                            help="Sin --sizes, mide también los casos POST (escriben en la base actual).")
+
+    def handle(self, *args, **options):
+        results = {}
+        # Los casos POST escriben de verdad: solo corren sobre las bases
+        # sintéticas de --sizes o si se piden explícitamente.
+        self.writes = bool(options["sizes"] or options["allow_writes"])
+        if options["sizes"]:
+            for size in [int(value) for value in options["sizes"].split(",")]:
+                self.use_database(f"{options['database_prefix']}_{size}")
+                self.seed(size, options)
+                results.update(self.run(str(size), options))
+        else:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"base actual: {connection.settings_dict['NAME']}"))
+            if not self.writes:
+                self.stdout.write(self.style.WARNING("  sin --sizes ni --allow-writes: se omiten los casos POST"))
+            results.update(self.run("actual", options))
+
+        data = benchmark.report(results, git_commit=self.git_commit(), iterations=options["iterations"])
+        benchmark.dump(data, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Reporte escrito en {options['output']}"))
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fileobj:
+                regressions = benchmark.compare(json.load(fileobj), data)
+            for line in regressions:
+                self.stdout.write(self.style.WARNING(f"  regresión: {line}"))
+
+        over = [
+            f"{size} {label}" for size, cases in results.items()
+            for label, result in cases.items() if result["over_budget"]
+        ]
+        if over and options["fail_on_budget"]:
+            raise CommandError(f"Vistas sobre su presupuesto de comandos: {', '.join(over)}")
+
+    def use_database(self, name):
+        # Los procesos de generate_data leen el nombre de la variable de entorno
+        os.environ["MONGO_DB_NAME"] = name
+        connection.close_pool()
+        connection.settings_dict["NAME"] = name
+        # Los ids sintéticos se repiten en cada tamaño: sin esto se servirían
+        # niveles y fragmentos de la base anterior
+        reference_cache.niveles.invalidate()
+        reference_cache.ciclos.invalidate()
+        fragment_cache.invalidate_all()
+
+    def seed(self, size, options):
+        name = connection.settings_dict["NAME"]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({size} catequizandos)"))
+        current = Catequizando.objects.count()
+        if current == size and not options["reseed"]:
+            return
+        connection.connection.drop_database(name)
+        connection.close_pool()
+        call_command("sync_indexes", stdout=io.StringIO())
+        # generate_data invalida niveles, ciclos y fragmentos al terminar
+        call_command("generate_data", children=size, workers=options["workers"], stdout=self.stdout)
+
+    def run(self, size, options):
+        """{clave del reporte: resultados}; con --fragments both, dos claves."""
+        cases = benchmark.build_cases()
+        missing = benchmark.uncovered(cases)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"  sin caso: {', '.join(missing)}"))
+        if options["only"]:
+            cases = [case for case in cases if options["only"] in case.label]
+        if not self.writes:
+            cases = [case for case in cases if case.method != "POST"]
+        modes = {"off": (False,), "on": (True,), "both": (False, True)}[options["fragments"]]
+        results = {}
+        for fragments in modes:
+            key = f"{size} fragmentos" if fragments and len(modes) > 1 else size
+            if len(modes) > 1:
+                self.stdout.write(f"  fragmentos {'en caché' if fragments else 'desactivados'}:")
+            # Cada pasada parte sin fragmentos guardados
+            fragment_cache.invalidate_all()
+            results[key] = benchmark.run(
+                cases, options["iterations"], options["max_seconds"], fragments=fragments, log=self.stdout.write,
+            )
+        return results
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
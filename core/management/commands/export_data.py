@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.exporter import (
+    CATEQUIZANDO_COLUMNS,
+    FORMATS,
+    INSCRIPCION_COLUMNS,
+    catequizando_export_rows,
+    export_lines,
+    inscripcion_export_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Exporta catequizandos o inscripciones a CSV/NDJSON, en streaming desde un cursor de Mongo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("coleccion", choices=("catequizandos", "inscripciones"))
+        parser.add_argument("--format", dest="formato", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="Archivo de salida (por defecto, stdout).")
+        parser.add_argument("--grupo", help="Solo inscripciones de este grupo.")
+        parser.add_argument("--estado-pago", help="Solo inscripciones con este estado de pago.")
+
+    def handle(self, *args, **options):
+        if options["coleccion"] == "catequizandos":
+            rows, columns = catequizando_export_rows(), CATEQUIZANDO_COLUMNS
+        else:
+            rows = inscripcion_export_rows(grupo_id=options["grupo"], estado_pago=options["estado_pago"])
+            columns = INSCRIPCION_COLUMNS
+
+        output = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        count = 0
+        try:
+            for line in export_lines(rows, columns, options["formato"]):
+                output.write(line)
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if options["output"]:
+            if options["formato"] == "csv":
+                count -= 1  # cabecera
+            self.stderr.write(f"{count} filas escritas en {options['output']}.")
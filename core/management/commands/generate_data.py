@@ -0,0 +1,137 @@
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import BulkWriteError
+
+from core import fragment_cache, group_stats, reference_cache, synthetic
+from core.migration_runner import _init_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintético y determinista (niveles, ciclos, grupos, "
+        "catequizandos, inscripciones). Lo inserta en Mongo en paralelo y/o lo escribe como fixtures NDJSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--children", type=int, default=1000, help="Cantidad de catequizandos.")
+        parser.add_argument("--ciclos", type=int, default=2)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Catequizandos por tarea del pool.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Documentos por insert_many.")
+        parser.add_argument("--fixtures", help="Directorio donde escribir los fixtures NDJSON.")
+        parser.add_argument("--no-insert", action="store_true", help="Solo escribe fixtures.")
+        parser.add_argument("--load", metavar="DIR", help="Inserta los fixtures NDJSON de DIR en vez de generar.")
+        parser.add_argument("--flush", action="store_true",
+                            help="Borra antes los documentos de las colecciones que se van a poblar.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.workers = options["workers"]
+        do_insert = bool(options["load"]) or not options["no_insert"]
+        if options["no_insert"] and not options["fixtures"] and not options["load"]:
+            raise CommandError("--no-insert requiere --fixtures.")
+        if do_insert:
+            self.prepare(options["flush"])
+        start = time.monotonic()
+        try:
+            if options["load"]:
+                self.load(options["load"])
+            else:
+                self.generate(options)
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors") or [{"errmsg": str(exc)}]
+            raise CommandError(f"Error al insertar ({len(errors)} en el lote): {errors[0]['errmsg']}") from exc
+        finally:
+            if do_insert:
+                self.invalidate_caches()
+        if do_insert:
+            group_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Listo en {time.monotonic() - start:.1f}s."))
+
+    def prepare(self, flush):
+        # Los ids son deterministas: sobre una base poblada el insert chocaría
+        # con el índice único de _id a mitad de camino
+        if flush:
+            synthetic.flush()
+            return
+        populated = synthetic.populated()
+        if populated:
+            raise CommandError(
+                f"La base ya tiene datos en {', '.join(populated)}. Use --flush para reemplazarlos."
+            )
+
+    def invalidate_caches(self):
+        # Los insert crudos no disparan señales: los demás procesos dejarían
+        # de ver niveles/ciclos nuevos y servirían fragmentos viejos
+        reference_cache.niveles.invalidate()
+        reference_cache.ciclos.invalidate()
+        fragment_cache.invalidate_all()
+
+    def pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def generate(self, options):
+        escenario = synthetic.Escenario(options["children"], ciclos=options["ciclos"], seed=options["seed"])
+        fixtures = options["fixtures"]
+        do_insert = not options["no_insert"]
+        if fixtures:
+            os.makedirs(fixtures, exist_ok=True)
+
+        # Catálogos: pequeños, en este proceso
+        catalogos = {
+            "niveles": synthetic.niveles_docs(),
+            "ciclos": synthetic.ciclos_docs(escenario),
+            "grupos": list(synthetic.grupos_docs(escenario)),
+        }
+        for name, docs in catalogos.items():
+            if fixtures:
+                synthetic.write_ndjson(os.path.join(fixtures, f"{name}.ndjson"), docs)
+            if do_insert:
+                synthetic.insert(name, docs, self.batch_size)
+            self.stdout.write(f"  {name}: {len(docs)}")
+
+        # Catequizandos e inscripciones: un bloque por tarea
+        chunk = options["chunk_size"]
+        bounds = [(lo, min(lo + chunk, escenario.children)) for lo in range(0, escenario.children, chunk)]
+        started = time.monotonic()
+        totals = [0, 0]
+        with self.pool() as pool:
+            futures = [
+                pool.submit(synthetic.generate_chunk, escenario, lo, hi, self.batch_size, fixtures, do_insert)
+                for lo, hi in bounds
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                _, catequizandos, inscripciones = future.result()
+                totals[0] += catequizandos
+                totals[1] += inscripciones
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"  bloque {done}/{len(bounds)}: {totals[0]} catequizandos, {totals[1]} inscripciones "
+                    f"({totals[0] / elapsed if elapsed else 0:.0f} catequizandos/s)"
+                )
+
+    def load(self, directory):
+        catalogos = [os.path.join(directory, f"{name}.ndjson") for name in ("niveles", "ciclos", "grupos")]
+        missing = [path for path in catalogos if not os.path.exists(path)]
+        if missing:
+            raise CommandError(f"Faltan fixtures: {', '.join(missing)}")
+        for path in catalogos:
+            _, count = synthetic.load_fixture_file(path, self.batch_size)
+            self.stdout.write(f"  {os.path.basename(path)}: {count}")
+
+        paths = sorted(glob.glob(os.path.join(directory, "catequizandos-*.ndjson")))
+        paths += sorted(glob.glob(os.path.join(directory, "inscripciones-*.ndjson")))
+        with self.pool() as pool:
+            for future in as_completed([pool.submit(synthetic.load_fixture_file, path, self.batch_size) for path in paths]):
+                path, count = future.result()
+                self.stdout.write(f"  {os.path.basename(path)}: {count}")
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import BATCH_SIZE, import_catequizandos, read_rows, write_error_report
+
+
+class Command(BaseCommand):
+    help = "Importa catequizandos desde un archivo .csv o .xlsx (columnas = campos de CatequizandoSPForm)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Procesos para validar filas (1 = sin pool).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--report", help="Ruta del CSV con los errores por fila (por defecto, stderr).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        start = time.monotonic()
+        try:
+            with open(path, "rb") as fileobj:
+                result = import_catequizandos(
+                    read_rows(fileobj, path),
+                    workers=options["workers"],
+                    batch_size=options["batch_size"],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc)) from exc
+        elapsed = time.monotonic() - start
+
+        if result.errors:
+            if options["report"]:
+                with open(options["report"], "w", newline="", encoding="utf-8") as report:
+                    write_error_report(result, report)
+            else:
+                write_error_report(result, sys.stderr)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} de {result.total} filas importadas en {elapsed:.1f}s; "
+            f"{len(result.errors)} con errores."
+        ))
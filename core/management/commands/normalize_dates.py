@@ -0,0 +1,225 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from pymongo import ReturnDocument, UpdateOne
+
+from core import fragment_cache
+from core.migration_runner import CHECKPOINT_COLLECTION
+from core.models import Catequizando, Grupo, Inscripcion
+
+
+# ==========================================
+# NORMALIZACIÓN DE FECHAS EMBEBIDAS
+# ==========================================
+# Las fechas dentro de los JSONField se guardan como texto 'YYYY-MM-DD';
+# algunos documentos antiguos las tienen como BSON Date. Esta migración las
+# convierte en el servidor (update_many con pipeline) por lotes de _id, y
+# guarda un checkpoint por conversión para poder retomarla; cada ejecución
+# decide por los documentos que siguen pendientes. Si el servidor
+# no admite updates con pipeline (< 4.2), cada lote se convierte en Python
+# y se escribe con un bulk_write.
+#
+# Como cualquier otra escritura, cada conversión fija updated_at en el mismo
+# $set (los ETag de las vistas de detalle cambian) y publica versiones
+# nuevas de los fragmentos de la colección y de cada documento del lote.
+
+
+class DateConversion:
+    def __init__(self, model, field, key, array=False):
+        self.model = model
+        self.collection = model._meta.db_table
+        self.field = model._meta.get_field(field).column
+        self.key = key
+        self.array = array
+        self.touch = any(f.name == "updated_at" for f in model._meta.concrete_fields)
+        # Campos que identifican el documento en fragment_cache.row
+        self.row_fields = ("catequizando_id", "grupo_id") if model is Inscripcion else ("_id",)
+
+    @property
+    def name(self):
+        suffix = "[]" if self.array else ""
+        return f"{self.collection}.{self.field}{suffix}.{self.key}"
+
+    @property
+    def pending(self):
+        # En arrays, "campo.clave" coincide si algún elemento tiene Date
+        return {f"{self.field}.{self.key}": {"$type": "date"}}
+
+    def row(self, doc):
+        return tuple(doc.get(field) for field in self.row_fields)
+
+    def pipeline(self):
+        touch = {"updated_at": "$$NOW"} if self.touch else {}
+        to_string = {"$dateToString": {"format": "%Y-%m-%d", "date": f"$$this.{self.key}"}}
+        if not self.array:
+            return [{"$set": {f"{self.field}.{self.key}": {
+                "$dateToString": {"format": "%Y-%m-%d", "date": f"${self.field}.{self.key}"},
+            }, **touch}}]
+        return [{"$set": {self.field: {"$map": {
+            "input": f"${self.field}",
+            "in": {"$cond": [
+                {"$eq": [{"$type": f"$$this.{self.key}"}, "date"]},
+                {"$mergeObjects": ["$$this", {self.key: to_string}]},
+                "$$this",
+            ]},
+        }}, **touch}}]
+
+    def convert(self, doc):
+        """Versión en Python (para el camino bulk_write): el $set del documento o None."""
+        value = doc.get(self.field)
+        items = value if self.array else [value]
+        changed = False
+        for item in items or []:
+            if isinstance(item, dict) and isinstance(item.get(self.key), (datetime.datetime, datetime.date)):
+                fecha = item[self.key]
+                item[self.key] = (fecha.date() if isinstance(fecha, datetime.datetime) else fecha).isoformat()
+                changed = True
+        if not changed:
+            return None
+        return {self.field: value, **({"updated_at": timezone.now()} if self.touch else {})}
+
+
+CONVERSIONS = (
+    DateConversion(Catequizando, "fe_bautismo", "fecha"),
+    DateConversion(Grupo, "sesiones", "fecha", array=True),
+    DateConversion(Inscripcion, "certificado_final", "fecha_emision"),
+    DateConversion(Inscripcion, "registro_asistencia", "fecha", array=True),
+    DateConversion(Inscripcion, "calificaciones", "fecha", array=True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Convierte a texto 'YYYY-MM-DD' las fechas BSON de fe_bautismo, sesiones, "
+        "certificado_final, registro_asistencia y calificaciones. Se puede interrumpir y retomar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--restart", action="store_true", help="Ignora los checkpoints guardados.")
+        parser.add_argument("--client-side", action="store_true",
+                            help="Convierte en Python y escribe con bulk_write aunque el servidor admita pipelines.")
+
+    def handle(self, *args, **options):
+        self.db = connection.database
+        self.batch_size = options["batch_size"]
+        self.checkpoints = self.db[CHECKPOINT_COLLECTION]
+        server = tuple(self.db.client.server_info()["versionArray"][:2])
+        self.use_pipeline = not options["client_side"] and server >= (4, 2)
+        if options["restart"]:
+            self.checkpoints.delete_many({"_id": {"$in": [f"normalize_dates:{c.name}" for c in CONVERSIONS]}})
+
+        existing = set(self.db.list_collection_names())
+        for collection in dict.fromkeys(c.collection for c in CONVERSIONS):
+            if collection not in existing:
+                continue
+            level = self.saved_validation_level(collection)
+            try:
+                self.db.command("collMod", collection, validationLevel="off")
+                for conversion in CONVERSIONS:
+                    if conversion.collection == collection:
+                        self.run(conversion)
+            finally:
+                # Restaura el validador tal como estaba
+                self.db.command("collMod", collection, validationLevel=level)
+                self.checkpoints.delete_one({"_id": f"normalize_dates:validationLevel:{collection}"})
+
+    def validation_level(self, collection):
+        info = next(self.db.list_collections(filter={"name": collection}), None)
+        return ((info or {}).get("options") or {}).get("validationLevel", "strict")
+
+    def saved_validation_level(self, collection):
+        # Si una ejecución anterior murió sin llegar al finally, la colección
+        # quedó con validationLevel "off": se restaura el nivel que se guardó
+        # antes de apagarlo, no el actual.
+        saved = self.checkpoints.find_one_and_update(
+            {"_id": f"normalize_dates:validationLevel:{collection}"},
+            {"$setOnInsert": {"level": self.validation_level(collection)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return saved["level"]
+
+    # ------------------------------------------
+    # Una conversión, por lotes de _id con checkpoint
+    # ------------------------------------------
+    def run(self, conversion):
+        # Lo que decide si hay trabajo es lo que sigue sin convertir, no el
+        # checkpoint: documentos escritos después de una ejecución completa
+        # (p. ej. por código viejo) se convierten en la siguiente.
+        checkpoint_id = f"normalize_dates:{conversion.name}"
+        collection = self.db[conversion.collection]
+        remaining = collection.count_documents(conversion.pending)
+        if not remaining:
+            self.stdout.write(f"  = {conversion.name} (nada pendiente)")
+            return
+
+        checkpoint = self.checkpoints.find_one({"_id": checkpoint_id}) or {}
+        last_id = checkpoint.get("last_id")
+        converted = checkpoint.get("converted", 0)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{conversion.name}: {remaining} documentos pendientes"
+            + (f" (retomando después de {last_id})" if last_id is not None else "")
+        ))
+
+        start = time.monotonic()
+        done = 0
+        # Al retomar, una segunda vuelta desde el principio recoge lo que se
+        # haya escrito antes de last_id mientras tanto
+        wrap = last_id is not None
+        while True:
+            projection = dict.fromkeys(conversion.row_fields, 1)
+            if not self.use_pipeline:
+                projection[conversion.field] = 1
+            docs = list(collection.find(
+                self.batch_filter(conversion, last_id), projection,
+            ).sort("_id", 1).limit(self.batch_size))
+            if not docs:
+                if wrap:
+                    wrap, last_id = False, None
+                    continue
+                break
+            ids = [doc["_id"] for doc in docs]
+            if self.use_pipeline:
+                result = collection.update_many({"_id": {"$in": ids}, **conversion.pending}, conversion.pipeline())
+                modified = result.modified_count
+            else:
+                ops = []
+                for doc in docs:
+                    update = conversion.convert(doc)
+                    if update:
+                        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+                modified = collection.bulk_write(ops, ordered=False).modified_count if ops else 0
+            if modified:
+                fragment_cache.bump_rows(conversion.model, *(conversion.row(doc) for doc in docs))
+
+            last_id = ids[-1]
+            converted += modified
+            done += len(ids)
+            self.checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "converted": converted, "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+                upsert=True,
+            )
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f"  {done}/{remaining} documentos ({done / elapsed if elapsed else 0:.0f} docs/s), último _id {last_id}"
+            )
+
+        # Sin last_id la próxima ejecución empieza desde el principio
+        self.checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"converted": converted, "finished_at": datetime.datetime.now(datetime.timezone.utc)},
+             "$unset": {"last_id": ""}},
+            upsert=True,
+        )
+        self.stdout.write(self.style.SUCCESS(f"  {conversion.name}: {converted} documentos convertidos"))
+
+    def batch_filter(self, conversion, last_id):
+        criteria = dict(conversion.pending)
+        if last_id is not None:
+            criteria["_id"] = {"$gt": last_id}
+        return criteria
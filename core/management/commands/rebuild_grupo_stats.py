@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import group_stats
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la colección grupo_stats con un único aggregate ($lookup + $group + $merge)."
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        deleted, _ = group_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"grupo_stats reconstruida en {time.monotonic() - start:.1f}s ({deleted} filas obsoletas borradas)."
+        ))
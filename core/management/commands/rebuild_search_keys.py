@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from pymongo import UpdateOne
+
+from core.data_migrations import claves_catequizando, claves_grupo
+from core.models import Catequizando, Grupo
+
+
+class Command(BaseCommand):
+    help = "Recalcula las claves de búsqueda normalizadas (tildes/mayúsculas) de los documentos existentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Mismas transformaciones que run_migration, en un solo proceso; solo
+        # se escriben los documentos cuyas claves cambiaron
+        self.batch_size = options["batch_size"]
+        self.rebuild(
+            Catequizando._meta.db_table,
+            {"cedula": 1, "primer_nombre": 1, "segundo_nombre": 1, "primer_apellido": 1, "segundo_apellido": 1,
+             "claves_busqueda": 1},
+            claves_catequizando,
+        )
+        self.rebuild(Grupo._meta.db_table, {"catequistas": 1, "catequistas_busqueda": 1}, claves_grupo)
+
+    def rebuild(self, collection_name, projection, transform):
+        collection = connection.get_collection(collection_name)
+        ops = []
+        total = 0
+        for doc in collection.find({}, projection).batch_size(self.batch_size):
+            update = transform(doc)
+            if not update:
+                continue
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+            if len(ops) >= self.batch_size:
+                collection.bulk_write(ops, ordered=False)
+                total += len(ops)
+                ops = []
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+            total += len(ops)
+        self.stdout.write(self.style.SUCCESS(f"{collection_name}: {total} documentos actualizados"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Inscripcion
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes de asistencia y notas de las inscripciones a "
+        "partir de registro_asistencia y calificaciones (un update_many en el servidor)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grupo", help="Solo las inscripciones de este grupo.")
+
+    def handle(self, *args, **options):
+        criteria = {"grupo_id": options["grupo"]} if options["grupo"] else {}
+        result = Inscripcion.refresh_summaries(criteria)
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.modified_count} de {result.matched_count} inscripciones actualizadas."
+        ))
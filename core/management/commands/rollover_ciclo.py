@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Ciclo
+from core.rollover import plan_rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa un ciclo al siguiente: recrea sus grupos en el ciclo destino y "
+        "promueve a los APROBADOS al nivel siguiente. Se puede repetir sin duplicar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("origen", help="id del ciclo que termina")
+        parser.add_argument("destino", help="id del ciclo nuevo")
+        parser.add_argument("--dry-run", action="store_true", help="Muestra el plan sin escribir nada.")
+
+    def handle(self, *args, **options):
+        try:
+            origen = Ciclo.objects.get(pk=options["origen"])
+            destino = Ciclo.objects.get(pk=options["destino"])
+        except Ciclo.DoesNotExist as exc:
+            raise CommandError(f"Ciclo no encontrado: {exc}") from exc
+        if origen.pk == destino.pk:
+            raise CommandError("El ciclo de origen y el destino deben ser distintos.")
+
+        plan = plan_rollover(origen, destino)
+        for line in plan.diff():
+            self.stdout.write(line)
+
+        resumen = (
+            f"grupos: {len(plan.grupos_nuevos)} nuevos, {len(plan.grupos_existentes)} existentes; "
+            f"inscripciones: {len(plan.inscripciones_nuevas)} nuevas, {len(plan.ya_inscritos)} existentes."
+        )
+        if plan.sin_grupo_destino:
+            self.stdout.write(self.style.WARNING(
+                f"{len(plan.sin_grupo_destino)} aprobados sin grupo del nivel siguiente."
+            ))
+        if options["dry_run"] or plan.is_empty:
+            self.stdout.write(resumen)
+            return
+        plan.apply()
+        self.stdout.write(self.style.SUCCESS(f"Aplicado. {resumen}"))
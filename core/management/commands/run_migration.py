@@ -0,0 +1,58 @@
+from bson import json_util
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from core.migration_runner import CheckpointMismatch, MigrationRunner
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica una transformación por documento (ruta importable) a una colección, "
+        "en paralelo por rangos de _id y con reanudación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection")
+        parser.add_argument("transform", help="p. ej. core.data_migrations.claves_catequizando")
+        parser.add_argument("--filter", default="{}", help="Filtro MQL en JSON extendido.")
+        parser.add_argument("--fields", help="Campos a leer, separados por comas (por defecto, todos).")
+        parser.add_argument("--name", help="Nombre del checkpoint (por defecto, colección + transformación).")
+        parser.add_argument("--workers", type=int)
+        parser.add_argument("--partitions", type=int)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Solo informa qué cambiaría.")
+        parser.add_argument("--restart", action="store_true", help="Descarta el avance guardado.")
+
+    def handle(self, *args, **options):
+        try:
+            import_string(options["transform"])
+            criteria = json_util.loads(options["filter"])
+        except (ImportError, ValueError) as exc:
+            raise CommandError(str(exc)) from exc
+
+        projection = None
+        if options["fields"]:
+            projection = {field.strip(): 1 for field in options["fields"].split(",")}
+
+        runner = MigrationRunner(
+            options["name"] or f"{options['collection']}:{options['transform']}",
+            options["collection"],
+            options["transform"],
+            criteria=criteria,
+            projection=projection,
+            workers=options["workers"],
+            partitions=options["partitions"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            log=self.stdout.write,
+        )
+        if options["restart"]:
+            runner.reset()
+        try:
+            samples = runner.run()
+        except CheckpointMismatch as exc:
+            raise CommandError(str(exc)) from exc
+        for _id, changes in samples:
+            self.stdout.write(f"  ~ {_id}")
+            for field, (old, new) in changes.items():
+                self.stdout.write(f"      {field}: {old!r} -> {new!r}")
@@ -0,0 +1,277 @@
+from bson import json_util
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q, UniqueConstraint
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from core.list_rows import (
+    CATEQUIZANDO_PAGE_KEYS,
+    GRUPO_PAGE_KEYS,
+    INSCRIPCION_PAGE_KEYS,
+    catequizando_rows,
+    catequizando_search_pipeline,
+    catequizando_search_terms,
+    grupo_rows,
+    inscripcion_filters,
+    inscripcion_join,
+)
+from core.models import Catequizando, Grupo, GrupoStats, Inscripcion
+from core.pagination import keyset_pipeline
+from core.search import prefix_match
+
+
+# ==========================================
+# ÍNDICES DECLARADOS EN LOS MODELOS
+# ==========================================
+# Se arman a partir de la API pública de los modelos (campos, Meta.indexes,
+# Meta.constraints), no del schema editor del backend. Los campos con
+# db_index/unique se nombran <colección>_<columna>_idx/_uniq.
+
+CONDITION_OPERATORS = {"exact": "$eq", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte", "in": "$in"}
+
+
+def condition_filter(model, condition):
+    """
+    partialFilterExpression de un Q sencillo: solo AND de comparaciones
+    (exact, gt, gte, lt, lte, in) e isnull=False sobre campos del modelo.
+    """
+    if condition.connector != Q.AND or condition.negated:
+        raise CommandError(f"{model.__name__}: condición de índice no soportada: {condition}")
+    terms = []
+    for child in condition.children:
+        if isinstance(child, Q):
+            terms.append(condition_filter(model, child))
+            continue
+        lookup, value = child
+        name, _, operator = lookup.partition("__")
+        field = model._meta.get_field(name)
+        operator = operator or "exact"
+        if operator == "isnull" and value is False:
+            terms.append({field.column: {"$exists": True}})
+        elif operator == "in":
+            terms.append({field.column: {"$in": [field.get_db_prep_value(item, connection) for item in value]}})
+        elif operator in CONDITION_OPERATORS:
+            terms.append({field.column: {CONDITION_OPERATORS[operator]: field.get_db_prep_value(value, connection)}})
+        else:
+            raise CommandError(f"{model.__name__}: condición de índice no soportada: {lookup}")
+    return terms[0] if len(terms) == 1 else {"$and": terms}
+
+
+def declared_indexes(model):
+    """
+    IndexModels que el modelo declara: campos con db_index (p. ej. ForeignKey)
+    o unique, Meta.constraints (UniqueConstraint) y Meta.indexes.
+    """
+    opts = model._meta
+
+    def index_model(name, fields_orders, unique=False, condition=None):
+        keys = [
+            (opts.get_field(field).column, DESCENDING if order == "DESC" else ASCENDING)
+            for field, order in fields_orders
+        ]
+        options = {"name": name}
+        if unique:
+            options["unique"] = True
+        if condition is not None:
+            options["partialFilterExpression"] = condition_filter(model, condition)
+        return IndexModel(keys, **options)
+
+    declared = []
+    for field in opts.local_fields:
+        if field.primary_key or not (field.unique or field.db_index):
+            continue
+        suffix = "uniq" if field.unique else "idx"
+        declared.append(index_model(f"{opts.db_table}_{field.column}_{suffix}", [(field.name, "")], field.unique))
+    for constraint in opts.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            if constraint.expressions:
+                raise CommandError(f"{constraint.name}: los índices por expresión no están soportados")
+            fields = [(field, "") for field in constraint.fields]
+            declared.append(index_model(constraint.name, fields, unique=True, condition=constraint.condition))
+    for index in opts.indexes:
+        if index.expressions:
+            raise CommandError(f"{index.name}: los índices por expresión no están soportados")
+        declared.append(index_model(index.name, index.fields_orders, condition=index.condition))
+    return declared
+
+
+def index_spec(info):
+    """
+    (claves, unique, partialFilterExpression) de un índice, ya sea el
+    document de un IndexModel o una entrada de index_information(): dos
+    índices con la misma especificación son equivalentes.
+    """
+    key = info["key"]
+    keys = tuple((field, direction if isinstance(direction, str) else int(direction))
+                 for field, direction in (key.items() if isinstance(key, dict) else key))
+    partial = info.get("partialFilterExpression")
+    return keys, bool(info.get("unique")), json_util.dumps(partial) if partial is not None else None
+
+
+def describe(spec):
+    keys, unique, partial = spec
+    text = str(list(keys))
+    if unique:
+        text += " unique"
+    if partial is not None:
+        text += f" partial={partial}"
+    return text
+
+
+def find_collscans(explain):
+    # Recorre solo los planes ganadores (no los rechazados)
+    found = []
+
+    def walk(node, in_winning):
+        if isinstance(node, dict):
+            if in_winning and node.get("stage") == "COLLSCAN":
+                found.append(node)
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                walk(value, in_winning or key in ("winningPlan", "queryPlan"))
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_winning)
+
+    walk(explain, False)
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Sincroniza los índices declarados en core.models con MongoDB y, con "
+        "--explain, revisa el plan de las consultas de los listados/búsquedas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo reporta, no crea ni borra índices.")
+        parser.add_argument("--prune", action="store_true", help="Borra índices no declarados en los modelos.")
+        parser.add_argument("--explain", action="store_true", help="Ejecuta explain y marca los COLLSCAN.")
+        parser.add_argument("--fail-on-collscan", action="store_true", help="Termina con error si hay COLLSCAN inesperados.")
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        for model in apps.get_app_config("core").get_models():
+            self.sync_model(model, prune=options["prune"])
+
+        if options["explain"]:
+            unexpected = self.explain_views()
+            if unexpected and options["fail_on_collscan"]:
+                raise CommandError(f"COLLSCAN en: {', '.join(unexpected)}")
+
+    # ------------------------------------------
+    # Sincronización de índices
+    # ------------------------------------------
+    def sync_model(self, model, prune=False):
+        collection = connection.get_collection(model._meta.db_table)
+        existing = {name: index_spec(info) for name, info in collection.index_information().items()}
+        declared = {idx.document["name"]: idx for idx in declared_indexes(model)}
+        self.stdout.write(self.style.MIGRATE_HEADING(model._meta.db_table))
+
+        # Un índice igual con otro nombre cuenta como sincronizado: MongoDB no
+        # deja crear dos índices con la misma especificación
+        equivalent = {}
+        for name, spec in existing.items():
+            if name not in declared:
+                equivalent.setdefault(spec, name)
+
+        for name, idx in declared.items():
+            spec = index_spec(idx.document)
+            current = existing.get(name)
+            if current == spec:
+                self.stdout.write(f"  = {name}")
+            elif current is None and spec in equivalent:
+                self.stdout.write(f"  = {name} (existe como {equivalent[spec]})")
+                existing.pop(equivalent.pop(spec))
+            elif current is None:
+                self.stdout.write(f"  + {name} {describe(spec)}")
+                if not self.dry_run:
+                    collection.create_indexes([idx])
+            else:
+                self.stdout.write(self.style.WARNING(f"  ~ {name}: {describe(current)} != {describe(spec)}"))
+                if not self.dry_run:
+                    collection.drop_index(name)
+                    collection.create_indexes([idx])
+
+        for name in existing.keys() - declared.keys() - {"_id_"}:
+            if prune:
+                self.stdout.write(self.style.WARNING(f"  - {name}"))
+                if not self.dry_run:
+                    collection.drop_index(name)
+            else:
+                self.stdout.write(f"  ? {name} (no declarado)")
+
+    # ------------------------------------------
+    # Explain de las consultas de las vistas
+    # ------------------------------------------
+    def sample(self, model, field, default):
+        doc = connection.get_collection(model._meta.db_table).find_one({}, {field: 1})
+        return (doc or {}).get(field, default)
+
+    def explain_targets(self):
+        """
+        (nombre, explain, admite_collscan). Se construyen con las mismas
+        funciones que usan las vistas para que el plan sea el real.
+        """
+        db = connection.database
+        page = slice(0, 26)
+        nivel_id = self.sample(Grupo, "nivel_id", "")
+        ciclo_id = self.sample(Grupo, "ciclo_id", "")
+        grupo_id = self.sample(Inscripcion, "grupo_id", "")
+        apellido = self.sample(Catequizando, "primer_apellido", "a")
+        cedula = self.sample(Catequizando, "cedula", "0")
+
+        def queryset(qs):
+            return json_util.loads(qs.explain())
+
+        def find(model, filter_):
+            return db.command("explain", {"find": model._meta.db_table, "filter": filter_})
+
+        def aggregate(model, pipeline):
+            return db.command("explain", {"aggregate": model._meta.db_table, "pipeline": pipeline, "cursor": {}})
+
+        yield ("catequizando_listar",
+               queryset(catequizando_rows(Catequizando.objects.order_by(*CATEQUIZANDO_PAGE_KEYS))[page]), False)
+        yield ("catequizando_buscar",
+               aggregate(Catequizando, catequizando_search_pipeline(catequizando_search_terms(cedula, apellido))), False)
+        yield ("grupo_listar",
+               queryset(grupo_rows(Grupo.objects.order_by(*GRUPO_PAGE_KEYS))[page]), False)
+        yield ("grupo_buscar nivel_id",
+               queryset(grupo_rows(Grupo.objects.filter(nivel__id=nivel_id))), False)
+        yield ("grupo_buscar ciclo_id",
+               queryset(grupo_rows(Grupo.objects.filter(ciclo__id=ciclo_id))), False)
+        yield ("grupo_buscar catequista",
+               find(Grupo, prefix_match("catequistas_busqueda", "a")), False)
+        def inscripcion_page(**filters):
+            match, scan = inscripcion_filters(**filters)
+            return keyset_pipeline(match, INSCRIPCION_PAGE_KEYS, page.stop - 1, tail=inscripcion_join(), scan=scan)
+
+        # El listado ordena por el índice único (catequizando_id, grupo_id)
+        yield ("inscripcion_listar", aggregate(Inscripcion, inscripcion_page()), False)
+        yield ("inscripcion_buscar grupo_id",
+               aggregate(Inscripcion, inscripcion_page(grupo_id=grupo_id)), False)
+        yield ("inscripcion_buscar estado_pago",
+               aggregate(Inscripcion, inscripcion_page(estado_pago=Inscripcion.EstadoPago.PENDIENTE)), False)
+        yield ("inscripcion_buscar cedula",
+               aggregate(Inscripcion, inscripcion_page(cedula=cedula)), False)
+        yield ("inscripciones por asistencia",
+               queryset(Inscripcion.objects.filter(grupo_id=grupo_id).order_by("porcentaje_asistencia")
+                        .values("pk", "porcentaje_asistencia")), False)
+        yield ("ciclo_estadisticas",
+               queryset(GrupoStats.objects.filter(ciclo_id=ciclo_id).order_by("nombre_grupo").values()), False)
+
+    def explain_views(self):
+        self.stdout.write(self.style.MIGRATE_HEADING("explain"))
+        unexpected = []
+        for name, explain, collscan_ok in self.explain_targets():
+            scans = find_collscans(explain)
+            if not scans:
+                self.stdout.write(f"  ok      {name}")
+            elif collscan_ok:
+                self.stdout.write(f"  scan    {name} (esperado)")
+            else:
+                unexpected.append(name)
+                self.stdout.write(self.style.ERROR(f"  COLLSCAN {name}"))
+        return unexpected
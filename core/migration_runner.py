@@ -0,0 +1,215 @@
+import datetime
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bson import json_util
+from django.db import connection
+from django.utils.module_loading import import_string
+from pymongo import UpdateOne
+
+
+# ==========================================
+# MIGRACIONES DE DATOS POR RANGOS DE _id EN PARALELO
+# ==========================================
+# Para cambios de forma en los subdocumentos JSON (arrays embebidos, etc.)
+# que no se pueden expresar como un update con pipeline. Se indica:
+#   - la colección y un filtro MQL de los documentos afectados,
+#   - una transformación `transform(doc) -> {campo: valor_nuevo} | None`
+#     (ruta importable, p. ej. 'core.data_migrations.claves_catequizando').
+# El espacio de _id se parte en rangos ($bucketAuto) y cada rango se procesa
+# en un proceso del pool, escribiendo con bulk_write por lotes. Los rangos
+# terminados se registran en _migraciones, así que volver a lanzar la misma
+# migración solo procesa los que faltan.
+#
+# Cada rango abarca un solo tipo BSON de _id: $gte/$lt solo comparan valores
+# del mismo tipo, y un rango entre un string y un ObjectId no encontraría
+# ningún documento. Los cambios se registran por rango con $set, así que
+# reprocesar un rango no los cuenta dos veces.
+#
+# El checkpoint guarda también la colección, el filtro y la transformación:
+# reanudar con otros distintos mezclaría rangos de dos migraciones, así que
+# se rechaza (hay que usar otro nombre o --restart).
+
+CHECKPOINT_COLLECTION = "_migraciones"
+DRY_RUN_SAMPLES = 5
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+def checkpoints():
+    return connection.database[CHECKPOINT_COLLECTION]
+
+
+def split_id_ranges(collection, criteria, partitions):
+    """
+    [(tipo, desde, hasta)]: rangos de _id de un mismo tipo BSON; desde
+    inclusivo, hasta exclusivo (None = sin tope). Las particiones se reparten
+    entre los tipos en proporción a sus documentos.
+    """
+    coll = connection.database[collection]
+    counts = {
+        row["_id"]: row["count"]
+        for row in coll.aggregate([
+            {"$match": criteria},
+            {"$group": {"_id": {"$type": "$_id"}, "count": {"$sum": 1}}},
+        ])
+    }
+    total = sum(counts.values())
+    ranges = []
+    for bson_type, count in sorted(counts.items()):
+        buckets = coll.aggregate([
+            {"$match": {"$and": [criteria, {"_id": {"$type": bson_type}}]}},
+            {"$bucketAuto": {"groupBy": "$_id", "buckets": max(1, round(partitions * count / total))}},
+        ])
+        lowers = [bucket["_id"]["min"] for bucket in buckets]
+        ranges += [(bson_type, lower, upper) for lower, upper in zip(lowers, [*lowers[1:], None])]
+    return ranges
+
+
+def _init_worker():
+    # Proceso nuevo (spawn): cliente de Mongo propio, nunca heredado
+    import django
+    django.setup()
+
+
+def process_range(name, collection, criteria, projection, transform_path, index, bounds, batch_size, dry_run):
+    transform = import_string(transform_path)
+    bson_type, lower, upper = bounds
+    id_range = {"$gte": lower}
+    if bson_type is not None:
+        id_range["$type"] = bson_type
+    if upper is not None:
+        id_range["$lt"] = upper
+
+    coll = connection.database[collection]
+    cursor = coll.find({"$and": [criteria, {"_id": id_range}]}, projection, batch_size=batch_size).sort("_id", 1)
+    scanned = changed = 0
+    samples = []
+    ops = []
+    for doc in cursor:
+        scanned += 1
+        update = transform(doc)
+        if not update:
+            continue
+        changed += 1
+        if dry_run:
+            if len(samples) < DRY_RUN_SAMPLES:
+                samples.append((doc["_id"], {field: (doc.get(field), value) for field, value in update.items()}))
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(ops) >= batch_size:
+            coll.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+
+    if not dry_run:
+        checkpoints().update_one(
+            {"_id": name},
+            {"$addToSet": {"completed": index}, "$set": {f"changed_by_range.{index}": changed}},
+        )
+    return index, scanned, changed, samples
+
+
+class MigrationRunner:
+    def __init__(self, name, collection, transform, criteria=None, projection=None,
+                 workers=None, partitions=None, batch_size=1000, dry_run=False, log=print):
+        self.name = f"migration:{name}"
+        self.collection = collection
+        self.transform = transform
+        self.criteria = criteria or {}
+        self.projection = projection
+        self.workers = workers or multiprocessing.cpu_count()
+        self.partitions = partitions or self.workers * 4
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.log = log
+
+    def reset(self):
+        checkpoints().delete_one({"_id": self.name})
+
+    def plan(self):
+        # Los rangos se guardan en la primera ejecución para que una
+        # reanudación procese exactamente los mismos.
+        state = checkpoints().find_one({"_id": self.name})
+        if state is None:
+            ranges = split_id_ranges(self.collection, self.criteria, self.partitions)
+            state = {
+                "_id": self.name,
+                "collection": self.collection,
+                "criteria": json_util.dumps(self.criteria),
+                "transform": self.transform,
+                "ranges": ranges,
+                "completed": [],
+                "changed_by_range": {},
+                "started_at": datetime.datetime.now(datetime.timezone.utc),
+            }
+            if not self.dry_run:
+                checkpoints().insert_one(state)
+        else:
+            self.check_resume(state)
+        # Los checkpoints anteriores guardaban (desde, hasta), sin tipo
+        ranges = [tuple(bounds) if len(bounds) == 3 else (None, *bounds) for bounds in state["ranges"]]
+        completed = set(state.get("completed", []))
+        return [(index, bounds) for index, bounds in enumerate(ranges) if index not in completed], len(ranges)
+
+    def check_resume(self, state):
+        # Los checkpoints anteriores no guardaban la transformación
+        stored = {
+            "colección": (state.get("collection"), self.collection),
+            "filtro": (json_util.loads(state.get("criteria") or "{}"), self.criteria),
+            "transformación": (state.get("transform", self.transform), self.transform),
+        }
+        different = [label for label, (before, now) in stored.items() if before != now]
+        if different:
+            raise CheckpointMismatch(
+                f"{self.name}: el avance guardado es de otra migración (no coincide: "
+                f"{', '.join(different)}); usa otro nombre o descártalo con --restart."
+            )
+
+    def run(self):
+        pending, total = self.plan()
+        if not pending:
+            self.log(f"{self.name}: los {total} rangos ya estaban completos.")
+            return []
+        self.log(f"{self.name}: {len(pending)} de {total} rangos pendientes, {self.workers} procesos.")
+
+        start = time.monotonic()
+        scanned_total = changed_total = 0
+        samples = []
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        with pool:
+            futures = [
+                pool.submit(
+                    process_range, self.name, self.collection, self.criteria, self.projection,
+                    self.transform, index, bounds, self.batch_size, self.dry_run,
+                )
+                for index, bounds in pending
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                index, scanned, changed, range_samples = future.result()
+                scanned_total += scanned
+                changed_total += changed
+                samples.extend(range_samples)
+                elapsed = time.monotonic() - start
+                self.log(
+                    f"  rango {index}: {scanned} leídos, {changed} cambios "
+                    f"[{done}/{len(pending)}, {scanned_total / elapsed if elapsed else 0:.0f} docs/s]"
+                )
+
+        verb = "cambiarían" if self.dry_run else "cambiaron"
+        self.log(f"{self.name}: {scanned_total} documentos leídos, {changed_total} {verb}.")
+        if not self.dry_run:
+            state = checkpoints().find_one({"_id": self.name}, {"changed_by_range": 1})
+            checkpoints().update_one({"_id": self.name}, {"$set": {
+                "changed": sum((state.get("changed_by_range") or {}).values()),
+                "finished_at": datetime.datetime.now(datetime.timezone.utc),
+            }})
+        return samples
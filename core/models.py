@@ -1,9 +1,148 @@
-from django.db import models
+from django.db import connection, models
+from pymongo import UpdateOne
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django_mongodb_backend.fields import ObjectIdAutoField
 
-class Catequizando(models.Model):
+
+class UpdatedAtModel(models.Model):
+    """
+    Marca de la última modificación del documento; la usan los GET
+    condicionales (ETag / Last-Modified) de las vistas de detalle.
+    save() y bulk_create() la fijan solos (auto_now); queryset.update() no,
+    así que quien use update() debe pasar updated_at=timezone.now(). Los
+    métodos de EmbeddedArrayMixin la actualizan en el mismo update.
+    """
+
+    # null: los documentos anteriores a este campo no la tienen
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class EmbeddedArrayMixin:
+    """
+    Mutaciones atómicas sobre los arrays embebidos (JSONField de listas).
+    Cada método emite un único update en el servidor ($push, $pull o $set
+    posicional) en lugar de leer el documento, modificar la lista en Python y
+    reescribirla completa. `criteria` es un filtro MQL sobre la colección.
+    Devuelven el UpdateResult de pymongo (matched_count == 0 => no existe).
+
+    `array_summaries` asocia un array con las etapas de pipeline que
+    recalculan sus campos de resumen; si un array tiene resumen, push y
+    upsert lo actualizan en el mismo update que modifica el array.
+
+    Si el modelo tiene `updated_at` (UpdatedAtModel), cada mutación lo fija
+    a la hora del servidor.
+    """
+
+    array_summaries = {}
+
+    @classmethod
+    def _touch_fields(cls):
+        return ["updated_at"] if any(f.name == "updated_at" for f in cls._meta.concrete_fields) else []
+
+    @classmethod
+    def _touch_stages(cls):
+        # Para updates con pipeline
+        return [{"$set": {field: "$$NOW"}} for field in cls._touch_fields()]
+
+    @classmethod
+    def _touched(cls, update):
+        # Para updates con operadores ($push, $pull, $set)
+        fields = cls._touch_fields()
+        return {**update, "$currentDate": {field: True for field in fields}} if fields else update
+
+    @classmethod
+    def _array_column(cls, field):
+        return cls._meta.get_field(field).column
+
+    @classmethod
+    def get_collection(cls):
+        return connection.get_collection(cls._meta.db_table)
+
+    @classmethod
+    def _push_update(cls, field, items, sort=None):
+        column = cls._array_column(field)
+        summary = cls.array_summaries.get(field)
+        if summary:
+            # Pipeline: $concatArrays equivale al $push y permite encadenar
+            # el recálculo del resumen en la misma escritura.
+            value = {"$concatArrays": [{"$ifNull": [f"${column}", []]}, {"$literal": list(items)}]}
+            if sort is not None:
+                value = {"$sortArray": {"input": value, "sortBy": sort}}
+            return [{"$set": {column: value}}, *summary, *cls._touch_stages()]
+        push = {"$each": list(items)}
+        if sort is not None:
+            push["$sort"] = sort
+        return cls._touched({"$push": {column: push}})
+
+    @classmethod
+    def array_push(cls, criteria, field, *items, sort=None):
+        return cls.get_collection().update_one(criteria, cls._push_update(field, items, sort))
+
+    @classmethod
+    def array_push_op(cls, criteria, field, *items, sort=None):
+        # Variante para bulk_write
+        return UpdateOne(criteria, cls._push_update(field, items, sort))
+
+    @classmethod
+    def array_pull(cls, criteria, field, condition):
+        result = cls.get_collection().update_one(
+            criteria, cls._touched({"$pull": {cls._array_column(field): condition}}),
+        )
+        cls._refresh_after(criteria, field, result)
+        return result
+
+    @classmethod
+    def array_set(cls, criteria, field, match, values):
+        # $set posicional: actualiza las claves `values` del primer elemento
+        # del array que cumple `match`.
+        column = cls._array_column(field)
+        result = cls.get_collection().update_one(
+            {**criteria, column: {"$elemMatch": match}},
+            cls._touched({"$set": {f"{column}.$.{key}": value for key, value in values.items()}}),
+        )
+        cls._refresh_after(criteria, field, result)
+        return result
+
+    @classmethod
+    def array_upsert_op(cls, criteria, field, key, item):
+        """
+        UpdateOne (para bulk_write) que reemplaza el elemento cuyo `key`
+        coincide con el de `item`, o lo agrega si no existe. Usa un pipeline
+        de actualización, así que no hace falta leer el array antes.
+        """
+        column = cls._array_column(field)
+        return UpdateOne(criteria, [{"$set": {column: {"$concatArrays": [
+            {"$filter": {
+                "input": {"$ifNull": [f"${column}", []]},
+                "cond": {"$ne": [f"$$this.{key}", item[key]]},
+            }},
+            [{"$literal": item}],
+        ]}}}, *cls.array_summaries.get(field, []), *cls._touch_stages()])
+
+    @classmethod
+    def _refresh_after(cls, criteria, field, result):
+        # $pull y el $set posicional no admiten pipeline: el resumen se
+        # recalcula con un segundo update sobre el mismo documento.
+        summary = cls.array_summaries.get(field)
+        if summary and result.modified_count:
+            cls.get_collection().update_one(criteria, summary)
+
+    @classmethod
+    def refresh_summaries(cls, criteria=None):
+        """Recalcula en el servidor todos los resúmenes (p. ej. para backfill)."""
+        stages = [stage for summary in cls.array_summaries.values() for stage in summary]
+        stages += cls._touch_stages()
+        return cls.get_collection().update_many(criteria or {}, stages)
+
+    @classmethod
+    def bulk_write(cls, operations):
+        return cls.get_collection().bulk_write(operations, ordered=False)
+
+class Catequizando(UpdatedAtModel):
     # 1. MAPEO DEL _ID
     # Tu esquema permite 'objectId' o 'string'. 
     # Como migraste de SQL con IDs tipo "1", "2", usamos CharField como Primary Key.
@@ -72,17 +211,33 @@ class Catequizando(models.Model):
     
     observaciones_generales = models.TextField(null=True, blank=True)
 
+    # Claves normalizadas de cédula, nombres y apellidos para el buscador
+    # (ver core.search.catequizando_keys). Índice multikey.
+    claves_busqueda = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Claves de búsqueda: c:<cedula>, n:<nombre>, a:<apellido>"
+    )
+
     class Meta:
         # managed = True (por defecto) para que Django sepa que esta colección es suya
         db_table = 'catequizandos' # Nombre exacto de tu colección en Mongo
         verbose_name = 'Catequizando'
         verbose_name_plural = 'Catequizandos'
 
+        # Soporta la paginación por cursor (primer_apellido, _id) del listado
+        indexes = [
+            models.Index(fields=['primer_apellido', 'id'], name='cateq_apellido_id_idx'),
+            # Búsqueda por prefijo sin tildes (regex anclados sobre el multikey)
+            models.Index(fields=['claves_busqueda'], name='cateq_claves_busq_idx'),
+            models.Index(fields=['cedula'], name='cateq_cedula_idx'),
+        ]
+
     def __str__(self):
         return f"{self.cedula} - {self.primer_apellido} {self.primer_nombre}"
     
 
-class Nivel(models.Model):
+class Nivel(UpdatedAtModel):
     # 1. MAPEO DEL _ID
     # Al igual que en catequizandos, permitimos Strings por la migración SQL
     id = models.CharField(
@@ -116,7 +271,7 @@ class Nivel(models.Model):
         return f"{self.nombre} (Min: {self.edad_minima} años)"    
     
 
-class Ciclo(models.Model):
+class Ciclo(UpdatedAtModel):
     # 1. MAPEO DEL _ID
     # Mantenemos CharField para compatibilidad con tus IDs migrados ("1", "2"...)
     id = models.CharField(
@@ -166,7 +321,7 @@ class Ciclo(models.Model):
         self.full_clean()
         super().save(*args, **kwargs)
         
-class Grupo(models.Model):
+class Grupo(EmbeddedArrayMixin, UpdatedAtModel):
     # 1. MAPEO DEL _ID
     id = models.CharField(
         primary_key=True, 
@@ -212,6 +367,14 @@ class Grupo(models.Model):
         help_text="Lista de catequistas asignados. Keys: nombre, tipo"
     )
 
+    # Copia normalizada (sin tildes, minúsculas) de las palabras de los nombres
+    # de catequistas. Se mantiene junto a 'catequistas' (ver core.search).
+    catequistas_busqueda = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Claves de búsqueda de catequistas (multikey)."
+    )
+
     # Array de objetos { "sesion_id": 1, "tema": "...", "fecha": "...", "asistencia_tomada": bool }
     sesiones = models.JSONField(
         default=list,
@@ -224,11 +387,54 @@ class Grupo(models.Model):
         verbose_name = 'Grupo'
         verbose_name_plural = 'Grupos'
 
+        indexes = [
+            # Paginación por cursor del listado (nombre_grupo, _id)
+            models.Index(fields=['nombre_grupo', 'id'], name='grupo_nombre_id_idx'),
+            # Índice multikey para el filtro por catequista
+            models.Index(fields=['catequistas_busqueda'], name='grupo_catequista_busq_idx'),
+            models.Index(fields=['estado'], name='grupo_estado_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre_grupo} - {self.ciclo}"
     
 
-class Inscripcion(models.Model):
+def _count_where(column, key, value):
+    return {"$size": {"$filter": {
+        "input": {"$ifNull": [f"${column}", []]},
+        "cond": {"$eq": [f"$$this.{key}", value]},
+    }}}
+
+
+def _resumen_asistencia():
+    # Conteos por estado y porcentaje de presentes sobre las marcas registradas
+    total = {"$size": {"$ifNull": ["$registro_asistencia", []]}}
+    return [
+        {"$set": {
+            "asistencias_presente": _count_where("registro_asistencia", "estado", "PRESENTE"),
+            "asistencias_falta": _count_where("registro_asistencia", "estado", "FALTA"),
+            "asistencias_justificada": _count_where("registro_asistencia", "estado", "JUSTIFICADA"),
+            "resumen_actualizado": "$$NOW",
+        }},
+        {"$set": {"porcentaje_asistencia": {"$cond": [
+            {"$gt": [total, 0]},
+            {"$round": [{"$multiply": [{"$divide": ["$asistencias_presente", total]}, 100]}, 1]},
+            None,
+        ]}}},
+    ]
+
+
+def _resumen_notas():
+    valores = {"$ifNull": ["$calificaciones.valor", []]}
+    return [{"$set": {
+        "notas_cantidad": {"$size": {"$ifNull": ["$calificaciones", []]}},
+        "notas_suma": {"$sum": valores},
+        "promedio_notas": {"$round": [{"$avg": valores}, 2]},
+        "resumen_actualizado": "$$NOW",
+    }}]
+
+
+class Inscripcion(EmbeddedArrayMixin, UpdatedAtModel):
     # 1. MAPEO DEL _ID (Autogenerado por Mongo)
     id = ObjectIdAutoField(
         primary_key=True,
@@ -300,11 +506,37 @@ class Inscripcion(models.Model):
         help_text="Datos del certificado si aprobó."
     )
 
+    # 5. RESÚMENES (derivados de registro_asistencia y calificaciones)
+    # Se recalculan en el mismo update que agrega la marca o la nota (ver
+    # array_summaries); no se editan a mano.
+    asistencias_presente = models.IntegerField(default=0)
+    asistencias_falta = models.IntegerField(default=0)
+    asistencias_justificada = models.IntegerField(default=0)
+    porcentaje_asistencia = models.FloatField(null=True, blank=True)
+    notas_cantidad = models.IntegerField(default=0)
+    notas_suma = models.FloatField(default=0)
+    promedio_notas = models.FloatField(null=True, blank=True)
+    resumen_actualizado = models.DateTimeField(null=True, blank=True)
+
+    array_summaries = {
+        "registro_asistencia": _resumen_asistencia(),
+        "calificaciones": _resumen_notas(),
+    }
+
     class Meta:
         db_table = 'inscripciones'
         verbose_name = 'Inscripción'
         verbose_name_plural = 'Inscripciones'
         
+        # grupo_id y catequizando_id ya quedan indexados por ser ForeignKey
+        # (db_index=True); 'python manage.py sync_indexes' los crea.
+        indexes = [
+            models.Index(fields=['estado_pago'], name='insc_estado_pago_idx'),
+            # Listados y tableros de un grupo ordenados por asistencia o promedio
+            models.Index(fields=['grupo', 'porcentaje_asistencia'], name='insc_grupo_asistencia_idx'),
+            models.Index(fields=['grupo', 'promedio_notas'], name='insc_grupo_promedio_idx'),
+        ]
+
         # Evitar que un alumno se inscriba dos veces en el mismo grupo
         constraints = [
             models.UniqueConstraint(
@@ -314,4 +546,51 @@ class Inscripcion(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.catequizando} - {self.grupo}"
\ No newline at end of file
+        return f"{self.catequizando} - {self.grupo}"
+
+# ==========================================
+# RESUMEN MATERIALIZADO POR GRUPO
+# ==========================================
+# Colección derivada: la reconstruye core.group_stats (un aggregate con
+# $merge) y se refresca por grupo cada vez que cambian sus inscripciones.
+# No se edita a mano.
+
+class GrupoStats(models.Model):
+    # Mismo _id que el grupo
+    id = models.CharField(primary_key=True, max_length=50, db_column='_id')
+
+    ciclo_id = models.CharField(max_length=50)
+    nivel_id = models.CharField(max_length=50)
+    nombre_grupo = models.CharField(max_length=100)
+    estado = models.CharField(max_length=20)
+
+    inscritos = models.IntegerField(default=0)
+    pagados = models.IntegerField(default=0)
+    pendientes = models.IntegerField(default=0)
+    cursando = models.IntegerField(default=0)
+    aprobados = models.IntegerField(default=0)
+    reprobados = models.IntegerField(default=0)
+    retirados = models.IntegerField(default=0)
+
+    asistencias_presente = models.IntegerField(default=0)
+    asistencias_total = models.IntegerField(default=0)
+    porcentaje_asistencia = models.FloatField(null=True, blank=True)
+    notas_suma = models.FloatField(default=0)
+    notas_cantidad = models.IntegerField(default=0)
+    promedio_notas = models.FloatField(null=True, blank=True)
+
+    actualizado = models.DateTimeField(null=True, blank=True)
+    # Hubo escrituras de inscripciones desde `actualizado` (ver core.group_stats)
+    pendiente = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'grupo_stats'
+        verbose_name = 'Estadística de grupo'
+        verbose_name_plural = 'Estadísticas de grupos'
+        indexes = [
+            # Tablero del ciclo: filtro por ciclo, orden por nombre
+            models.Index(fields=['ciclo_id', 'nombre_grupo'], name='stats_ciclo_nombre_idx'),
+        ]
+
+    def __str__(self):
+        return f"Estadísticas {self.nombre_grupo}"
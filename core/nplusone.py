@@ -0,0 +1,112 @@
+import logging
+import sys
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+
+# ==========================================
+# DETECTOR DE CONSULTAS N+1 (desarrollo / staging)
+# ==========================================
+# Con NPLUSONE_DETECTOR activo, cada comando que llega al CommandListener de
+# core.instrumentation se reduce a una "forma" (comando + colección + filtro
+# con los valores reemplazados por '?'). Si en una misma request la misma
+# forma se repite NPLUSONE_THRESHOLD veces o más contra una de las
+# colecciones vigiladas, es casi seguro un lookup por fila: se registra la
+# vista, la línea de plantilla que lo disparó y el conteo. Con
+# NPLUSONE_STRICT la request falla con NPlusOneError.
+
+logger = logging.getLogger("core.nplusone")
+
+WATCHED_COLLECTIONS = ("niveles", "ciclos", "grupos", "catequizandos")
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def enabled():
+    return getattr(settings, "NPLUSONE_DETECTOR", False)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def shape(value):
+    """Estructura del filtro sin los valores: {'_id': {'$eq': 'x'}} -> {'_id': {'$eq': '?'}}"""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        # $in con distinta cantidad de valores sigue siendo la misma forma
+        shapes = []
+        for item in value:
+            item_shape = shape(item)
+            if item_shape not in shapes:
+                shapes.append(item_shape)
+        return shapes
+    return "?"
+
+
+def fingerprint(command_name, command):
+    collection = command.get(command_name)
+    if not isinstance(collection, str):
+        return None, None
+    if command_name == "find":
+        body = command.get("filter", {})
+    elif command_name == "aggregate":
+        body = command.get("pipeline", [])
+    elif command_name in ("count", "distinct"):
+        body = command.get("query", {})
+    else:
+        return None, None
+    return collection, repr((command_name, collection, shape(body)))
+
+
+def template_origin():
+    # Recorre la pila hasta el nodo de plantilla que se estaba renderizando
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            token = getattr(node, "token", None)
+            origin = getattr(node, "origin", None)
+            if token is not None and origin is not None:
+                return f"{origin.template_name or origin.name}:{token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+class Tracker:
+    def __init__(self):
+        self.counts = Counter()
+        self.collections = {}
+        self.origins = defaultdict(Counter)
+
+    def observe(self, command_name, command):
+        watched = _setting("NPLUSONE_COLLECTIONS", WATCHED_COLLECTIONS)
+        collection, key = fingerprint(command_name, command)
+        if key is None or collection not in watched:
+            return
+        self.counts[key] += 1
+        self.collections[key] = collection
+        self.origins[key][template_origin() or "(fuera de plantilla)"] += 1
+
+    def offenders(self):
+        threshold = _setting("NPLUSONE_THRESHOLD", 3)
+        return [(key, count) for key, count in self.counts.most_common() if count >= threshold]
+
+    def report(self, request):
+        offenders = self.offenders()
+        if not offenders:
+            return
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else request.path
+        messages = []
+        for key, count in offenders:
+            lines = ", ".join(f"{origin} x{n}" for origin, n in self.origins[key].most_common())
+            message = f"N+1 en {view}: {count} consultas iguales a '{self.collections[key]}' desde {lines} -- {key}"
+            logger.warning(message)
+            messages.append(message)
+        if _setting("NPLUSONE_STRICT", False):
+            raise NPlusOneError("\n".join(messages))
@@ -0,0 +1,187 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+
+# ==========================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# ==========================================
+# En lugar de skip/offset se filtra por la última clave vista, por lo que
+# la página 500 cuesta lo mismo que la página 1 y las inserciones
+# concurrentes no desplazan los registros entre páginas.
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _row_value(row, key):
+    # Soporta tanto instancias de modelo como filas ligeras (dicts)
+    if isinstance(row, dict):
+        return row[key]
+    return getattr(row, key)
+
+
+def _after_filter(keys, values, lookup):
+    # (k1, k2) > (v1, v2)  ==>  k1 > v1 OR (k1 = v1 AND k2 > v2)
+    condition = Q()
+    for i, key in enumerate(keys):
+        term = Q(**{f"{key}__{lookup}": values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            term &= Q(**{prev_key: prev_value})
+        condition |= term
+    return condition
+
+
+def get_page_size(request, default=None):
+    default = default or getattr(settings, "KEYSET_PAGE_SIZE", 25)
+    maximum = getattr(settings, "KEYSET_MAX_PAGE_SIZE", 200)
+    try:
+        size = int(request.GET.get("page_size", default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+class KeysetPage:
+    def __init__(self, items, page_size, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(queryset, request, keys, page_size=None):
+    """
+    Pagina `queryset` ordenando por `keys` (la última debe ser única).
+    Lee los cursores `after` / `before` y `page_size` de request.GET.
+    """
+    keys = tuple(keys)
+    size = page_size or get_page_size(request)
+    after = decode_cursor(request.GET.get("after"), len(keys))
+    before = decode_cursor(request.GET.get("before"), len(keys))
+
+    if before is not None:
+        qs = queryset.filter(_after_filter(keys, before, "lt"))
+        qs = qs.order_by(*[f"-{k}" for k in keys])
+    else:
+        qs = queryset.order_by(*keys)
+        if after is not None:
+            qs = qs.filter(_after_filter(keys, after, "gt"))
+
+    # Pedimos un registro extra para saber si existe otra página
+    rows = list(qs[:size + 1])
+    return _page(rows, size, keys, after, before)
+
+
+def _page(rows, size, keys, after, before):
+    # `rows` trae hasta size + 1 filas en el orden de la consulta (invertido
+    # si se pidió la página anterior)
+    has_more = len(rows) > size
+    rows = rows[:size]
+
+    if before is not None:
+        rows.reverse()
+        has_next = True
+        has_previous = has_more
+    else:
+        has_next = has_more
+        has_previous = after is not None
+
+    def cursor_for(row):
+        return encode_cursor(_row_value(row, k) for k in keys)
+
+    next_cursor = cursor_for(rows[-1]) if rows and has_next else None
+    previous_cursor = cursor_for(rows[0]) if rows and has_previous else None
+    return KeysetPage(rows, size, next_cursor, previous_cursor)
+
+
+# ----------------------------------------------------------------
+# Keyset sobre un aggregate
+# ----------------------------------------------------------------
+# Para órdenes que solo existen dentro de un pipeline (p. ej. la relevancia
+# del buscador): cada clave lleva su dirección y el filtro del cursor se
+# arma en MQL, después de los stages que calculan esos campos.
+
+def _after_match(keys, values, backwards=False):
+    # Igual que _after_filter, con dirección por clave: "después" de una
+    # clave descendente es $lt
+    branches = []
+    for i, (key, direction) in enumerate(keys):
+        operator = "$gt" if (direction > 0) != backwards else "$lt"
+        branch = {prev_key: prev_value for (prev_key, _), prev_value in zip(keys[:i], values[:i])}
+        branch[key] = {operator: values[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def keyset_pipeline(pipeline, keys, size, after=None, before=None, tail=(), scan=()):
+    """
+    Stages de una página: `pipeline`, el filtro del cursor, el orden y el
+    $limit (size + 1 filas), y luego `tail`, que solo ve las filas de la
+    página (p. ej. los $lookup de las columnas mostradas). `scan` va entre
+    el $sort y el $limit: filtros que no usan índice y se evalúan sobre las
+    filas ya ordenadas, hasta completar la página.
+    """
+    stages = list(pipeline)
+    if before is not None:
+        stages.append({"$match": _after_match(keys, before, backwards=True)})
+        stages.append({"$sort": {key: -direction for key, direction in keys}})
+    else:
+        if after is not None:
+            stages.append({"$match": _after_match(keys, after)})
+        stages.append({"$sort": dict(keys)})
+    stages += scan
+    stages.append({"$limit": size + 1})
+    return stages + list(tail)
+
+
+def keyset_paginate_pipeline(collection, pipeline, request, keys, page_size=None, tail=(), scan=()):
+    """
+    Pagina el resultado de `pipeline` ordenado por `keys`, pares
+    (campo, 1 | -1) con el último único. Mismos parámetros GET que
+    keyset_paginate; las filas son los documentos que produce el pipeline
+    (con `tail` aplicado), y deben conservar los campos de `keys`.
+    """
+    keys = tuple(keys)
+    fields = tuple(key for key, _ in keys)
+    size = page_size or get_page_size(request)
+    after = decode_cursor(request.GET.get("after"), len(keys))
+    before = decode_cursor(request.GET.get("before"), len(keys))
+
+    stages = keyset_pipeline(pipeline, keys, size, after, before, tail, scan)
+    rows = list(collection.aggregate(stages, allowDiskUse=True))
+    return _page(rows, size, fields, after, before)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from . import versions
+from .models import Ciclo, Nivel
+
+
+# ==========================================
+# CACHÉ DE DATOS DE REFERENCIA (NIVEL / CICLO)
+# ==========================================
+# Niveles y ciclos son colecciones diminutas que se leen en casi cada
+# request. Cada proceso guarda una copia en memoria; la copia se descarta
+# cuando vence el TTL o cuando cambia la versión publicada en el caché
+# compartido de versiones (core/versions.py, que cualquier escritura
+# renueva), así un worker no necesita consultar la base de datos para
+# resolverlas.
+#
+# La versión se lee una vez por request. Si aun así un pk no está en la
+# copia (otro worker acaba de crearlo), get() lo busca en la base en lugar
+# de darlo por inexistente.
+
+class ReferenceCache:
+    def __init__(self, model, ordering=()):
+        self.model = model
+        self.ordering = ordering
+        self.version_key = f"refcache:{model._meta.db_table}:version"
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._items = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, "REFERENCE_CACHE_TTL", 300)
+
+    def _current_version(self):
+        return versions.get(self.version_key)
+
+    def _is_fresh(self, version):
+        return (
+            self._version == version
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def snapshot(self):
+        """{pk: objeto}; leer una vez y consultar el dict en los bucles."""
+        version = self._current_version()
+        if self._is_fresh(version):
+            return self._items
+        with self._lock:
+            if not self._is_fresh(version):
+                queryset = self.model.objects.order_by(*self.ordering)
+                self._items = {obj.pk: obj for obj in queryset}
+                self._version = version
+                self._loaded_at = time.monotonic()
+            return self._items
+
+    def all(self):
+        return list(self.snapshot().values())
+
+    def get(self, pk, snapshot=None):
+        obj = (self.snapshot() if snapshot is None else snapshot).get(pk)
+        if obj is None and pk is not None:
+            obj = self.model.objects.filter(pk=pk).first()
+            if obj is not None:
+                # La copia está atrasada: recargarla en la próxima lectura
+                with self._lock:
+                    self._version = None
+        return obj
+
+    def invalidate(self):
+        # Publica una versión nueva; los demás procesos recargan en su
+        # próxima lectura y este descarta su copia de inmediato.
+        versions.bump(self.version_key)
+        with self._lock:
+            self._version = None
+
+
+def attach_references(grupo):
+    # Precarga grupo.nivel / grupo.ciclo desde el caché para que la plantilla
+    # no dispare una consulta por cada relación.
+    nivel = niveles.get(grupo.nivel_id)
+    ciclo = ciclos.get(grupo.ciclo_id)
+    if nivel is not None:
+        grupo.nivel = nivel
+    if ciclo is not None:
+        grupo.ciclo = ciclo
+    return grupo
+
+
+niveles = ReferenceCache(Nivel)
+ciclos = ReferenceCache(Ciclo, ordering=("-fecha_inicio",))
+
+_CACHES_BY_MODEL = {Nivel: niveles, Ciclo: ciclos}
+
+
+def _invalidate_on_write(sender, **kwargs):
+    _CACHES_BY_MODEL[sender].invalidate()
+
+
+# save()/delete() disparan las señales; las vistas que usan queryset.update()
+# invalidan explícitamente.
+for _model in _CACHES_BY_MODEL:
+    post_save.connect(_invalidate_on_write, sender=_model, dispatch_uid=f"refcache_save_{_model.__name__}")
+    post_delete.connect(_invalidate_on_write, sender=_model, dispatch_uid=f"refcache_delete_{_model.__name__}")
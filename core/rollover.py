@@ -0,0 +1,162 @@
+import datetime
+import hashlib
+from collections import defaultdict
+
+from django.utils import timezone
+
+from . import fragment_cache, group_stats
+from .models import Grupo, Inscripcion
+from .reference_cache import niveles
+
+
+# ==========================================
+# CAMBIO DE CICLO (ROLLOVER)
+# ==========================================
+# Al cerrar un ciclo:
+#   1. cada grupo del ciclo de origen se recrea en el ciclo destino (mismo
+#      nombre, nivel y catequistas; sesiones copiadas con las fechas
+#      desplazadas y la asistencia sin tomar);
+#   2. cada inscripción APROBADO pasa a un grupo nuevo del nivel siguiente
+#      (el de menos inscritos, si hay varios).
+#
+# El plan se arma en memoria con unas pocas consultas y se aplica con dos
+# bulk_create. Es idempotente: los ids de los grupos nuevos se derivan del
+# grupo de origen y del ciclo destino, y no se inscribe a quien ya tenga
+# inscripción en el ciclo destino; volver a ejecutarlo tras un fallo
+# parcial solo crea lo que falta.
+
+def rollover_grupo_id(grupo_id, ciclo_id):
+    return hashlib.sha1(f"{grupo_id}:{ciclo_id}".encode()).hexdigest()[:8]
+
+
+def siguiente_nivel():
+    """{nivel_id: id del nivel siguiente}, por edad mínima."""
+    ordenados = sorted(niveles.all(), key=lambda nivel: (nivel.edad_minima, nivel.nombre))
+    return {actual.pk: siguiente.pk for actual, siguiente in zip(ordenados, ordenados[1:])}
+
+
+def _shift_fecha(fecha, delta):
+    try:
+        return (datetime.date.fromisoformat(str(fecha)[:10]) + delta).isoformat()
+    except ValueError:
+        return fecha
+
+
+class RolloverPlan:
+    def __init__(self, origen, destino):
+        self.origen = origen
+        self.destino = destino
+        self.grupos_nuevos = []          # [Grupo]
+        self.grupos_existentes = []      # [(id, nombre_grupo)]
+        self.inscripciones_nuevas = []   # [Inscripcion]
+        self.ya_inscritos = []           # [catequizando_id]
+        self.sin_grupo_destino = []      # [(catequizando_id, nivel_id)]
+        self.egresados = []              # [catequizando_id] (último nivel)
+
+    @property
+    def is_empty(self):
+        return not (self.grupos_nuevos or self.inscripciones_nuevas)
+
+    def diff(self):
+        """Líneas tipo diff: + se crea, = ya existe, ! no se puede ubicar."""
+        for grupo in self.grupos_nuevos:
+            yield f"+ grupo {grupo.pk} {grupo.nombre_grupo} (nivel {grupo.nivel_id}, {len(grupo.sesiones)} sesiones)"
+        for grupo_id, nombre in self.grupos_existentes:
+            yield f"= grupo {grupo_id} {nombre}"
+        for inscripcion in self.inscripciones_nuevas:
+            yield f"+ inscripción {inscripcion.catequizando_id} -> grupo {inscripcion.grupo_id}"
+        for catequizando_id in self.ya_inscritos:
+            yield f"= inscripción {catequizando_id} (ya inscrito en {self.destino.nombre})"
+        for catequizando_id, nivel_id in self.sin_grupo_destino:
+            yield f"! {catequizando_id}: no hay grupo del nivel siguiente a {nivel_id}"
+        for catequizando_id in self.egresados:
+            yield f"  {catequizando_id}: aprobó el último nivel"
+
+    def apply(self):
+        if self.grupos_nuevos:
+            Grupo.objects.bulk_create(self.grupos_nuevos)
+        if self.inscripciones_nuevas:
+            Inscripcion.objects.bulk_create(self.inscripciones_nuevas)
+        # bulk_create no dispara señales
+        fragment_cache.bump(fragment_cache.collection(Grupo), fragment_cache.collection(Inscripcion))
+        group_stats.refresh(
+            *{grupo.pk for grupo in self.grupos_nuevos},
+            *{inscripcion.grupo_id for inscripcion in self.inscripciones_nuevas},
+        )
+
+
+def plan_rollover(origen, destino):
+    plan = RolloverPlan(origen, destino)
+    delta = destino.fecha_inicio.date() - origen.fecha_inicio.date()
+
+    # 1. Grupos: los del origen y los que ya existen en el destino
+    grupos_origen = list(
+        Grupo.objects.filter(ciclo_id=origen.pk).order_by("nombre_grupo")
+        .values("pk", "nombre_grupo", "nivel_id", "estado", "catequistas", "catequistas_busqueda", "sesiones")
+    )
+    existentes = set(Grupo.objects.filter(ciclo_id=destino.pk).values_list("pk", flat=True))
+
+    destinos_por_nivel = defaultdict(list)
+    for grupo in grupos_origen:
+        nuevo_id = rollover_grupo_id(grupo["pk"], destino.pk)
+        destinos_por_nivel[grupo["nivel_id"]].append(nuevo_id)
+        if nuevo_id in existentes:
+            plan.grupos_existentes.append((nuevo_id, grupo["nombre_grupo"]))
+            continue
+        plan.grupos_nuevos.append(Grupo(
+            id=nuevo_id,
+            nombre_grupo=grupo["nombre_grupo"],
+            ciclo_id=destino.pk,
+            nivel_id=grupo["nivel_id"],
+            estado=Grupo.Estado.ACTIVO,
+            catequistas=grupo["catequistas"],
+            catequistas_busqueda=grupo["catequistas_busqueda"],
+            sesiones=[
+                {**sesion, "fecha": _shift_fecha(sesion.get("fecha"), delta), "asistencia_tomada": False}
+                for sesion in grupo["sesiones"] or []
+            ],
+        ))
+
+    # 2. Inscripciones: aprobados del origen y quiénes ya están en el destino
+    nivel_de_grupo = {grupo["pk"]: grupo["nivel_id"] for grupo in grupos_origen}
+    aprobados = list(
+        Inscripcion.objects.filter(
+            grupo_id__in=list(nivel_de_grupo),
+            estado_inscripcion=Inscripcion.EstadoInscripcion.APROBADO,
+        ).order_by("catequizando_id").values_list("catequizando_id", "grupo_id")
+    )
+    inscritos_destino = defaultdict(int)
+    ya_en_destino = set()
+    for catequizando_id, grupo_id in Inscripcion.objects.filter(grupo_id__in=list(existentes)).values_list(
+        "catequizando_id", "grupo_id"
+    ):
+        ya_en_destino.add(catequizando_id)
+        inscritos_destino[grupo_id] += 1
+
+    siguiente = siguiente_nivel()
+    ahora = timezone.now()
+    for catequizando_id, grupo_id in aprobados:
+        if catequizando_id in ya_en_destino:
+            plan.ya_inscritos.append(catequizando_id)
+            continue
+        nivel_id = nivel_de_grupo[grupo_id]
+        nivel_siguiente = siguiente.get(nivel_id)
+        if nivel_siguiente is None:
+            plan.egresados.append(catequizando_id)
+            continue
+        candidatos = destinos_por_nivel.get(nivel_siguiente)
+        if not candidatos:
+            plan.sin_grupo_destino.append((catequizando_id, nivel_id))
+            continue
+        # Reparte entre los grupos del nivel: el de menos inscritos primero
+        grupo_destino = min(candidatos, key=lambda candidato: (inscritos_destino[candidato], candidato))
+        inscritos_destino[grupo_destino] += 1
+        ya_en_destino.add(catequizando_id)
+        plan.inscripciones_nuevas.append(Inscripcion(
+            catequizando_id=catequizando_id,
+            grupo_id=grupo_destino,
+            fecha_inscripcion=ahora,
+            estado_inscripcion=Inscripcion.EstadoInscripcion.CURSANDO,
+            estado_pago=Inscripcion.EstadoPago.PENDIENTE,
+        ))
+    return plan
@@ -0,0 +1,136 @@
+import re
+import unicodedata
+
+
+# ==========================================
+# CLAVES DE BÚSQUEDA NORMALIZADAS
+# ==========================================
+# Guardamos copias "plegadas" (sin tildes, en minúsculas) de los textos que
+# se buscan, para que Mongo pueda resolver la búsqueda con un índice usando
+# regex anclados (^...) en vez de regex sin ancla sobre el texto original.
+
+def fold(value):
+    """'  Núñez  PÉREZ ' -> 'nunez perez'"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def fold_words(value):
+    return fold(value).split()
+
+
+def catequista_keys(catequistas):
+    # Una entrada por palabra de cada nombre: el índice multikey permite
+    # buscar "maria" o "perez" indistintamente.
+    keys = set()
+    for catequista in catequistas or []:
+        keys.update(fold_words(catequista.get("nombre", "")))
+    return sorted(keys)
+
+
+def prefix_match(field, term):
+    """Filtro MQL: cada palabra de `term` debe ser prefijo de alguna clave."""
+    words = fold_words(term)
+    if not words:
+        return {}
+    return {field: {"$all": prefix_patterns(words)}}
+
+
+def prefix_patterns(words, tag=""):
+    return [re.compile("^" + re.escape(tag + word)) for word in words]
+
+
+# Las claves de catequizandos llevan un prefijo de tipo para que cada campo
+# del buscador quede acotado por el mismo índice: c: cédula, a: apellidos,
+# n: nombres. Ej: ["a:nunez", "a:perez", "c:1712345678", "n:jose", "n:maria"]
+CEDULA_TAG = "c:"
+APELLIDO_TAG = "a:"
+NOMBRE_TAG = "n:"
+
+
+def catequizando_keys(cedula, nombres=(), apellidos=()):
+    keys = set()
+    if cedula:
+        keys.add(CEDULA_TAG + fold(cedula))
+    for nombre in nombres:
+        keys.update(NOMBRE_TAG + word for word in fold_words(nombre))
+    for apellido in apellidos:
+        keys.update(APELLIDO_TAG + word for word in fold_words(apellido))
+    return sorted(keys)
+
+
+def catequizando_keys_from_doc(doc):
+    # Sirve tanto para documentos de pymongo como para instancias del modelo
+    get = doc.get if isinstance(doc, dict) else lambda name: getattr(doc, name, None)
+    return catequizando_keys(
+        get("cedula"),
+        (get("primer_nombre"), get("segundo_nombre")),
+        (get("primer_apellido"), get("segundo_apellido")),
+    )
+
+
+def rank_key(terms, keys, primer_apellido):
+    """
+    Orden de relevancia: primero las coincidencias exactas de palabra, luego
+    las que empiezan por el primer apellido buscado, y finalmente alfabético.
+    """
+    keys = set(keys or [])
+    exact = sum(1 for term in terms if term in keys)
+    apellido = fold(primer_apellido)
+    leading = any(term.startswith(APELLIDO_TAG) and apellido.startswith(term[len(APELLIDO_TAG):]) for term in terms)
+    return (-exact, not leading, apellido)
+
+
+# ----------------------------------------------------------------
+# Relevancia calculada en el servidor
+# ----------------------------------------------------------------
+# La misma regla de rank_key expresada como campos de un $project, para que
+# Mongo ordene (y pagine) todos los resultados, no solo los primeros
+# candidatos. Mongo no tiene NFKD: las vocales con tilde, la diéresis y la
+# eñe se pliegan con $replaceAll, que cubre los apellidos en español.
+
+_FOLDED_CHARS = {
+    "á": "a", "à": "a", "ä": "a", "â": "a",
+    "é": "e", "è": "e", "ë": "e", "ê": "e",
+    "í": "i", "ì": "i", "ï": "i", "î": "i",
+    "ó": "o", "ò": "o", "ö": "o", "ô": "o",
+    "ú": "u", "ù": "u", "ü": "u", "û": "u",
+    "ñ": "n", "ç": "c",
+}
+
+
+def fold_expression(expression):
+    """Expresión de agregación equivalente a fold() para textos en español."""
+    folded = {"$toLower": {"$ifNull": [expression, ""]}}
+    for char, plain in _FOLDED_CHARS.items():
+        folded = {"$replaceAll": {"input": folded, "find": char, "replacement": plain}}
+    # Palabras separadas por un solo espacio, como " ".join(texto.split())
+    return {"$reduce": {
+        "input": {"$filter": {"input": {"$split": [folded, " "]}, "cond": {"$ne": ["$$this", ""]}}},
+        "initialValue": "",
+        "in": {"$concat": ["$$value", {"$cond": [{"$eq": ["$$value", ""]}, "", " "]}, "$$this"]},
+    }}
+
+
+def rank_fields(terms, primer_apellido="$primer_apellido", keys="$claves_busqueda"):
+    """
+    Campos de rank_key para un $project: `exactas` y `inicia` (1/0) se
+    ordenan descendentes, `apellido_orden` ascendente.
+    """
+    leading = [
+        {"$eq": [{"$indexOfCP": ["$$apellido", term[len(APELLIDO_TAG):]]}, 0]}
+        for term in terms if term.startswith(APELLIDO_TAG)
+    ]
+    return {
+        "exactas": {"$add": [
+            {"$cond": [{"$in": [term, {"$ifNull": [keys, []]}]}, 1, 0]} for term in terms
+        ]},
+        "inicia": {"$let": {
+            "vars": {"apellido": fold_expression(primer_apellido)},
+            "in": {"$cond": [{"$or": leading}, 1, 0]} if leading else 0,
+        }},
+        "apellido_orden": fold_expression(primer_apellido),
+    }
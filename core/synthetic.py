@@ -0,0 +1,387 @@
+import datetime
+import hashlib
+import math
+import os
+import random
+
+from bson import ObjectId, json_util
+from django.db import connection
+
+from .models import Catequizando, Ciclo, Grupo, Inscripcion, Nivel
+from .search import catequista_keys, catequizando_keys
+
+
+# ==========================================
+# DATOS SINTÉTICOS A ESCALA DE PARROQUIA
+# ==========================================
+# Genera documentos crudos de Mongo (mismas columnas que los modelos) de
+# forma determinista: cada catequizando usa su propio random.Random
+# derivado de (semilla, índice), así que el resultado no depende del
+# tamaño de los bloques, de cuántos procesos los generen ni del orden en
+# que terminen.
+#
+# La asignación a grupos es aritmética (índice -> nivel -> grupo), de modo
+# que los procesos no necesitan coordinarse: el catequizando i está en el
+# nivel i % niveles y en el grupo (i // niveles) % grupos_por_nivel.
+
+ALUMNOS_POR_GRUPO = 25
+SESIONES_POR_GRUPO = 30
+NOTAS_POR_INSCRIPCION = 4
+
+NIVELES = (
+    ("Iniciación", 6, "Jesús es mi amigo", None),
+    ("Primera Comunión I", 7, "Camino a la Eucaristía I", None),
+    ("Primera Comunión II", 8, "Camino a la Eucaristía II", "Primera Comunión"),
+    ("Perseverancia", 10, "Vida en Cristo", None),
+    ("Confirmación I", 13, "Testigos del Espíritu I", None),
+    ("Confirmación II", 14, "Testigos del Espíritu II", "Confirmación"),
+)
+
+NOMBRES_M = ("José", "Juan", "Luis", "Carlos", "Andrés", "Mateo", "Santiago", "Daniel", "David", "Sebastián",
+             "Martín", "Nicolás", "Diego", "Gabriel", "Samuel", "Tomás", "Joaquín", "Emiliano", "Iker", "Benjamín")
+NOMBRES_F = ("María", "Ana", "Lucía", "Sofía", "Valentina", "Camila", "Isabella", "Emilia", "Martina", "Paula",
+             "Daniela", "Gabriela", "Victoria", "Renata", "Antonella", "Julieta", "Ximena", "Mía", "Sara", "Elena")
+APELLIDOS = ("Pérez", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Ramírez", "Torres", "Flores",
+             "Rivera", "Gómez", "Díaz", "Reyes", "Morales", "Cruz", "Ortiz", "Gutiérrez", "Chávez", "Ramos",
+             "Vásquez", "Castillo", "Jiménez", "Moreno", "Romero", "Herrera", "Medina", "Aguilar", "Vargas",
+             "Núñez", "Mendoza", "Guerrero", "Cedeño", "Zambrano", "Andrade", "Villacís", "Paredes")
+OCUPACIONES = ("Comerciante", "Docente", "Albañil", "Enfermera", "Chofer", "Contador", "Agricultor",
+               "Ama de casa", "Ingeniero", "Costurera", "Mecánico", "Abogada")
+PARROQUIAS = ("San José", "La Merced", "El Sagrario", "San Francisco", "Santo Domingo", "La Dolorosa")
+CIUDADES = ("Quito", "Guayaquil", "Cuenca", "Ambato", "Loja", "Manta")
+ESCUELAS = ("Unidad Educativa La Salle", "Escuela Fiscal Mixta N. 12", "Colegio San Gabriel",
+            "Unidad Educativa Santa Mariana", "Escuela Simón Bolívar")
+ANIOS = ("1RO", "2DO", "3RO", "4TO", "5TO", "6TO", "7MO", "8VO", "9NO", "10MO", "1BGU", "2BGU", "3BGU")
+SANGRE = ("O+", "O-", "A+", "A-", "B+", "AB+")
+ALERGIAS = ("Penicilina", "Maní", "Polen", "Lactosa", "Mariscos")
+ESTADOS_ASISTENCIA = ("PRESENTE",) * 17 + ("FALTA",) * 2 + ("JUSTIFICADA",)
+TEMAS = ("La Creación", "Los Mandamientos", "Los Sacramentos", "La Oración", "Los Evangelios", "La Iglesia",
+         "María, madre de Jesús", "Las Bienaventuranzas", "El Perdón", "La Eucaristía")
+
+
+def _rng(seed, *parts):
+    digest = hashlib.sha256(":".join(map(str, (seed, *parts))).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _object_id(*parts):
+    return ObjectId(hashlib.sha1(":".join(map(str, parts)).encode()).hexdigest()[:24])
+
+
+def _utc(year, month, day):
+    return datetime.datetime(year, month, day, tzinfo=datetime.timezone.utc)
+
+
+class Escenario:
+    """Parámetros del conjunto de datos; todo lo demás se deriva de ellos."""
+
+    def __init__(self, children, ciclos=2, seed=42, anio_final=None):
+        self.children = children
+        self.ciclos = ciclos
+        self.seed = seed
+        self.anio_final = anio_final or 2025
+        self.grupos_por_nivel = max(1, math.ceil(children / len(NIVELES) / ALUMNOS_POR_GRUPO))
+
+    def anio(self, ciclo):
+        return self.anio_final - (self.ciclos - 1 - ciclo)
+
+    def ciclo_id(self, ciclo):
+        return f"ciclo-{self.anio(ciclo)}"
+
+    def grupo_id(self, ciclo, nivel, k):
+        return f"g{self.anio(ciclo)}-{nivel + 1}-{k + 1:03d}"
+
+    def cedula(self, i):
+        return str(1700000000 + i)
+
+    def ubicacion(self, i, ciclo):
+        # Nivel en el ciclo más reciente; en ciclos anteriores, uno menos
+        nivel = i % len(NIVELES) - (self.ciclos - 1 - ciclo)
+        if nivel < 0:
+            return None
+        return nivel, (i // len(NIVELES)) % self.grupos_por_nivel
+
+
+# ------------------------------------------
+# Catálogos: niveles, ciclos, grupos
+# ------------------------------------------
+
+def niveles_docs():
+    return [{
+        "_id": f"nivel-{n + 1}",
+        "nombre": nombre,
+        "libro_asignado": libro,
+        "edad_minima": edad,
+        "descripcion": f"Catequesis de {nombre.lower()}",
+        "sacramento_asociado": sacramento,
+        "updated_at": _utc(2020, 1, 1),
+    } for n, (nombre, edad, libro, sacramento) in enumerate(NIVELES)]
+
+
+def ciclos_docs(escenario):
+    docs = []
+    for c in range(escenario.ciclos):
+        anio = escenario.anio(c)
+        docs.append({
+            "_id": escenario.ciclo_id(c),
+            "nombre": f"Ciclo {anio}-{anio + 1}",
+            "fecha_inicio": _utc(anio, 9, 1),
+            "fecha_fin": _utc(anio + 1, 6, 30),
+            "estado": "ABIERTO" if c == escenario.ciclos - 1 else "CERRADO",
+            "updated_at": _utc(anio, 8, 1),
+        })
+    return docs
+
+
+def sesiones(anio):
+    inicio = datetime.date(anio, 9, 6)
+    return [{
+        "sesion_id": s + 1,
+        "tema": TEMAS[s % len(TEMAS)],
+        "fecha": (inicio + datetime.timedelta(weeks=s)).isoformat(),
+        "asistencia_tomada": True,
+    } for s in range(SESIONES_POR_GRUPO)]
+
+
+def grupos_docs(escenario):
+    for c in range(escenario.ciclos):
+        anio = escenario.anio(c)
+        for n in range(len(NIVELES)):
+            for k in range(escenario.grupos_por_nivel):
+                rng = _rng(escenario.seed, "grupo", c, n, k)
+                catequistas = [
+                    {"nombre": f"{rng.choice(NOMBRES_F + NOMBRES_M)} {rng.choice(APELLIDOS)}", "tipo": "TITULAR"},
+                    {"nombre": f"{rng.choice(NOMBRES_F + NOMBRES_M)} {rng.choice(APELLIDOS)}", "tipo": "AUXILIAR"},
+                ]
+                yield {
+                    "_id": escenario.grupo_id(c, n, k),
+                    "nombre_grupo": f"{NIVELES[n][0]} {chr(65 + k % 26)}{k // 26 or ''} {anio}",
+                    "ciclo_id": escenario.ciclo_id(c),
+                    "nivel_id": f"nivel-{n + 1}",
+                    "estado": "ACTIVO" if c == escenario.ciclos - 1 else "INACTIVO",
+                    "catequistas": catequistas,
+                    "catequistas_busqueda": catequista_keys(catequistas),
+                    "sesiones": sesiones(anio),
+                    "updated_at": _utc(anio, 8, 1),
+                }
+
+
+# ------------------------------------------
+# Catequizandos e inscripciones (por bloque)
+# ------------------------------------------
+
+def _padre(rng, relacion, apellido):
+    nombres = NOMBRES_M if relacion == "PADRE" else NOMBRES_F
+    return {
+        "relacion": relacion,
+        "nombres": f"{rng.choice(nombres)} {rng.choice(nombres)}",
+        "apellidos": f"{apellido} {rng.choice(APELLIDOS)}",
+        "telefono": f"09{rng.randrange(10**8):08d}",
+        "ocupacion": rng.choice(OCUPACIONES),
+    }
+
+
+def catequizando_doc(escenario, i, rng):
+    genero = rng.choice("MF")
+    nombres = NOMBRES_M if genero == "M" else NOMBRES_F
+    primer_apellido, segundo_apellido = rng.choice(APELLIDOS), rng.choice(APELLIDOS)
+    primer_nombre, segundo_nombre = rng.choice(nombres), rng.choice(nombres)
+    cedula = escenario.cedula(i)
+
+    edad = NIVELES[i % len(NIVELES)][1]
+    nacimiento = _utc(escenario.anio_final - edad, rng.randint(1, 12), rng.randint(1, 28))
+    padres = [_padre(rng, "PADRE", primer_apellido), _padre(rng, "MADRE", segundo_apellido)]
+    if rng.random() < 0.1:
+        padres.pop(0)
+    representante = padres[0]
+    bautismo = nacimiento + datetime.timedelta(days=rng.randint(60, 900))
+
+    return {
+        "_id": cedula,
+        "cedula": cedula,
+        "primer_nombre": primer_nombre,
+        "segundo_nombre": segundo_nombre,
+        "primer_apellido": primer_apellido,
+        "segundo_apellido": segundo_apellido,
+        "genero": genero,
+        "fecha_nacimiento": nacimiento,
+        "lugar_nacimiento": rng.choice(CIUDADES),
+        "numero_hijo": rng.randint(1, 4),
+        "numero_hermanos": rng.randint(0, 5),
+        "telefono_casa": f"02{rng.randrange(10**7):07d}",
+        "direccion": f"Calle {rng.choice(APELLIDOS)} N{rng.randint(1, 80)}-{rng.randint(1, 300)}",
+        "padres": padres,
+        "representante_legal": {
+            "es_uno_de_los_padres": True,
+            "nombres": representante["nombres"],
+            "apellidos": representante["apellidos"],
+            "telefono": representante["telefono"],
+            "correo": f"{representante['nombres'].split()[0].lower()}{i}@example.com",
+        },
+        "informacion_salud": {
+            "tipo_sangre": rng.choice(SANGRE),
+            "contacto_emergencia": representante["telefono"],
+            "alergias": rng.sample(ALERGIAS, rng.choice((0, 0, 0, 1, 2))),
+            "aspectos_a_considerar": "",
+        },
+        "fe_bautismo": {
+            "fecha": bautismo.date().isoformat(),
+            "parroquia": rng.choice(PARROQUIAS),
+            "ciudad": rng.choice(CIUDADES),
+            "tomo": rng.randint(1, 60),
+            "pagina": rng.randint(1, 400),
+            "sacerdote": f"P. {rng.choice(NOMBRES_M)} {rng.choice(APELLIDOS)}",
+            "padrino": f"{rng.choice(NOMBRES_M)} {rng.choice(APELLIDOS)}",
+            "madrina": f"{rng.choice(NOMBRES_F)} {rng.choice(APELLIDOS)}",
+        },
+        "sacramentos_realizados": ["Bautismo"],
+        "escolaridad": {
+            "escuela_colegio": rng.choice(ESCUELAS),
+            "anio_en_curso": ANIOS[min(len(ANIOS) - 1, max(0, edad - 6))],
+        },
+        "observaciones_generales": None,
+        "updated_at": _utc(escenario.anio_final, 8, 1),
+        "claves_busqueda": catequizando_keys(
+            cedula, (primer_nombre, segundo_nombre), (primer_apellido, segundo_apellido),
+        ),
+    }
+
+
+def _resumen(registro, notas, actualizado):
+    # Mismos campos y redondeos que Inscripcion.array_summaries
+    conteo = {estado: sum(1 for marca in registro if marca["estado"] == estado)
+              for estado in ("PRESENTE", "FALTA", "JUSTIFICADA")}
+    valores = [nota["valor"] for nota in notas]
+    return {
+        "asistencias_presente": conteo["PRESENTE"],
+        "asistencias_falta": conteo["FALTA"],
+        "asistencias_justificada": conteo["JUSTIFICADA"],
+        "porcentaje_asistencia": round(conteo["PRESENTE"] * 100 / len(registro), 1) if registro else None,
+        "notas_cantidad": len(valores),
+        "notas_suma": sum(valores),
+        "promedio_notas": round(sum(valores) / len(valores), 2) if valores else None,
+        "resumen_actualizado": actualizado if registro or notas else None,
+    }
+
+
+def inscripcion_docs(escenario, i, rng):
+    for c in range(escenario.ciclos):
+        ubicacion = escenario.ubicacion(i, c)
+        if ubicacion is None:
+            continue
+        nivel, k = ubicacion
+        anio = escenario.anio(c)
+        actual = c == escenario.ciclos - 1
+        # En el ciclo en curso solo hay asistencia de las primeras sesiones
+        sesiones_dadas = SESIONES_POR_GRUPO // 2 if actual else SESIONES_POR_GRUPO
+        registro = [{"sesion_id": s + 1, "estado": rng.choice(ESTADOS_ASISTENCIA)} for s in range(sesiones_dadas)]
+        notas = [{
+            "descripcion": f"Evaluación {n + 1}",
+            "valor": round(rng.triangular(5, 10, 8.5), 1),
+            "fecha": (datetime.date(anio, 10, 15) + datetime.timedelta(days=30 * n)).isoformat(),
+        } for n in range(NOTAS_POR_INSCRIPCION // 2 if actual else NOTAS_POR_INSCRIPCION)]
+
+        if actual:
+            estado = "CURSANDO"
+        else:
+            estado = "APROBADO" if rng.random() < 0.9 else rng.choice(("REPROBADO", "RETIRADO"))
+        yield {
+            "_id": _object_id(escenario.seed, "inscripcion", i, c),
+            "catequizando_id": escenario.cedula(i),
+            "grupo_id": escenario.grupo_id(c, nivel, k),
+            "fecha_inscripcion": _utc(anio, 8, rng.randint(1, 31)),
+            "estado_inscripcion": estado,
+            "estado_pago": "PAGADO" if not actual or rng.random() < 0.7 else "PENDIENTE",
+            "calificaciones": notas,
+            "registro_asistencia": registro,
+            "certificado_final": {
+                "numero_certificado": f"C-{anio}-{i:07d}",
+                "fecha_emision": datetime.date(anio + 1, 7, 1).isoformat(),
+            } if estado == "APROBADO" else None,
+            # Fechas fijas (no "ahora") para que los fixtures sean reproducibles
+            **_resumen(registro, notas, _utc(anio + 1, 1, 15)),
+            "updated_at": _utc(anio + 1, 1, 15),
+        }
+
+
+def chunk_docs(escenario, start, end):
+    catequizandos, inscripciones = [], []
+    for i in range(start, end):
+        rng = _rng(escenario.seed, "catequizando", i)
+        catequizandos.append(catequizando_doc(escenario, i, rng))
+        inscripciones.extend(inscripcion_docs(escenario, i, rng))
+    return catequizandos, inscripciones
+
+
+# ------------------------------------------
+# Escritura: Mongo y/o fixtures NDJSON
+# ------------------------------------------
+
+COLLECTIONS = {
+    "niveles": Nivel,
+    "ciclos": Ciclo,
+    "grupos": Grupo,
+    "catequizandos": Catequizando,
+    "inscripciones": Inscripcion,
+}
+
+
+def populated():
+    """Nombres de COLLECTIONS que ya tienen documentos."""
+    return [
+        name for name, model in COLLECTIONS.items()
+        if connection.get_collection(model._meta.db_table).find_one({}, {"_id": 1}) is not None
+    ]
+
+
+def flush():
+    # delete_many y no drop: se conservan índices y validadores
+    for model in COLLECTIONS.values():
+        connection.get_collection(model._meta.db_table).delete_many({})
+
+
+def write_ndjson(path, docs):
+    with open(path, "w", encoding="utf-8") as fileobj:
+        for doc in docs:
+            fileobj.write(json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS))
+            fileobj.write("\n")
+
+
+def read_ndjson(path):
+    with open(path, encoding="utf-8") as fileobj:
+        for line in fileobj:
+            if line.strip():
+                yield json_util.loads(line)
+
+
+def insert(name, docs, batch_size):
+    collection = connection.get_collection(COLLECTIONS[name]._meta.db_table)
+    batch = []
+    count = 0
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            count += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        count += len(batch)
+    return count
+
+
+def generate_chunk(escenario, start, end, batch_size, fixtures_dir=None, do_insert=True):
+    """Tarea de un proceso del pool: genera, inserta y/o escribe un bloque."""
+    catequizandos, inscripciones = chunk_docs(escenario, start, end)
+    if fixtures_dir:
+        write_ndjson(os.path.join(fixtures_dir, f"catequizandos-{start:08d}.ndjson"), catequizandos)
+        write_ndjson(os.path.join(fixtures_dir, f"inscripciones-{start:08d}.ndjson"), inscripciones)
+    if do_insert:
+        insert("catequizandos", catequizandos, batch_size)
+        insert("inscripciones", inscripciones, batch_size)
+    return start, len(catequizandos), len(inscripciones)
+
+
+def load_fixture_file(path, batch_size):
+    name = os.path.basename(path).split("-")[0].split(".")[0]
+    return path, insert(name, read_ndjson(path), batch_size)
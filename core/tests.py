@@ -1,3 +1,808 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from bson import ObjectId
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import (
+    benchmark, exporter, fragment_cache, group_stats, importer, list_rows, pagination, rollover, search,
+    synthetic, versions,
+)
+from .list_rows import catequizando_search_terms
+from .migration_runner import CheckpointMismatch, MigrationRunner, checkpoints, process_range
+from .models import Catequizando, Ciclo, Grupo, GrupoStats, Inscripcion, Nivel
+from .reference_cache import ReferenceCache, ciclos, niveles
+
+
+# ==========================================
+# PRESUPUESTO DE CONSULTAS POR VISTA
+# ==========================================
+# Cada vista de core/urls.py se recorre con el cliente de pruebas y se cuenta
+# cuántos comandos de Mongo emitió (response.mongo_stats, de
+# MongoStatsMiddleware). Se comprueba que:
+#   - ninguna vista supera su tope de benchmark.QUERY_BUDGETS;
+#   - los listados cuestan lo mismo con 1, 10 y 100 filas (cero comandos
+#     por fila): una plantilla que empiece a consultar por fila rompe la
+#     prueba aunque el total siga dentro del tope;
+#   - con el detector de N+1 en modo estricto ninguna vista lo dispara.
+#
+# Los conteos son los comandos reales que emite pymongo. En CI se corren
+# contra un mongod real (MONGO_TEST_HOST=mongodb://...); sin esa variable,
+# testing.runner levanta el MongoDB en memoria de testing/fake_mongo.
+
+SIZES = (1, 10, 100)
+BATCH_SIZE = 1000
+
+# Vistas cuyo costo no debe crecer con la cantidad de filas que muestran
+LISTADOS = (
+    "catequizando_listar",
+    "catequizando_buscar apellido",
+    "grupo_listar",
+    "grupo_detail",
+    "grupo_asistencia",
+    "grupo_calificaciones",
+    "inscripcion_listar",
+    "inscripcion_buscar grupo",
+    "inscripcion_buscar pendientes",
+    "ciclo_detalle",
+    "ciclo_estadisticas",
+)
+
+
+def seed(children):
+    """Base con `children` catequizandos, una inscripción cada uno (un solo ciclo)."""
+    escenario = synthetic.Escenario(children, ciclos=1, seed=7)
+    for model in (*synthetic.COLLECTIONS.values(), GrupoStats):
+        connection.get_collection(model._meta.db_table).delete_many({})
+
+    catequizandos, inscripciones = synthetic.chunk_docs(escenario, 0, children)
+    synthetic.insert("niveles", synthetic.niveles_docs(), BATCH_SIZE)
+    synthetic.insert("ciclos", synthetic.ciclos_docs(escenario), BATCH_SIZE)
+    synthetic.insert("grupos", synthetic.grupos_docs(escenario), BATCH_SIZE)
+    synthetic.insert("catequizandos", catequizandos, BATCH_SIZE)
+    synthetic.insert("inscripciones", inscripciones, BATCH_SIZE)
+    group_stats.rebuild()
+
+    # Los insert crudos no disparan señales: recargar el caché de referencia
+    # aquí para que su carga no se cuente en la primera request
+    for reference in (niveles, ciclos):
+        reference.invalidate()
+        reference.all()
+    # Cada medición parte sin fragmentos de plantilla en caché
+    caches[fragment_cache.CACHE_ALIAS].clear()
+
+
+def commands(client, case):
+    response = case.request(client)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response, response.mongo_stats.commands
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def test_todas_las_vistas_tienen_caso(self):
+        seed(1)
+        self.assertEqual(benchmark.uncovered(benchmark.build_cases()), [])
+
+    def test_vistas_dentro_del_presupuesto(self):
+        seed(10)
+        for case in benchmark.build_cases():
+            with self.subTest(case.label):
+                response, count = commands(self.client, case)
+                self.assertLess(response.status_code, 400)
+                budget = benchmark.QUERY_BUDGETS.get(case.url_name)
+                if budget is not None:
+                    self.assertLessEqual(count, budget, f"{case.label}: {count} comandos, tope {budget}")
+
+    def test_listados_no_consultan_por_fila(self):
+        counts = {}
+        for size in SIZES:
+            seed(size)
+            for case in benchmark.build_cases():
+                if case.label in LISTADOS:
+                    counts.setdefault(case.label, {})[size] = commands(self.client, case)[1]
+
+        self.assertEqual(sorted(counts), sorted(LISTADOS))
+        for label, by_size in counts.items():
+            with self.subTest(label):
+                self.assertEqual(
+                    len(set(by_size.values())), 1,
+                    f"{label}: la cantidad de comandos crece con las filas {by_size}",
+                )
+
+    @override_settings(NPLUSONE_DETECTOR=True, NPLUSONE_STRICT=True)
+    def test_sin_n_mas_uno(self):
+        # NPlusOneError se propaga desde el cliente de pruebas
+        seed(SIZES[-1])
+        for case in benchmark.build_cases():
+            with self.subTest(case.label):
+                commands(self.client, case)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        seed(10)
+        self.cedula = connection.get_collection(Catequizando._meta.db_table).find_one({}, {"_id": 1})["_id"]
+
+    def test_acierto_no_consulta_la_base(self):
+        # El detalle siempre consulta su updated_at para el ETag (ver conditional.py)
+        for url, esperados in (
+            (reverse("catequizando_listar"), 0),
+            (reverse("catequizando_detalle", kwargs={"pk": self.cedula}), 1),
+        ):
+            with self.subTest(url):
+                primera = self.client.get(url)
+                segunda = self.client.get(url)
+                self.assertGreater(primera.mongo_stats.commands, esperados)
+                self.assertEqual(segunda.mongo_stats.commands, esperados)
+                self.assertEqual(primera.content, segunda.content)
+
+    def test_escritura_invalida_el_fragmento(self):
+        url = reverse("catequizando_detalle", kwargs={"pk": self.cedula})
+        self.client.get(url)
+        self.client.post(reverse("catequizando_editar", kwargs={"pk": self.cedula}), {
+            "telefono": "0999999999", "direccion": "Calle Nueva 123", "anioencurso": "5TO",
+            "escuelacolegio": "", "tiposangre": "O+", "alergia": "", "comentario": "",
+        })
+        response = self.client.get(url)
+        self.assertGreater(response.mongo_stats.commands, 0)
+        self.assertContains(response, "Calle Nueva 123")
+
+    def test_versiones_en_el_cache_compartido(self):
+        # Otro worker lee la versión del caché compartido, no de este proceso
+        fragment_cache.bump(fragment_cache.collection(Catequizando))
+        version = fragment_cache.versions("catequizandos")["catequizandos"]
+        self.assertEqual(caches[versions.CACHE_ALIAS].get("fragver:catequizandos"), version)
+
+    def test_pk_inexistente_sigue_en_404(self):
+        response = self.client.get(reverse("catequizando_detalle", kwargs={"pk": "no-existe"}))
+        self.assertEqual(response.status_code, 404)
+
+
+class CursorTests(SimpleTestCase):
+    def test_ida_y_vuelta(self):
+        values = ["Núñez", 17, None]
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(values), 3), values)
+
+    def test_sin_cursor(self):
+        self.assertIsNone(pagination.decode_cursor(None, 2))
+        self.assertIsNone(pagination.decode_cursor("", 2))
+
+    def test_cursor_alterado_o_invalido(self):
+        token = pagination.encode_cursor(["perez", "1700000001"])
+        for alterado in (
+            token[:-3],                                   # recortado
+            "%%%no-es-base64",
+            pagination.encode_cursor(["perez"]),          # otra cantidad de claves
+            "eyJhIjogMX0",                                # {"a": 1}: JSON que no es lista
+        ):
+            with self.subTest(alterado):
+                self.assertIsNone(pagination.decode_cursor(alterado, 2))
+
+    def test_after_filter_desempata_por_la_clave_siguiente(self):
+        condition = pagination._after_filter(("primer_apellido", "id"), ["perez", "17"], "gt")
+        esperado = Q(primer_apellido__gt="perez") | (Q(id__gt="17") & Q(primer_apellido="perez"))
+        self.assertEqual(condition, esperado)
+
+    def test_after_match_respeta_la_direccion(self):
+        keys = (("exactas", -1), ("id", 1))
+        self.assertEqual(pagination._after_match(keys, [2, "17"]), {"$or": [
+            {"exactas": {"$lt": 2}},
+            {"exactas": 2, "id": {"$gt": "17"}},
+        ]})
+        self.assertEqual(pagination._after_match(keys, [2, "17"], backwards=True), {"$or": [
+            {"exactas": {"$gt": 2}},
+            {"exactas": 2, "id": {"$lt": "17"}},
+        ]})
+
+    def test_pagina_anterior_vuelve_al_orden_normal(self):
+        rows = [{"id": "c"}, {"id": "b"}, {"id": "a"}]
+        page = pagination._page(rows, 2, ("id",), None, ["d"])
+        self.assertEqual([row["id"] for row in page], ["b", "c"])
+        self.assertTrue(page.has_next)
+        self.assertTrue(page.has_previous)
+        self.assertEqual(pagination.decode_cursor(page.previous_cursor, 1), ["b"])
+
+
+class SearchTests(TestCase):
+    NOMBRES = ("  Núñez  PÉREZ ", "Muñoz", "Güemes", "ÁLVAREZ", "de la Cruz")
+    COLLECTION = "busqueda_prueba"
+
+    def test_fold(self):
+        self.assertEqual(search.fold("  Núñez  PÉREZ "), "nunez perez")
+        self.assertEqual(search.fold(None), "")
+        self.assertEqual(search.fold_words("José María"), ["jose", "maria"])
+
+    def test_claves_con_prefijo_de_tipo(self):
+        self.assertEqual(
+            search.catequizando_keys("1712345678", ("María",), ("Núñez Pérez",)),
+            ["a:nunez", "a:perez", "c:1712345678", "n:maria"],
+        )
+
+    def test_prefijos_escapados(self):
+        (pattern,) = search.prefix_match("claves", "a.b")["claves"]["$all"]
+        self.assertTrue(pattern.match("a.bc"))
+        self.assertFalse(pattern.match("axbc"))
+        self.assertEqual(search.prefix_match("claves", "   "), {})
+
+    def test_rank_key(self):
+        terms = ["a:perez"]
+        exacta = search.rank_key(terms, ["a:perez"], "Zambrano")
+        inicia = search.rank_key(terms, ["a:pereza"], "Pereza")
+        otra = search.rank_key(terms, ["a:pereza"], "Abad")
+        self.assertEqual(sorted([otra, inicia, exacta]), [exacta, inicia, otra])
+
+    # Las expresiones del servidor deben coincidir con sus pares en Python:
+    # se evalúan con un aggregate sobre una colección de prueba
+    def project(self, docs, fields):
+        collection = connection.database[self.COLLECTION]
+        collection.delete_many({})
+        collection.insert_many([{"_id": i, **doc} for i, doc in enumerate(docs)])
+        self.addCleanup(collection.drop)
+        return list(collection.aggregate([{"$sort": {"_id": 1}}, {"$project": {"_id": 0, **fields}}]))
+
+    def test_fold_expression_igual_a_fold(self):
+        rows = self.project([{"apellido": nombre} for nombre in self.NOMBRES],
+                            {"folded": search.fold_expression("$apellido")})
+        self.assertEqual([row["folded"] for row in rows], [search.fold(nombre) for nombre in self.NOMBRES])
+
+    def test_rank_fields_igual_a_rank_key(self):
+        terms = ["a:nu", "a:perez"]
+        docs = [
+            {"primer_apellido": apellido, "claves_busqueda": keys}
+            for apellido, keys in (("Núñez", ["a:nunez", "a:perez"]), ("Pérez", ["a:perez"]), ("Abad", ["a:nuno"]))
+        ]
+        for doc, fields in zip(docs, self.project(docs, search.rank_fields(terms))):
+            with self.subTest(doc["primer_apellido"]):
+                self.assertEqual(
+                    (-fields["exactas"], not fields["inicia"], fields["apellido_orden"]),
+                    search.rank_key(terms, doc["claves_busqueda"], doc["primer_apellido"]),
+                )
+
+
+class CatequizandoSearchTests(TestCase):
+    APELLIDOS = ("Núñez", "Nuñez Pérez", "Nunes", "NU", "Nuño", "Pérez Núñez", "Ñuste", "Andrade")
+
+    def setUp(self):
+        self.client = Client()
+        collection = connection.get_collection(Catequizando._meta.db_table)
+        collection.delete_many({})
+        docs = []
+        for i in range(40):
+            primer = self.APELLIDOS[i % len(self.APELLIDOS)]
+            segundo = self.APELLIDOS[(i * 3 + 1) % len(self.APELLIDOS)]
+            cedula = f"17{i:08d}"
+            docs.append({
+                "_id": cedula, "cedula": cedula, "primer_nombre": "Ana", "primer_apellido": primer,
+                "segundo_apellido": segundo,
+                "claves_busqueda": search.catequizando_keys(cedula, ("Ana",), (primer, segundo)),
+            })
+        collection.insert_many(docs)
+        self.docs = docs
+
+    def test_ranking_completo_y_paginado(self):
+        terms = catequizando_search_terms(apellido="nu")
+        esperado = [doc["_id"] for doc in sorted(
+            (doc for doc in self.docs if any(key.startswith("a:nu") for key in doc["claves_busqueda"])),
+            key=lambda doc: (*search.rank_key(terms, doc["claves_busqueda"], doc["primer_apellido"]), doc["_id"]),
+        )]
+        self.assertGreater(len(esperado), 7)
+
+        url = reverse("catequizando_buscar")
+        vistos, params, paginas = [], {"apellido": "nu", "page_size": 7}, []
+        while True:
+            page = self.client.get(url, params).context["page"]
+            paginas.append(params)
+            vistos += [row["id"] for row in page]
+            if not page.has_next:
+                break
+            params = {"apellido": "nu", "page_size": 7, "after": page.next_cursor}
+        self.assertEqual(vistos, esperado)
+
+        # Volver atrás desde la segunda página devuelve la primera
+        segunda = self.client.get(url, paginas[1]).context["page"]
+        primera = self.client.get(url, {"apellido": "nu", "page_size": 7, "before": segunda.previous_cursor})
+        self.assertEqual([row["id"] for row in primera.context["page"]], esperado[:7])
+
+    def test_cursor_alterado_vuelve_a_la_primera_pagina(self):
+        response = self.client.get(reverse("catequizando_buscar"), {"apellido": "nu", "after": "no-es-un-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["page"].has_previous)
+
+    def test_rebuild_search_keys_solo_escribe_las_claves_viejas(self):
+        collection = connection.get_collection(Catequizando._meta.db_table)
+        collection.update_one({"_id": self.docs[0]["_id"]}, {"$set": {"claves_busqueda": []}})
+        stdout = io.StringIO()
+        call_command("rebuild_search_keys", stdout=stdout)
+        self.assertIn(f"{Catequizando._meta.db_table}: 1 documentos actualizados", stdout.getvalue())
+        self.assertEqual(collection.find_one({"_id": self.docs[0]["_id"]})["claves_busqueda"],
+                         self.docs[0]["claves_busqueda"])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        seed(10)
+
+    def test_detalles_responden_304(self):
+        for case in benchmark.build_cases():
+            if not case.url_name.endswith(("_detalle", "_detail")) or case.method != "GET":
+                continue
+            with self.subTest(case.label):
+                primera = self.client.get(case.url)
+                self.assertEqual(primera.status_code, 200)
+                self.assertTrue(primera.has_header("ETag"))
+                self.assertTrue(primera.has_header("Last-Modified"))
+
+                segunda = self.client.get(case.url, HTTP_IF_NONE_MATCH=primera["ETag"])
+                self.assertEqual(segunda.status_code, 304)
+                # Solo la consulta proyectada de updated_at
+                self.assertLessEqual(segunda.mongo_stats.commands, 1)
+
+                tercera = self.client.get(case.url, HTTP_IF_MODIFIED_SINCE=primera["Last-Modified"])
+                self.assertEqual(tercera.status_code, 304)
+
+    def test_escritura_cambia_el_etag(self):
+        cedula = connection.get_collection(Catequizando._meta.db_table).find_one({}, {"_id": 1})["_id"]
+        url = reverse("catequizando_detalle", kwargs={"pk": cedula})
+        etag = self.client.get(url)["ETag"]
+        self.client.post(reverse("catequizando_editar", kwargs={"pk": cedula}), {
+            "telefono": "0999999999", "direccion": "Calle Nueva 123", "anioencurso": "5TO",
+            "escuelacolegio": "", "tiposangre": "O+", "alergia": "", "comentario": "",
+        })
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+    def test_etag_del_grupo_sigue_al_nivel_editado_en_otro_worker(self):
+        grupo = connection.get_collection("grupos").find_one({}, {"nivel_id": 1})
+        url = reverse("grupo_detail", kwargs={"pk": grupo["_id"]})
+        etag = self.client.get(url)["ETag"]
+        # Escritura cruda: la copia de niveles de este proceso no se entera
+        connection.get_collection("niveles").update_one(
+            {"_id": grupo["nivel_id"]}, {"$set": {"updated_at": datetime.datetime(2030, 1, 1)}},
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+
+
+class InscripcionListTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        seed(12)
+
+    def test_listado_paginado_recorre_todas(self):
+        total = connection.get_collection("inscripciones").count_documents({})
+        vistas, params = [], {"page_size": 5}
+        while True:
+            response = self.client.get(reverse("inscripcion_listar"), params)
+            page = response.context["page"]
+            self.assertLessEqual(len(page), 5)
+            vistas += [(row["catequizando_id"], row["grupo_id"]) for row in page]
+            if not page.has_next:
+                break
+            params = {"page_size": 5, "after": page.next_cursor}
+        self.assertEqual(len(vistas), total)
+        self.assertEqual(vistas, sorted(set(vistas)))
+
+    def test_prefijo_de_cedula_frecuente_filtra_sobre_las_filas_ordenadas(self):
+        def buscar(**params):
+            response = self.client.get(reverse("inscripcion_buscar"), {"cedula": prefijo, **params})
+            return response.context["page"]
+
+        prefijo = connection.get_collection("catequizandos").find_one({}, {"cedula": 1})["cedula"][:1]
+        esperado = [(row["catequizando_id"], row["grupo_id"]) for row in buscar(page_size=200)]
+        self.assertGreater(len(esperado), 2)
+        with mock.patch.object(list_rows, "CEDULA_IDS_LIMIT", 2):
+            self.assertIsNone(list_rows.catequizando_ids_por_cedula(prefijo))
+            page = buscar(page_size=2)
+            segunda = buscar(page_size=200, after=page.next_cursor)
+        self.assertEqual([(row["catequizando_id"], row["grupo_id"]) for row in [*page, *segunda]], esperado)
+
+
+class ExporterTests(SimpleTestCase):
+    def test_flatten(self):
+        doc = {
+            "fe_bautismo": {"fecha": datetime.datetime(2015, 3, 2, 10, 30), "parroquia": "San Blas"},
+            "informacion_salud": {"alergias": ["polen", "", None, "nueces"]},
+            "escolaridad": None,
+        }
+        row = exporter.flatten(doc, ("fe_bautismo.fecha", "fe_bautismo.parroquia", "informacion_salud.alergias",
+                                     "escolaridad.anio_en_curso", "padre.nombres"))
+        self.assertEqual(row, {
+            "fe_bautismo.fecha": "2015-03-02",
+            "fe_bautismo.parroquia": "San Blas",
+            "informacion_salud.alergias": "polen; nueces",
+            "escolaridad.anio_en_curso": None,
+            "padre.nombres": None,
+        })
+
+    def test_padres_en_columnas(self):
+        doc = exporter._with_parents({"_id": "1712345678", "padres": [
+            {"relacion": "MADRE", "nombres": "Ana"},
+            {"relacion": "Padre", "nombres": "Luis"},
+            {"relacion": "TIO", "nombres": "Juan"},
+        ]})
+        self.assertEqual(doc["id"], "1712345678")
+        self.assertNotIn("_id", doc)
+        self.assertEqual((doc["padre"]["nombres"], doc["madre"]["nombres"]), ("Luis", "Ana"))
+
+    def test_csv_con_bom_y_cabecera(self):
+        lines = list(exporter.csv_lines([{"a": 1, "b": "x,y"}], ("a", "b")))
+        self.assertEqual(lines, ["\ufeffa,b\r\n", '1,"x,y"\r\n'])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        seed(3)
+
+    def test_inscripcion_huerfana_sale_con_columnas_en_blanco(self):
+        inscripciones = connection.get_collection("inscripciones")
+        huerfana = inscripciones.find_one({}, {"catequizando_id": 1})
+        connection.get_collection("catequizandos").delete_one({"_id": huerfana["catequizando_id"]})
+
+        rows = list(exporter.inscripcion_export_rows())
+        self.assertEqual(len(rows), inscripciones.count_documents({}))
+        (row,) = [row for row in rows if row["catequizando_id"] == huerfana["catequizando_id"]]
+        self.assertIsNone(row["cedula"])
+        lines = list(exporter.csv_lines([row], exporter.INSCRIPCION_COLUMNS))
+        self.assertIn(f"{huerfana['catequizando_id']},,,", lines[1])
+
+
+class GroupStatsTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        seed(4)
+        self.inscripcion = connection.get_collection("inscripciones").find_one({}, {"grupo_id": 1, "catequizando_id": 1})
+        self.grupo_id = self.inscripcion["grupo_id"]
+        self.ciclo_id = GrupoStats.objects.get(pk=self.grupo_id).ciclo_id
+
+    def notas(self):
+        return GrupoStats.objects.values_list("notas_cantidad", flat=True).get(pk=self.grupo_id)
+
+    def test_escritura_marca_y_el_tablero_recalcula(self):
+        antes = self.notas()
+        for valor in (8, 9):
+            self.client.post(reverse("inscripcion_nota", kwargs={
+                "catequizando_id": self.inscripcion["catequizando_id"], "grupo_id": self.grupo_id,
+            }), {"descripcion": "Prueba", "valor": valor})
+        # Las escrituras solo marcan la fila
+        self.assertEqual(self.notas(), antes)
+        self.assertTrue(GrupoStats.objects.get(pk=self.grupo_id).pendiente)
+
+        (row,) = [row for row in group_stats.ciclo_rows(self.ciclo_id) if row["id"] == self.grupo_id]
+        self.assertEqual(row["notas_cantidad"], antes + 2)
+        self.assertFalse(row["pendiente"])
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        seed(1)
+
+    def test_bytes_solo_a_pedido(self):
+        url = reverse("catequizando_listar")
+        response = self.client.get(url)
+        self.assertIsNone(response.mongo_stats.bytes)
+        self.assertNotIn("db-bytes", response["Server-Timing"])
+
+        with override_settings(MONGO_STATS_BYTES=True):
+            caches[fragment_cache.CACHE_ALIAS].clear()
+            response = self.client.get(url)
+        self.assertGreater(response.mongo_stats.bytes, 0)
+        self.assertIn("db-bytes", response["Server-Timing"])
+
+
+class ImporterTests(SimpleTestCase):
+    FILA = {
+        "cedula": "1712345678", "primernombre": "Ana", "primerapellido": "Núñez", "segundoapellido": "Pérez",
+        "fechanacimiento": "2016-05-04", "genero": "F", "direccion": "Calle 1", "lugar_nacimiento": "Quito",
+        "tiposangre": "O+", "numerohijo": "1", "numerohermanos": "0",
+    }
+
+    def test_fila_valida(self):
+        row_number, data, errors = importer.validate_row((2, self.FILA))
+        self.assertEqual(row_number, 2)
+        self.assertIsNone(errors)
+        self.assertEqual(data["fechanacimiento"], datetime.date(2016, 5, 4))
+
+    def test_fila_invalida(self):
+        row_number, data, errors = importer.validate_row((7, {**self.FILA, "cedula": "17-1", "genero": ""}))
+        self.assertEqual(row_number, 7)
+        self.assertIsNone(data)
+        self.assertEqual(set(errors), {"cedula", "genero"})
+
+    def test_celdas(self):
+        self.assertEqual(importer._cell(None), "")
+        self.assertEqual(importer._cell(1712345678.0), "1712345678")
+        self.assertEqual(importer._cell(datetime.datetime(2016, 5, 4, 8)), "2016-05-04")
+        self.assertEqual(importer._cell("  Ana "), "Ana")
+
+    def test_csv(self):
+        rows = list(importer.read_csv(io.StringIO("cedula ,primernombre\n1712345678, Ana \n")))
+        self.assertEqual(rows, [{"cedula": "1712345678", "primernombre": "Ana"}])
+
+    def test_formato_no_soportado(self):
+        with self.assertRaises(ValueError):
+            importer.read_rows(io.BytesIO(), "catequizandos.txt")
+
+
+class ImporterPoolTests(SimpleTestCase):
+    def test_valida_por_lotes_sin_leer_todo_el_archivo(self):
+        leidas = 0
+
+        def rows():
+            nonlocal leidas
+            for i in range(2000):
+                leidas += 1
+                yield {"cedula": str(i)}
+
+        validated = importer._validated(rows(), workers=2)
+        primera = next(validated)
+        self.assertEqual(primera[0], 2)
+        self.assertLessEqual(leidas, 2 * importer.VALIDATION_CHUNKS_PER_WORKER * importer.VALIDATION_CHUNK_SIZE)
+
+        numeros = [primera[0]] + [row_number for row_number, _, _ in validated]
+        self.assertEqual(numeros, list(range(2, 2002)))
+
+
+class ImporterWriteTests(TestCase):
+    def setUp(self):
+        connection.get_collection(Catequizando._meta.db_table).delete_many({})
+
+    def test_cedula_registrada_entre_lotes_es_error_de_fila(self):
+        filas = [{**ImporterTests.FILA, "cedula": cedula} for cedula in ("1712345678", "1712345679", "1712345680")]
+        # Otra importación registra la segunda cédula mientras esta valida
+        connection.get_collection(Catequizando._meta.db_table).insert_one({"_id": "1712345679"})
+
+        result = importer.import_catequizandos(filas)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([row_number for row_number, _ in result.errors], [3])
+        self.assertIn("cedula", result.errors[0][1])
+        self.assertEqual(Catequizando.objects.filter(pk__in=["1712345678", "1712345680"]).count(), 2)
+
+
+class ReferenceCacheTests(TestCase):
+    def setUp(self):
+        seed(1)
+        self.ciclo = {
+            "_id": "ciclo-nuevo", "nombre": "Ciclo nuevo", "estado": "ABIERTO",
+            "fecha_inicio": synthetic._utc(2030, 9, 1), "fecha_fin": synthetic._utc(2031, 6, 30),
+        }
+
+    def test_escritura_invalida_otros_workers(self):
+        # Otro proceso: su propia copia en memoria, la misma versión compartida
+        otro_worker = ReferenceCache(Ciclo, ordering=("-fecha_inicio",))
+        self.assertIsNone(otro_worker.snapshot().get("ciclo-nuevo"))
+        Ciclo.objects.create(**{("id" if key == "_id" else key): value for key, value in self.ciclo.items()})
+        self.assertIn("ciclo-nuevo", otro_worker.snapshot())
+
+    def test_pk_ausente_de_la_copia_se_busca_en_la_base(self):
+        ciclos.all()
+        connection.get_collection(Ciclo._meta.db_table).insert_one(self.ciclo)
+        self.assertEqual(ciclos.get("ciclo-nuevo").nombre, "Ciclo nuevo")
+        self.assertIsNone(ciclos.get("no-existe"))
+
+
+class RolloverPlanTests(SimpleTestCase):
+    def test_id_de_grupo_estable(self):
+        self.assertEqual(rollover.rollover_grupo_id("g1", "2026"), rollover.rollover_grupo_id("g1", "2026"))
+        self.assertNotEqual(rollover.rollover_grupo_id("g1", "2026"), rollover.rollover_grupo_id("g1", "2027"))
+
+    def test_fechas_desplazadas(self):
+        delta = datetime.timedelta(days=364)
+        self.assertEqual(rollover._shift_fecha("2025-03-01", delta), "2026-02-28")
+        self.assertEqual(rollover._shift_fecha("por definir", delta), "por definir")
+
+    def test_siguiente_nivel_por_edad(self):
+        niveles = [Nivel(id="n3", nombre="Confirmación", edad_minima=12),
+                   Nivel(id="n1", nombre="Iniciación", edad_minima=7),
+                   Nivel(id="n2", nombre="Comunión", edad_minima=9)]
+        with mock.patch.object(rollover.niveles, "all", return_value=niveles):
+            self.assertEqual(rollover.siguiente_nivel(), {"n1": "n2", "n2": "n3"})
+
+    def test_diff(self):
+        plan = rollover.RolloverPlan(Ciclo(id="2025", nombre="2025"), Ciclo(id="2026", nombre="2026"))
+        self.assertTrue(plan.is_empty)
+        plan.grupos_nuevos.append(Grupo(id="abc", nombre_grupo="A", nivel_id="n2", sesiones=[{}, {}]))
+        plan.grupos_existentes.append(("def", "B"))
+        plan.inscripciones_nuevas.append(Inscripcion(catequizando_id="17", grupo_id="abc"))
+        plan.sin_grupo_destino.append(("18", "n3"))
+        self.assertFalse(plan.is_empty)
+        self.assertEqual(list(plan.diff()), [
+            "+ grupo abc A (nivel n2, 2 sesiones)",
+            "= grupo def B",
+            "+ inscripción 17 -> grupo abc",
+            "! 18: no hay grupo del nivel siguiente a n3",
+        ])
+
+
+def marcar_migrado(doc):
+    return {"migrado": True}
+
+
+class MigrationRunnerTests(TestCase):
+    COLLECTION = "migracion_prueba"
+
+    def setUp(self):
+        self.coll = connection.database[self.COLLECTION]
+        self.coll.delete_many({})
+        checkpoints().delete_many({})
+        # _id de tres tipos BSON: un rango que los mezcle no encuentra nada
+        self.coll.insert_many(
+            [{"_id": f"id-{i:03d}"} for i in range(30)]
+            + [{"_id": ObjectId()} for _ in range(30)]
+            + [{"_id": i} for i in range(10)]
+        )
+        self.runner = MigrationRunner(
+            "prueba", self.COLLECTION, "core.tests.marcar_migrado", workers=1, partitions=6, batch_size=7,
+        )
+
+    def process(self, index, bounds):
+        process_range(
+            self.runner.name, self.COLLECTION, {}, None, self.runner.transform, index, bounds, 7, False,
+        )
+
+    def test_rangos_por_tipo_no_saltan_documentos(self):
+        pending, total = self.runner.plan()
+        self.assertEqual({bounds[0] for _, bounds in pending}, {"string", "objectId", "int"})
+        for index, bounds in pending:
+            self.process(index, bounds)
+        self.assertEqual(self.coll.count_documents({"migrado": {"$ne": True}}), 0)
+
+    def test_reprocesar_un_rango_no_duplica_el_conteo(self):
+        pending, total = self.runner.plan()
+        for index, bounds in [*pending, pending[0]]:
+            self.process(index, bounds)
+        state = checkpoints().find_one({"_id": self.runner.name})
+        self.assertEqual(sum(state["changed_by_range"].values()), 70)
+        self.assertEqual(len(state["completed"]), total)
+
+    def test_no_reanuda_con_otro_filtro_o_transformacion(self):
+        self.runner.plan()
+        self.assertEqual(checkpoints().find_one({"_id": self.runner.name})["transform"], self.runner.transform)
+        self.runner.plan()
+        for cambio in ({"criteria": {"migrado": {"$ne": True}}}, {"transform": "core.data_migrations.updated_at"}):
+            otro = MigrationRunner("prueba", self.COLLECTION, **{"transform": self.runner.transform, **cambio})
+            with self.assertRaises(CheckpointMismatch):
+                otro.plan()
+
+
+class SyncIndexesTests(TestCase):
+    def sync(self):
+        stdout = io.StringIO()
+        call_command("sync_indexes", stdout=stdout)
+        return stdout.getvalue()
+
+    def test_compara_las_opciones_ademas_de_las_claves(self):
+        self.sync()
+        self.assertNotRegex(self.sync(), r"(?m)^  [+~?]")
+
+        # Mismas claves pero sin unique: se recrea
+        collection = connection.get_collection(Inscripcion._meta.db_table)
+        collection.drop_index("unique_inscripcion_alumno_grupo")
+        collection.create_index([("catequizando_id", 1), ("grupo_id", 1)], name="unique_inscripcion_alumno_grupo")
+        self.assertIn("~ unique_inscripcion_alumno_grupo", self.sync())
+        self.assertTrue(collection.index_information()["unique_inscripcion_alumno_grupo"].get("unique"))
+
+    def test_indice_equivalente_con_otro_nombre(self):
+        collection = connection.get_collection(Inscripcion._meta.db_table)
+        if "inscripciones_grupo_id_idx" in collection.index_information():
+            collection.drop_index("inscripciones_grupo_id_idx")
+        collection.create_index([("grupo_id", 1)], name="grupo_id_viejo")
+        self.addCleanup(collection.drop_index, "grupo_id_viejo")
+        output = self.sync()
+        self.assertIn("= inscripciones_grupo_id_idx (existe como grupo_id_viejo)", output)
+        self.assertNotIn("grupo_id_viejo (no declarado)", output)
+
+
+class GenerateDataTests(TestCase):
+    def test_no_inserta_sobre_una_base_poblada(self):
+        seed(1)
+        with self.assertRaisesMessage(CommandError, "--flush"):
+            call_command("generate_data", children=1, workers=1, stdout=io.StringIO())
+        self.assertEqual(Catequizando.objects.count(), 1)
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        seed(1)
+
+    def labels(self, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "benchmark.json")
+            call_command("benchmark_views", only="inscripcion_nota", iterations=1, output=output,
+                         stdout=io.StringIO(), **options)
+            with open(output, encoding="utf-8") as fileobj:
+                return set(json.load(fileobj)["sizes"]["actual"])
+
+    def test_sin_sizes_omite_los_post(self):
+        self.assertEqual(self.labels(), {"inscripcion_nota"})
+
+    def test_allow_writes_incluye_los_post(self):
+        self.assertEqual(self.labels(allow_writes=True), {"inscripcion_nota", "inscripcion_nota POST"})
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_fragmentos_desactivados_miden_las_consultas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "benchmark.json")
+            call_command("benchmark_views", only="catequizando_listar", iterations=3, output=output,
+                         fragments="both", stdout=io.StringIO())
+            with open(output, encoding="utf-8") as fileobj:
+                sizes = json.load(fileobj)["sizes"]
+        self.assertGreater(sizes["actual"]["catequizando_listar"]["commands"]["p50"], 0)
+        self.assertEqual(sizes["actual fragmentos"]["catequizando_listar"]["commands"]["max"], 0)
+
+    def test_invalidate_all_cambia_todas_las_claves(self):
+        scope = fragment_cache.row(Catequizando, "1700000000")
+        antes = fragment_cache.context(scope)["key"]
+        caches[fragment_cache.CACHE_ALIAS].set("contenido", "viejo")
+        fragment_cache.invalidate_all()
+        self.assertNotEqual(fragment_cache.context(scope)["key"], antes)
+        self.assertIsNone(caches[fragment_cache.CACHE_ALIAS].get("contenido"))
+
+
+class NormalizeDatesTests(TestCase):
+    def setUp(self):
+        self.db = connection.database
+        if "catequizandos" not in self.db.list_collection_names():
+            self.db.create_collection("catequizandos")
+        self.db["catequizandos"].delete_many({})
+        checkpoints().delete_many({"_id": {"$regex": "^normalize_dates:"}})
+        self.db.command("collMod", "catequizandos", validationLevel="moderate")
+
+    def tearDown(self):
+        self.db.command("collMod", "catequizandos", validationLevel="strict")
+
+    def bautismo(self, pk):
+        self.db["catequizandos"].insert_one({"_id": pk, "fe_bautismo": {"fecha": datetime.datetime(2015, 3, 2)}})
+
+    def normalize(self):
+        call_command("normalize_dates", stdout=io.StringIO())
+        return self.db["catequizandos"].count_documents({"fe_bautismo.fecha": {"$type": "date"}})
+
+    def test_una_ejecucion_completa_no_impide_la_siguiente(self):
+        self.bautismo("a")
+        self.assertEqual(self.normalize(), 0)
+        self.bautismo("b")
+        self.assertEqual(self.normalize(), 0)
+        self.assertEqual(self.db["catequizandos"].find_one({"_id": "b"})["fe_bautismo"]["fecha"], "2015-03-02")
+
+    def test_marca_updated_at_e_invalida_los_fragmentos(self):
+        scope = fragment_cache.row(Catequizando, "a")
+        for client_side in (False, True):
+            with self.subTest(client_side=client_side):
+                self.db["catequizandos"].delete_many({})
+                self.bautismo("a")
+                version = fragment_cache.versions(scope)[scope]
+                call_command("normalize_dates", client_side=client_side, stdout=io.StringIO())
+                doc = self.db["catequizandos"].find_one({"_id": "a"})
+                self.assertEqual(doc["fe_bautismo"]["fecha"], "2015-03-02")
+                self.assertIsNotNone(doc.get("updated_at"))
+                self.assertNotEqual(fragment_cache.versions(scope)[scope], version)
+
+    def test_restaura_el_nivel_de_validacion_anterior_a_un_corte(self):
+        # Una ejecución que murió con la validación apagada
+        checkpoints().insert_one({"_id": "normalize_dates:validationLevel:catequizandos", "level": "moderate"})
+        self.db.command("collMod", "catequizandos", validationLevel="off")
+        self.bautismo("a")
+        self.normalize()
+        info = next(self.db.list_collections(filter={"name": "catequizandos"}))
+        self.assertEqual(info["options"]["validationLevel"], "moderate")
@@ -6,6 +6,8 @@ from .views import (
     catequizando_buscar,
     catequizando_eliminar,
     catequizando_listar,
+    catequizando_importar,
+    catequizando_exportar,
     
     # Grupos
     grupo_listar,
@@ -15,6 +17,8 @@ from .views import (
     GrupoUpdateView,
     grupo_eliminar,
     GrupoAddSesionView,
+    GrupoAsistenciaView,
+    GrupoCalificacionesView,
 
 
     # Inscripciones
@@ -24,11 +28,14 @@ from .views import (
     InscripcionUpdateView,
     inscripcion_eliminar,
     inscripcion_buscar,
+    inscripcion_exportar,
     InscripcionTomarAsistenciaView,
     InscripcionAgregarNotaView,
 
     # Ciclos
     ciclo_listar,
+    ciclo_estadisticas,
+    request_stats,
     CicloCreateView,
     CicloUpdateView,
     CicloDetailView,
@@ -43,6 +50,8 @@ urlpatterns = [
     path('catequizandos/<str:pk>/detalle/', CatequizandoDetailView.as_view(), name='catequizando_detalle'),
     path('catequizandos/<str:pk>/editar/', CatequizandoUpdateView.as_view(), name='catequizando_editar'),
     path('catequizandos/crear/', CatequizandoCreateView.as_view(), name='catequizando_crear'),
+    path('catequizandos/importar/', catequizando_importar, name='catequizando_importar'),
+    path('catequizandos/exportar/', catequizando_exportar, name='catequizando_exportar'),
     path("catequizandos/<str:persona_id>/eliminar/", catequizando_eliminar, name="catequizando_eliminar"),
     path("catequizandos/buscar/", catequizando_buscar, name="catequizando_buscar"),
 
@@ -56,6 +65,8 @@ urlpatterns = [
     path("grupos/<str:pk>/eliminar/", grupo_eliminar, name="grupo_eliminar"),
     path("grupos/buscar/", grupo_buscar, name="grupo_buscar"),
     path("grupos/<str:pk>/sesiones/nueva/", GrupoAddSesionView.as_view(), name="grupo_add_sesion"),
+    path("grupos/<str:pk>/sesiones/<int:sesion_id>/asistencia/", GrupoAsistenciaView.as_view(), name="grupo_asistencia"),
+    path("grupos/<str:pk>/calificaciones/", GrupoCalificacionesView.as_view(), name="grupo_calificaciones"),
 
     # ==========================
     # INSCRIPCIONES
@@ -66,6 +77,7 @@ urlpatterns = [
     path("inscripciones/<str:catequizando_id>/<str:grupo_id>/editar/", InscripcionUpdateView.as_view(), name="inscripcion_editar"),
     path("inscripciones/<str:catequizando_id>/<str:grupo_id>/eliminar/", inscripcion_eliminar, name="inscripcion_eliminar"),
     path("inscripciones/buscar/", inscripcion_buscar, name="inscripcion_buscar"),
+    path("inscripciones/exportar/", inscripcion_exportar, name="inscripcion_exportar"),
     
     # Nuevas rutas para Asistencia y Notas
     path("inscripciones/<str:catequizando_id>/<str:grupo_id>/asistencia/", InscripcionTomarAsistenciaView.as_view(), name="inscripcion_asistencia"),
@@ -78,6 +90,12 @@ urlpatterns = [
     path("ciclos/", ciclo_listar, name="ciclo_listar"),
     path("ciclos/crear/", CicloCreateView.as_view(), name="ciclo_crear"),
     path("ciclos/<str:pk>/detalle/", CicloDetailView.as_view(), name="ciclo_detalle"),
+    path("ciclos/<str:pk>/estadisticas/", ciclo_estadisticas, name="ciclo_estadisticas"),
     path("ciclos/<str:pk>/editar/", CicloUpdateView.as_view(), name="ciclo_editar"),
     path("ciclos/<str:pk>/eliminar/", ciclo_eliminar, name="ciclo_eliminar"),
+
+    # ==========================
+    # INSTRUMENTACIÓN
+    # ==========================
+    path("_stats/requests/", request_stats, name="request_stats"),
 ]
@@ -0,0 +1,88 @@
+import contextvars
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+
+# ==========================================
+# VERSIONES COMPARTIDAS DE LOS CACHÉS
+# ==========================================
+# El caché de referencia (niveles/ciclos) y el de fragmentos se invalidan
+# publicando una versión nueva (una marca de tiempo) en el alias de caché
+# "versions". Ese alias tiene que ser compartido por todos los workers
+# ('file' por defecto, 'redis' entre máquinas): con un caché por proceso,
+# una escritura solo invalidaría al worker que la atendió.
+#
+# Dentro de una request cada versión se lee una sola vez (VersionsMiddleware
+# la memoriza); las escrituras de la misma request actualizan esa copia.
+
+CACHE_ALIAS = "versions"
+
+_request_versions = contextvars.ContextVar("cache_versions", default=None)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def get_many(*keys):
+    """
+    {clave: versión}. Una clave sin versión (nunca escrita o desalojada)
+    recibe una nueva en vez de 0, para no revivir datos cacheados viejos.
+    """
+    memo = _request_versions.get()
+    found = {key: memo[key] for key in keys if key in memo} if memo is not None else {}
+    missing = [key for key in keys if key not in found]
+    if missing:
+        cache = _cache()
+        loaded = cache.get_many(missing)
+        for key in missing:
+            if key not in loaded:
+                cache.add(key, time.time_ns(), timeout=None)
+                loaded[key] = cache.get(key)
+        found.update(loaded)
+        if memo is not None:
+            memo.update(loaded)
+    return {key: found[key] for key in keys}
+
+
+def get(key):
+    return get_many(key)[key]
+
+
+def bump(*keys):
+    # Una marca de tiempo en lugar de incr(): un solo set_many sin importar
+    # cuántas claves cambien, y sin depender de que la clave exista.
+    version = time.time_ns()
+    values = {key: version for key in keys}
+    _cache().set_many(values, timeout=None)
+    memo = _request_versions.get()
+    if memo is not None:
+        memo.update(values)
+
+
+class VersionsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_versions.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _request_versions.reset(token)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_versions(app_configs, **kwargs):
+    backend = settings.CACHES.get(CACHE_ALIAS, {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache") and not settings.DEBUG:
+        return [checks.Error(
+            f"El caché '{CACHE_ALIAS}' es por proceso: con varios workers las escrituras no invalidan "
+            "los cachés de los demás.",
+            hint="Usar VERSION_CACHE_BACKEND=file (misma máquina) o redis (VERSION_CACHE_URL).",
+            id="core.E001",
+        )]
+    return []
@@ -1,12 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.generic import DetailView, FormView
 from django.urls import reverse
 from django.views import View
 from django.db import connection 
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from pymongo.errors import PyMongoError
+from .search import catequista_keys, catequizando_keys_from_doc, prefix_match
 from .models import Catequizando, Grupo, Inscripcion, Nivel, Ciclo
+from .pagination import keyset_paginate, keyset_paginate_pipeline
+from .list_rows import CATEQUIZANDO_PAGE_KEYS, CATEQUIZANDO_SEARCH_KEYS, GRUPO_PAGE_KEYS, catequizando_rows, catequizando_search_pipeline, catequizando_search_terms, grupo_rows, with_reference_names, inscripcion_page, roster_rows, choice_rows
+from . import fragment_cache, group_stats, instrumentation, reference_cache
+from .conditional import (
+    catequizando_revisiones, ciclo_revisiones, detail_condition, grupo_revisiones, inscripcion_revisiones,
+)
+from .importer import import_catequizandos, read_rows
+from .exporter import (
+    CATEQUIZANDO_COLUMNS, INSCRIPCION_COLUMNS, FORMATS,
+    catequizando_export_rows, export_lines, inscripcion_export_rows,
+)
 from .forms import (
     CatequizandoUpdateMiniForm, 
     CatequizandoSPForm, 
+    ImportarCatequizandosForm,
     GrupoForm, 
     GrupoUpdateForm, 
     InscripcionCreateForm, 
@@ -14,23 +32,55 @@ from .forms import (
     CicloForm,
     CicloUpdateForm,
     AsistenciaForm,
+    AsistenciaGrupoForm,
     CalificacionForm,
+    CalificacionGrupoForm,
     SesionForm
 )
 
 def home(request):
     return render(request, "home.html")
 
+
+class CachedDetailMixin:
+    """
+    DetailView cuya plantilla cachea el contenido con {% cache %}: el objeto
+    se carga de forma perezosa, así que si el fragmento está en caché no se
+    consulta la base. Un pk inexistente sigue respondiendo 404 (al renderizar).
+    """
+
+    def fragment_scopes(self):
+        return [fragment_cache.row(self.model, self.kwargs["pk"])]
+
+    def get(self, request, *args, **kwargs):
+        self.object = SimpleLazyObject(self.get_object)
+        return self.render_to_response({
+            "view": self,
+            "object": self.object,
+            self.context_object_name: self.object,
+            "fragmento": fragment_cache.context(*self.fragment_scopes()),
+        })
+
+
 # ==========================================
 # CATEQUIZANDOS
 # ==========================================
 
 def catequizando_listar(request):
-    catequizandos = Catequizando.objects.all()
-    return render(request, "catequizandos/listar.html", {"catequizandos": catequizandos})
+    # Perezoso: con el fragmento de la tabla en caché no se consulta la base
+    page = SimpleLazyObject(
+        lambda: keyset_paginate(catequizando_rows(Catequizando.objects.all()), request, CATEQUIZANDO_PAGE_KEYS)
+    )
+    return render(request, "catequizandos/listar.html", {
+        "catequizandos": page,
+        "page": page,
+        "fragmento": fragment_cache.context(fragment_cache.collection(Catequizando)),
+    })
 
 
-class CatequizandoDetailView(DetailView):
+# 304 si el navegador ya tiene la versión actual (ver core/conditional.py)
+@method_decorator(detail_condition(catequizando_revisiones), name="get")
+class CatequizandoDetailView(CachedDetailMixin, DetailView):
     model = Catequizando
     template_name = "catequizandos/detalle.html"
     context_object_name = "catequizando"
@@ -79,8 +129,11 @@ class CatequizandoUpdateView(View):
                 observaciones_generales=data["comentario"],
 
                 escolaridad=escolaridad,
-                informacion_salud=info_salud
+                informacion_salud=info_salud,
+                claves_busqueda=catequizando_keys_from_doc(cateq),
+                updated_at=timezone.now(),
             )
+            fragment_cache.bump_rows(Catequizando, (pk,))
 
             return redirect("catequizando_detalle", pk=pk)
 
@@ -92,95 +145,39 @@ class CatequizandoCreateView(FormView):
     form_class = CatequizandoSPForm
 
     def form_valid(self, form):
-        data = form.cleaned_data
+        form.build_catequizando().save(force_insert=True)
+        return redirect("catequizando_listar")
 
-        padres = []
-        if data.get('nombrespadre'):
-            padre = {
-                "relacion": "PADRE",
-                "nombres": data.get('nombrespadre', '').strip(),
-                "apellidos": data.get('apellidospadre', '').strip(),
-                "telefono": data.get('telefonopadre', ''),
-                "ocupacion": data.get('ocupacionpadre', '')
-            }
-            padres.append(padre)
-        
-        if data.get('nombresmadre'):
-            madre = {
-                "relacion": "MADRE",
-                "nombres": data.get('nombresmadre', '').strip(),
-                "apellidos": data.get('apellidosmadre', '').strip(),
-                "telefono": data.get('telefonomadre', ''),
-                "ocupacion": data.get('ocupacionmadre', '')
-            }
-            padres.append(madre)
-
-        rep_legal = {}
-        if padres:
-            p = padres[0] 
-            rep_legal = {
-                "es_uno_de_los_padres": True,
-                "nombres": p['nombres'],
-                "apellidos": p['apellidos'],
-                "telefono": p['telefono'],
-                "correo": data.get('correopadre') if p['relacion'] == 'PADRE' else data.get('correomadre', '')
-            }
-        else:
-             rep_legal = {
-                "es_uno_de_los_padres": False,
-                "nombres": "Desconocido",
-                "apellidos": "Desconocido",
-                "telefono": "",
-                "correo": ""
-             }
-
-        fe_bautismo = {
-            "fecha": str(data.get('fechabautismo')) if data.get('fechabautismo') else None,
-            "parroquia": data.get('parroquiabautismoid', ''),
-            "ciudad": data.get('ciudadbautismo', ''), 
-            "tomo": data.get('numerotomo'),
-            "pagina": data.get('paginatomo'),
-            "sacerdote": data.get('sacerdotebautismo', ''),
-            "padrino": data.get('padrinobautismo', ''),
-            "madrina": data.get('madrinabautismo', '')
-        }
-
-        info_salud = {
-            "tipo_sangre": data.get('tiposangre'),
-            "contacto_emergencia": data.get('contacto_emergencia', ''),
-            "alergias": [data.get('alergia')] if data.get('alergia') else [],
-            "aspectos_a_considerar": ""
-        }
-
-        escolaridad = {
-            "escuela_colegio": data.get('escuelacolegio', ''),
-            "anio_en_curso": data.get('anioencurso')
-        }
-
-        Catequizando.objects.create(
-            id=data['cedula'], 
-            cedula=data['cedula'],
-            primer_nombre=data['primernombre'],
-            segundo_nombre=data['segundonombre'],
-            primer_apellido=data['primerapellido'],
-            segundo_apellido=data['segundoapellido'],
-            genero=data['genero'],
-            fecha_nacimiento=data['fechanacimiento'],
-            lugar_nacimiento=data['lugar_nacimiento'],
-            numero_hijo=data['numerohijo'],
-            numero_hermanos=data['numerohermanos'],
-            telefono_casa=data['telefono'],
-            direccion=data['direccion'],
-            
-            padres=padres,
-            representante_legal=rep_legal,
-            informacion_salud=info_salud,
-            fe_bautismo=fe_bautismo,
-            escolaridad=escolaridad,
-            observaciones_generales=data['comentario']
-        )
 
-        return redirect("catequizando_listar")
+def catequizando_importar(request):
+    form = ImportarCatequizandosForm(request.POST or None, request.FILES or None)
+    resultado = None
+    if request.method == "POST" and form.is_valid():
+        archivo = form.cleaned_data['archivo']
+        # Validación en el mismo proceso (workers=None): el formulario acota
+        # el tamaño del archivo
+        try:
+            resultado = import_catequizandos(read_rows(archivo, archivo.name))
+        except ValueError as exc:
+            form.add_error('archivo', str(exc))
+        except PyMongoError as exc:
+            # Los lotes anteriores al error ya quedaron guardados
+            form.add_error('archivo', f"La importación se interrumpió por un error de la base de datos: {exc}")
+    return render(request, "catequizandos/importar.html", {"form": form, "resultado": resultado})
+
+
+def _export_response(rows, columns, request, nombre):
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATS:
+        formato = 'csv'
+    content_type, extension = FORMATS[formato]
+    response = StreamingHttpResponse(export_lines(rows, columns, formato), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{extension}"'
+    return response
+
+
+def catequizando_exportar(request):
+    return _export_response(catequizando_export_rows(), CATEQUIZANDO_COLUMNS, request, "catequizandos")
 
 
 def catequizando_eliminar(request, persona_id):
@@ -192,14 +189,21 @@ def catequizando_buscar(request):
     cedula = request.GET.get("cedula")
     apellido = request.GET.get("apellido")
 
-    qs = Catequizando.objects.all()
-    if cedula:
-        qs = qs.filter(cedula__icontains=cedula)
-    if apellido:
-        qs = qs.filter(primer_apellido__icontains=apellido)
-    
+    # Sin filtros se comporta como el listado; con filtros los resultados
+    # vienen rankeados por relevancia (calculada en el servidor) y se
+    # paginan por cursor sobre ese mismo orden.
+    terms = catequizando_search_terms(cedula, apellido)
+    if not terms:
+        return catequizando_listar(request)
+
+    page = SimpleLazyObject(lambda: keyset_paginate_pipeline(
+        connection.get_collection(Catequizando._meta.db_table),
+        catequizando_search_pipeline(terms), request, CATEQUIZANDO_SEARCH_KEYS,
+    ))
     return render(request, "catequizandos/listar.html", {
-        "catequizandos": qs,
+        "catequizandos": page,
+        "page": page,
+        "fragmento": fragment_cache.context(fragment_cache.collection(Catequizando)),
         "filtro_cedula": cedula or "",
         "filtro_apellido": apellido or "",
     })
@@ -208,15 +212,23 @@ def catequizando_buscar(request):
 # GRUPOS
 # ==========================================
 
+def _grupo_fragmento():
+    # La tabla muestra nombres de nivel y ciclo
+    return fragment_cache.context(*(fragment_cache.collection(model) for model in (Grupo, Nivel, Ciclo)))
+
 def grupo_listar(request):
-    grupos = Grupo.objects.all()
-    niveles = Nivel.objects.all()
-    ciclos = Ciclo.objects.all().order_by('-fecha_inicio')
+    page = SimpleLazyObject(
+        lambda: with_reference_names(keyset_paginate(grupo_rows(Grupo.objects.all()), request, GRUPO_PAGE_KEYS))
+    )
+    niveles = reference_cache.niveles.all()
+    ciclos = reference_cache.ciclos.all()
     
     return render(request, "grupos/listar.html", {
-        "grupos": grupos,
+        "grupos": page,
+        "page": page,
         "niveles": niveles,
         "ciclos": ciclos,
+        "fragmento": _grupo_fragmento(),
     })
 
 def grupo_buscar(request):
@@ -227,34 +239,42 @@ def grupo_buscar(request):
     # Extra filters requested
     catequista = request.GET.get('catequista')
 
-    qs = Grupo.objects.all()
-    if nombre:
-        qs = qs.filter(nombre_grupo__icontains=nombre)
-    if nivel_id:
-        qs = qs.filter(nivel__id=nivel_id)
-    if ciclo_id:
-        qs = qs.filter(ciclo__id=ciclo_id)
-    
-    # Filter by Catequista Name (partial match logic in Python for now if not supported directly in complex list lookup)
-    # db.grupos.find({ "catequistas.nombre": ... })
-    if catequista:
-        # Fetching all matches for other filters first to minimize dataset
-        # Then filtering in memory since 'catequistas' is a list of dicts.
-        current_qs = list(qs)
-        qs = [g for g in current_qs if any(c.get('nombre', '').lower().find(catequista.lower()) != -1 for c in g.catequistas)]
-
-        
-    niveles = Nivel.objects.all()
-    ciclos = Ciclo.objects.all().order_by('-fecha_inicio')
+    # Perezoso, como en grupo_listar: el distinct por catequista también se
+    # evita si la tabla está en caché
+    def grupo_queryset():
+        qs = Grupo.objects.all()
+        if nombre:
+            qs = qs.filter(nombre_grupo__icontains=nombre)
+        if nivel_id:
+            qs = qs.filter(nivel__id=nivel_id)
+        if ciclo_id:
+            qs = qs.filter(ciclo__id=ciclo_id)
+
+        # Filtro por catequista resuelto en Mongo sobre el índice multikey
+        # 'catequistas_busqueda': db.grupos.distinct("_id", { "catequistas_busqueda": { $all: [/^.../] } })
+        if catequista:
+            grupos_col = Grupo.get_collection()
+            ids = grupos_col.distinct("_id", prefix_match("catequistas_busqueda", catequista))
+            qs = qs.filter(id__in=ids)
+        return qs
+
+    page = SimpleLazyObject(
+        lambda: with_reference_names(keyset_paginate(grupo_rows(grupo_queryset()), request, GRUPO_PAGE_KEYS))
+    )
+
+    niveles = reference_cache.niveles.all()
+    ciclos = reference_cache.ciclos.all()
 
     return render(request, "grupos/listar.html", {
-        "grupos": qs,
+        "grupos": page,
+        "page": page,
         "niveles": niveles,
         "ciclos": ciclos,
         "filtro_nombre": nombre or "",
         "filtro_nivel": nivel_id or "",
         "filtro_ciclo": ciclo_id or "",
-        "filtro_catequista": catequista or "" 
+        "filtro_catequista": catequista or "",
+        "fragmento": _grupo_fragmento(),
     })
 
 class GrupoCreateView(FormView):
@@ -265,24 +285,34 @@ class GrupoCreateView(FormView):
         data = form.cleaned_data
         import uuid
         new_id = str(uuid.uuid4())[:8]
+        catequistas = [{
+            "nombre": data['catequista_nombre'],
+            "tipo": "TITULAR"
+        }]
         Grupo.objects.create(
             id=new_id,
             nombre_grupo=data['nombregrupo'],
             ciclo=data['ciclo'],
             nivel=data['nivelcatequesis'], 
             estado=data['estado'],
-            catequistas=[{
-                "nombre": data['catequista_nombre'],
-                "tipo": "TITULAR"
-            }]
+            catequistas=catequistas,
+            catequistas_busqueda=catequista_keys(catequistas)
         )
         return redirect('grupo_listar')
 
-class GrupoDetailView(DetailView):
+@method_decorator(detail_condition(grupo_revisiones), name="get")
+class GrupoDetailView(CachedDetailMixin, DetailView):
     model = Grupo
     template_name = "grupos/detalle.html"
     context_object_name = "grupo"
 
+    def fragment_scopes(self):
+        # Muestra nombre y fechas del nivel y del ciclo
+        return [*super().fragment_scopes(), fragment_cache.collection(Nivel), fragment_cache.collection(Ciclo)]
+
+    def get_object(self, queryset=None):
+        return reference_cache.attach_references(super().get_object(queryset))
+
 class GrupoUpdateView(View):
     template_name = "grupos/editar.html"
     form_class = GrupoUpdateForm
@@ -308,14 +338,19 @@ class GrupoUpdateView(View):
             grupo = get_object_or_404(Grupo, pk=pk)
             data = form.cleaned_data
             
+            catequistas = [{
+                "nombre": data['catequista_nombre'],
+                "tipo": "TITULAR"
+            }]
             Grupo.objects.filter(pk=pk).update(
                 nombre_grupo=data['nombregrupo'], 
                 estado=data['estado'],
-                catequistas=[{
-                    "nombre": data['catequista_nombre'],
-                    "tipo": "TITULAR"
-                }]
+                catequistas=catequistas,
+                catequistas_busqueda=catequista_keys(catequistas),
+                updated_at=timezone.now(),
             )
+            fragment_cache.bump_rows(Grupo, (pk,))
+            group_stats.refresh(pk)
             return redirect('grupo_detail', pk=pk)
     
 class GrupoAddSesionView(View):
@@ -328,7 +363,6 @@ class GrupoAddSesionView(View):
         return render(request, self.template_name, {'form': form, 'grupo': grupo, 'pk': pk})
 
     def post(self, request, pk):
-        grupo = get_object_or_404(Grupo, pk=pk)
         form = self.form_class(request.POST) 
         if form.is_valid():
             data = form.cleaned_data
@@ -339,16 +373,100 @@ class GrupoAddSesionView(View):
                 "asistencia_tomada": False
             }
             
-            if not grupo.sesiones:
-                grupo.sesiones = []
-            
-            grupo.sesiones.append(nueva_sesion)
-            
-            # Sort sessions by ID just in case
-            grupo.sesiones.sort(key=lambda x: x['sesion_id'])
+            # $push con $sort: el servidor inserta y mantiene el orden por sesion_id
+            result = Grupo.array_push({"_id": pk}, "sesiones", nueva_sesion, sort={"sesion_id": 1})
+            if not result.matched_count:
+                raise Http404("Grupo no encontrado")
+            fragment_cache.bump_rows(Grupo, (pk,))
 
-            Grupo.objects.filter(pk=pk).update(sesiones=grupo.sesiones)
-            
+            return redirect('grupo_detail', pk=pk)
+        grupo = get_object_or_404(Grupo, pk=pk)
+        return render(request, self.template_name, {'form': form, 'grupo': grupo, 'pk': pk})
+
+class GrupoAsistenciaView(View):
+    """Hoja de asistencia de una sesión para todo el grupo, en un solo envío."""
+    template_name = "grupos/asistencia.html"
+    form_class = AsistenciaGrupoForm
+
+    def get_grupo(self, pk, sesion_id):
+        # Solo el nombre y la sesión pedida ($elemMatch en la proyección)
+        grupo = Grupo.get_collection().find_one(
+            {"_id": pk},
+            {"nombre_grupo": 1, "sesiones": {"$elemMatch": {"sesion_id": sesion_id}}},
+        )
+        if not grupo or not grupo.get("sesiones"):
+            raise Http404("Sesión no encontrada")
+        return grupo
+
+    def render_form(self, request, pk, grupo, form):
+        return render(request, self.template_name, {
+            'form': form, 'grupo': grupo, 'sesion': grupo["sesiones"][0], 'pk': pk
+        })
+
+    def get(self, request, pk, sesion_id):
+        grupo = self.get_grupo(pk, sesion_id)
+        form = self.form_class(roster=roster_rows(pk, sesion_id))
+        return self.render_form(request, pk, grupo, form)
+
+    def post(self, request, pk, sesion_id):
+        grupo = self.get_grupo(pk, sesion_id)
+        form = self.form_class(request.POST, roster=roster_rows(pk, sesion_id))
+        if form.is_valid():
+            # Un único bulk_write: cada inscripción reemplaza (o agrega) su
+            # marca para esta sesión.
+            operations = [
+                Inscripcion.array_upsert_op(
+                    {"grupo_id": pk, "catequizando_id": catequizando_id},
+                    "registro_asistencia", "sesion_id",
+                    {"sesion_id": sesion_id, "estado": estado}
+                )
+                for catequizando_id, estado in form.marcas().items()
+            ]
+            if operations:
+                Inscripcion.bulk_write(operations)
+                fragment_cache.bump_rows(Inscripcion, *((catequizando_id, pk) for catequizando_id in form.marcas()))
+                group_stats.mark_stale(pk)
+            Grupo.array_set({"_id": pk}, "sesiones", {"sesion_id": sesion_id}, {"asistencia_tomada": True})
+            fragment_cache.bump_rows(Grupo, (pk,))
+            return redirect('grupo_detail', pk=pk)
+        return self.render_form(request, pk, grupo, form)
+
+class GrupoCalificacionesView(View):
+    """Registro de una misma evaluación para todo el grupo."""
+    template_name = "grupos/calificaciones.html"
+    form_class = CalificacionGrupoForm
+
+    def get_grupo(self, pk):
+        grupo = Grupo.get_collection().find_one({"_id": pk}, {"nombre_grupo": 1})
+        if not grupo:
+            raise Http404("Grupo no encontrado")
+        return grupo
+
+    def get(self, request, pk):
+        grupo = self.get_grupo(pk)
+        form = self.form_class(roster=roster_rows(pk))
+        return render(request, self.template_name, {'form': form, 'grupo': grupo, 'pk': pk})
+
+    def post(self, request, pk):
+        grupo = self.get_grupo(pk)
+        form = self.form_class(request.POST, roster=roster_rows(pk))
+        if form.is_valid():
+            import datetime
+            descripcion = form.cleaned_data['descripcion']
+            fecha = str(datetime.date.today())
+            # Un $push por inscripción, todos en un único bulk_write
+            operations = [
+                Inscripcion.array_push_op(
+                    {"grupo_id": pk, "catequizando_id": catequizando_id},
+                    "calificaciones",
+                    {"descripcion": descripcion, "valor": valor, "fecha": fecha}
+                )
+                for catequizando_id, valor in form.notas().items()
+            ]
+            if operations:
+                Inscripcion.bulk_write(operations)
+                fragment_cache.bump_rows(Inscripcion, *((catequizando_id, pk) for catequizando_id in form.notas()))
+                group_stats.mark_stale(pk)
             return redirect('grupo_detail', pk=pk)
         return render(request, self.template_name, {'form': form, 'grupo': grupo, 'pk': pk})
 
@@ -363,28 +481,33 @@ def grupo_eliminar(request, pk):
 # ==========================================
 
 def inscripcion_listar(request):
-    inscripciones = Inscripcion.objects.all()
+    page = inscripcion_page(request)
     return render(request, "inscripciones/listar.html", {
-        "inscripciones": inscripciones,
-        "grupos": Grupo.objects.all()
+        "inscripciones": page,
+        "page": page,
+        "grupos": choice_rows(Grupo.objects.all(), 'nombre_grupo')
     })
 
+def inscripcion_exportar(request):
+    # Mismos filtros que inscripcion_buscar
+    rows = inscripcion_export_rows(
+        cedula=request.GET.get('cedula'),
+        grupo_id=request.GET.get('grupo_id'),
+        estado_pago=request.GET.get('estado_pago'),
+    )
+    return _export_response(rows, INSCRIPCION_COLUMNS, request, "inscripciones")
+
 def inscripcion_buscar(request):
     cedula = request.GET.get('cedula')
     grupo_id = request.GET.get('grupo_id')
     estado_pago = request.GET.get('estado_pago')
 
-    qs = Inscripcion.objects.all()
-    if cedula:
-        qs = qs.filter(catequizando__cedula__icontains=cedula)
-    if grupo_id:
-        qs = qs.filter(grupo__id=grupo_id)
-    if estado_pago:
-        qs = qs.filter(estado_pago=estado_pago)
+    page = inscripcion_page(request, cedula=cedula, grupo_id=grupo_id, estado_pago=estado_pago)
 
     return render(request, "inscripciones/listar.html", {
-        "inscripciones": qs,
-        "grupos": Grupo.objects.all(),
+        "inscripciones": page,
+        "page": page,
+        "grupos": choice_rows(Grupo.objects.all(), 'nombre_grupo'),
         "filtro_cedula": cedula or "",
         "filtro_grupo_id": grupo_id or "",
         "filtro_pago": estado_pago or ""
@@ -411,7 +534,8 @@ class InscripcionCreateView(FormView):
         )
         return redirect('inscripcion_listar')
 
-class InscripcionDetailView(DetailView):
+@method_decorator(detail_condition(inscripcion_revisiones), name="get")
+class InscripcionDetailView(CachedDetailMixin, DetailView):
     model = Inscripcion
     template_name = "inscripciones/detalle.html"
     context_object_name = "inscripcion"
@@ -421,12 +545,26 @@ class InscripcionDetailView(DetailView):
         g_id = self.kwargs.get('grupo_id')
         return get_object_or_404(Inscripcion, catequizando__id=c_id, grupo__id=g_id)
 
+    def fragment_scopes(self):
+        # La cabecera muestra el nombre del catequizando y el del grupo
+        c_id = self.kwargs['catequizando_id']
+        g_id = self.kwargs['grupo_id']
+        return [
+            fragment_cache.row(Inscripcion, c_id, g_id),
+            fragment_cache.row(Catequizando, c_id),
+            fragment_cache.row(Grupo, g_id),
+        ]
+
 class InscripcionUpdateView(View):
     template_name = "inscripciones/editar.html"
     form_class = InscripcionUpdateForm
 
     def get(self, request, catequizando_id, grupo_id):
-        inscripcion = get_object_or_404(Inscripcion, catequizando__id=catequizando_id, grupo__id=grupo_id)
+        # La cabecera muestra el catequizando y el grupo: se traen en la misma consulta
+        inscripcion = get_object_or_404(
+            Inscripcion.objects.select_related("catequizando", "grupo"),
+            catequizando__id=catequizando_id, grupo__id=grupo_id,
+        )
         form = self.form_class(initial={
             'estadoinscripcion': inscripcion.estado_inscripcion,
             'estadopago': inscripcion.estado_pago,
@@ -446,8 +584,11 @@ class InscripcionUpdateView(View):
             
             Inscripcion.objects.filter(pk=inscripcion.pk).update(
                 estado_inscripcion=data['estadoinscripcion'],
-                estado_pago=data['estadopago']
+                estado_pago=data['estadopago'],
+                updated_at=timezone.now(),
             )
+            fragment_cache.bump_rows(Inscripcion, (catequizando_id, grupo_id))
+            group_stats.mark_stale(inscripcion.grupo_id)
             return redirect('inscripcion_detail', catequizando_id=catequizando_id, grupo_id=grupo_id)
         return render(request, self.template_name, {'form': form, 'catequizando_id': catequizando_id, 'grupo_id': grupo_id})
 
@@ -471,24 +612,23 @@ class InscripcionTomarAsistenciaView(View):
         })
 
     def post(self, request, catequizando_id, grupo_id):
-        inscripcion = get_object_or_404(Inscripcion, catequizando__id=catequizando_id, grupo__id=grupo_id)
         form = self.form_class(request.POST)
         if form.is_valid():
             data = form.cleaned_data
-            # $push operation simulation
             nuevo_registro = {
                 "sesion_id": data['sesion_id'],
                 "estado": data['estado']
             }
-            if not inscripcion.registro_asistencia:
-                inscripcion.registro_asistencia = []
-            
-            inscripcion.registro_asistencia.append(nuevo_registro)
-            
-            Inscripcion.objects.filter(pk=inscripcion.pk).update(
-                registro_asistencia=inscripcion.registro_asistencia
+            result = Inscripcion.array_push(
+                {"catequizando_id": catequizando_id, "grupo_id": grupo_id},
+                "registro_asistencia", nuevo_registro
             )
+            if not result.matched_count:
+                raise Http404("Inscripción no encontrada")
+            fragment_cache.bump_rows(Inscripcion, (catequizando_id, grupo_id))
+            group_stats.mark_stale(grupo_id)
             return redirect('inscripcion_detail', catequizando_id=catequizando_id, grupo_id=grupo_id)
+        inscripcion = get_object_or_404(Inscripcion, catequizando__id=catequizando_id, grupo__id=grupo_id)
         return render(request, self.template_name, {'form': form, 'inscripcion': inscripcion})
 
 
@@ -504,26 +644,25 @@ class InscripcionAgregarNotaView(View):
         })
 
     def post(self, request, catequizando_id, grupo_id):
-        inscripcion = get_object_or_404(Inscripcion, catequizando__id=catequizando_id, grupo__id=grupo_id)
         form = self.form_class(request.POST)
         if form.is_valid():
             data = form.cleaned_data
             import datetime
-            # $push operation simulation
             nueva_nota = {
                 "descripcion": data['descripcion'],
                 "valor": data['valor'],
                 "fecha": str(datetime.date.today())
             }
-            if not inscripcion.calificaciones:
-                inscripcion.calificaciones = []
-            
-            inscripcion.calificaciones.append(nueva_nota)
-            
-            Inscripcion.objects.filter(pk=inscripcion.pk).update(
-                calificaciones=inscripcion.calificaciones
+            result = Inscripcion.array_push(
+                {"catequizando_id": catequizando_id, "grupo_id": grupo_id},
+                "calificaciones", nueva_nota
             )
+            if not result.matched_count:
+                raise Http404("Inscripción no encontrada")
+            fragment_cache.bump_rows(Inscripcion, (catequizando_id, grupo_id))
+            group_stats.mark_stale(grupo_id)
             return redirect('inscripcion_detail', catequizando_id=catequizando_id, grupo_id=grupo_id)
+        inscripcion = get_object_or_404(Inscripcion, catequizando__id=catequizando_id, grupo__id=grupo_id)
         return render(request, self.template_name, {'form': form, 'inscripcion': inscripcion})
 
 
@@ -532,10 +671,24 @@ class InscripcionAgregarNotaView(View):
 # ==========================================
 
 def ciclo_listar(request):
-    ciclos = Ciclo.objects.all()
+    ciclos = reference_cache.ciclos.all()
     return render(request, "ciclos/listar.html", {"ciclos": ciclos})
 
-class CicloDetailView(DetailView):
+def ciclo_estadisticas(request, pk):
+    # Tablero del ciclo: una consulta sobre grupo_stats (más el refresh de
+    # los grupos con escrituras pendientes)
+    ciclo = reference_cache.ciclos.get(pk)
+    if ciclo is None:
+        raise Http404("Ciclo no encontrado")
+    grupos = with_reference_names(group_stats.ciclo_rows(pk))
+    return render(request, "ciclos/estadisticas.html", {
+        "ciclo": ciclo,
+        "grupos": grupos,
+        "totales": group_stats.totals(grupos),
+    })
+
+@method_decorator(detail_condition(ciclo_revisiones), name="get")
+class CicloDetailView(CachedDetailMixin, DetailView):
     model = Ciclo
     template_name = "ciclos/detalle.html"
     context_object_name = "ciclo"
@@ -582,8 +735,12 @@ class CicloUpdateView(View):
                 nombre=data['nombreciclo'],
                 fecha_inicio=data['fechainicio'],
                 fecha_fin=data['fechafin'],
-                estado=data['estado']
+                estado=data['estado'],
+                updated_at=timezone.now(),
             )
+            # update() no dispara señales: invalidamos los cachés a mano
+            reference_cache.ciclos.invalidate()
+            fragment_cache.bump_rows(Ciclo, (pk,))
             return redirect('ciclo_listar')
         return render(request, self.template_name, {'form': form, 'pk': pk})
 
@@ -591,3 +748,16 @@ def ciclo_eliminar(request, pk):
     ciclo = get_object_or_404(Ciclo, pk=pk)
     ciclo.delete()
     return redirect('ciclo_listar')
+
+
+# ==========================================
+# INSTRUMENTACIÓN
+# ==========================================
+
+def request_stats(request):
+    # Percentiles por nombre de URL de este proceso; opt-in con REQUEST_STATS_ENDPOINT
+    if not instrumentation.endpoint_enabled():
+        raise Http404()
+    from . import urls
+    url_names = [pattern.name for pattern in urls.urlpatterns if pattern.name]
+    return JsonResponse(instrumentation.summary(url_names), json_dumps_params={"indent": 2})
@@ -1,113 +0,0 @@
-import os
-import datetime
-import pymongo
-from dotenv import load_dotenv
-
-# Load env vars
-load_dotenv()
-
-def fix_catequizandos():
-    print("Fixing Catequizandos...")
-    host = os.getenv('MONGO_DB_HOST', 'mongodb://localhost:27017')
-    db_name = os.getenv('MONGO_DB_NAME', 'catequesis_db')
-    
-    print(f"Connecting to {host} / {db_name}")
-    
-    client = pymongo.MongoClient(host)
-    db = client[db_name]
-    
-    # Disable validation temporarily to allow Type change from Date to String
-    try:
-        print("Disabling validation for catequizandos...")
-        db.command("collMod", "catequizandos", validationLevel="off")
-    except Exception as e:
-        print(f"Error disabling validation: {e}")
-
-    try:
-        count = 0
-        collection = db['catequizandos']
-        for doc in collection.find():
-            updated = False
-            fe_bautismo = doc.get('fe_bautismo')
-            if fe_bautismo and isinstance(fe_bautismo, dict):
-                fecha = fe_bautismo.get('fecha')
-                if isinstance(fecha, (datetime.datetime, datetime.date)):
-                    print(f"Fixing date for Catequizando {doc.get('_id')}")
-                    # Convert to YYYY-MM-DD
-                    if isinstance(fecha, datetime.datetime):
-                        fe_bautismo['fecha'] = fecha.date().isoformat()
-                    else:
-                        fe_bautismo['fecha'] = fecha.isoformat()
-                    updated = True
-            
-            if updated:
-                try:
-                    collection.update_one({'_id': doc['_id']}, {'$set': {'fe_bautismo': fe_bautismo}})
-                    count += 1
-                except Exception as e:
-                    print(f"Error updating doc {doc.get('_id')}: {e}")
-                    
-        print(f"Fixed {count} Catequizandos")
-    finally:
-        # Re-enable validation strictly? Or leave it strict?
-        # If we leave it strict but the schema expects Date, new inserts might fail if we changed logic to String.
-        # Ideally we should update the schema to allow string.
-        # For now, let's set it to "moderate" or just leave off if user didn't complain about data integrity yet.
-        # But safest is to try to restore default behavior (strict) but it will fail for these strings if schema is not updated.
-        # So I will NOT re-enable strict validation immediately if it blocks strings, unless I update the validator.
-        # Given I cannot see the validator easily, I will leave it OFF or "warn".
-        try:
-             # db.command("collMod", "catequizandos", validationLevel="strict") 
-             pass
-        except:
-             pass
-
-def fix_inscripciones():
-    print("Fixing Inscripciones...")
-    host = os.getenv('MONGO_DB_HOST', 'mongodb://localhost:27017')
-    db_name = os.getenv('MONGO_DB_NAME', 'catequesis_db')
-    
-    client = pymongo.MongoClient(host)
-    db = client[db_name]
-
-    try:
-        print("Disabling validation for inscripciones...")
-        db.command("collMod", "inscripciones", validationLevel="off")
-    except Exception as e:
-        print(f"Error disabling validation: {e}")
-    
-    try:
-        collection = db['inscripciones']
-        count = 0
-        for doc in collection.find():
-            updated = False
-            calificaciones = doc.get('calificaciones')
-            if calificaciones and isinstance(calificaciones, list):
-                new_califs = []
-                modified_list = False
-                for calif in calificaciones:
-                    if isinstance(calif, dict):
-                        fecha = calif.get('fecha')
-                        if isinstance(fecha, (datetime.datetime, datetime.date)):
-                             if isinstance(fecha, datetime.datetime):
-                                calif['fecha'] = fecha.date().isoformat()
-                             else:
-                                calif['fecha'] = fecha.isoformat()
-                             modified_list = True
-                    new_califs.append(calif)
-                
-                if modified_list:
-                    doc['calificaciones'] = new_califs
-                    updated = True
-
-            if updated:
-                 collection.update_one({'_id': doc['_id']}, {'$set': {'calificaciones': doc['calificaciones']}})
-                 count += 1
-                 
-        print(f"Fixed {count} Inscripciones")
-    finally:
-        pass
-
-if __name__ == '__main__':
-    fix_catequizandos()
-    fix_inscripciones()
@@ -0,0 +1,3 @@
+from .server import FakeMongoServer
+
+__all__ = ["FakeMongoServer"]
@@ -0,0 +1,527 @@
+import itertools
+import random
+import threading
+
+from bson import Int64, ObjectId
+
+from . import update as updates
+from .expressions import now
+from .pipeline import project, run, sort_docs
+from .query import matches
+from .values import MISSING, MongoError, compare, get_path, hashable, traverse
+
+
+# ==========================================
+# MOTOR EN MEMORIA
+# ==========================================
+# Bases -> colecciones -> documentos (dict ordenado por _id). Cada comando
+# del protocolo (find, aggregate, insert, ...) es un método cmd_<nombre>
+# que recibe el documento del comando y devuelve la respuesta. Un lock
+# global serializa los comandos: el servidor atiende varias conexiones pero
+# la semántica es la de un mongod standalone sin concurrencia.
+
+DEFAULT_BATCH_SIZE = 101
+
+
+class Collection:
+    def __init__(self, name, options=None):
+        self.name = name
+        self.options = dict(options or {})
+        self.docs = {}
+        self.indexes = [{"v": 2, "key": {"_id": 1}, "name": "_id_"}]
+
+    def all(self):
+        return list(self.docs.values())
+
+    def clear(self):
+        self.docs = {}
+
+    def _unique_key(self, index, doc):
+        partial = index.get("partialFilterExpression")
+        if partial and not matches(doc, partial):
+            return None
+        values = []
+        for path in index["key"]:
+            found = [value for value in traverse(doc, path.split(".")) if value is not MISSING]
+            if not found and index.get("sparse"):
+                return None
+            values.append(hashable(found[0] if found else None))
+        return tuple(values)
+
+    def check_unique(self, doc, replacing=None):
+        for index in self.indexes:
+            if index["name"] == "_id_" or not index.get("unique"):
+                continue
+            key = self._unique_key(index, doc)
+            if key is None:
+                continue
+            for other in self.docs.values():
+                if other is replacing:
+                    continue
+                if self._unique_key(index, other) == key:
+                    raise MongoError(
+                        f"E11000 duplicate key error collection: {self.name} index: {index['name']} dup key: "
+                        f"{ {path: get_path(doc, path) for path in index['key']} }",
+                        code=11000, code_name="DuplicateKey",
+                    )
+
+    def insert(self, doc):
+        if "_id" not in doc:
+            doc = {"_id": ObjectId(), **doc}
+        key = hashable(doc["_id"])
+        if key in self.docs:
+            raise MongoError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {{ _id: {doc['_id']!r} }}",
+                code=11000, code_name="DuplicateKey",
+            )
+        self.check_unique(doc)
+        self.docs[key] = doc
+        return doc
+
+    def replace(self, old, new):
+        if compare(old["_id"], new.get("_id", old["_id"])) != 0:
+            raise MongoError(
+                "Performing an update on the path '_id' would modify the immutable field '_id'",
+                code=66, code_name="ImmutableField",
+            )
+        self.check_unique(new, replacing=old)
+        self.docs[hashable(old["_id"])] = new
+
+    def delete(self, doc):
+        self.docs.pop(hashable(doc["_id"]), None)
+
+    def find(self, query):
+        return [doc for doc in self.docs.values() if matches(doc, query or {})]
+
+
+class Database:
+    def __init__(self, name):
+        self.name = name
+        self.collections = {}
+
+    def collection(self, name, create=False):
+        found = self.collections.get(name)
+        if found is None and create:
+            found = self.collections[name] = Collection(name)
+        return found
+
+    def collection_docs(self, name):
+        found = self.collections.get(name)
+        return found.all() if found else []
+
+
+class Engine:
+    def __init__(self):
+        self.databases = {}
+        self.cursors = {}
+        self.lock = threading.RLock()
+        self.connection_ids = itertools.count(1)
+
+    def database(self, name):
+        found = self.databases.get(name)
+        if found is None:
+            found = self.databases[name] = Database(name)
+        return found
+
+    def execute(self, db_name, command):
+        name = next(iter(command))
+        handler = getattr(self, f"cmd_{name}", None) or getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return {"ok": 0.0, "errmsg": f"no such command: '{name}'", "code": 59, "codeName": "CommandNotFound"}
+        with self.lock:
+            try:
+                reply = handler(self.database(db_name), command)
+            except MongoError as error:
+                return {"ok": 0.0, "errmsg": str(error), "code": error.code, "codeName": error.code_name}
+        reply.setdefault("ok", 1.0)
+        return reply
+
+    # ------------------------------------------
+    # Cursores
+    # ------------------------------------------
+
+    def _cursor(self, namespace, docs, batch_size=None, key="firstBatch"):
+        size = DEFAULT_BATCH_SIZE if batch_size is None else batch_size
+        first, rest = docs[:size], docs[size:]
+        cursor_id = 0
+        if rest:
+            cursor_id = random.randint(1, 2**62)
+            self.cursors[cursor_id] = (namespace, rest)
+        return {"cursor": {key: first, "id": Int64(cursor_id), "ns": namespace}}
+
+    def cmd_getMore(self, database, command):
+        cursor_id = int(command["getMore"])
+        if cursor_id not in self.cursors:
+            raise MongoError(f"cursor id {cursor_id} not found", code=43, code_name="CursorNotFound")
+        namespace, docs = self.cursors.pop(cursor_id)
+        size = command.get("batchSize") or len(docs)
+        batch, rest = docs[:size], docs[size:]
+        next_id = 0
+        if rest:
+            next_id = cursor_id
+            self.cursors[cursor_id] = (namespace, rest)
+        return {"cursor": {"nextBatch": batch, "id": Int64(next_id), "ns": namespace}}
+
+    def cmd_killCursors(self, database, command):
+        killed = []
+        for cursor_id in command.get("cursors", []):
+            if self.cursors.pop(int(cursor_id), None) is not None:
+                killed.append(cursor_id)
+        return {"cursorsKilled": killed, "cursorsNotFound": [], "cursorsAlive": [], "cursorsUnknown": []}
+
+    # ------------------------------------------
+    # Servidor
+    # ------------------------------------------
+
+    def hello(self):
+        return {
+            "helloOk": True,
+            "ismaster": True,
+            "isWritablePrimary": True,
+            "maxBsonObjectSize": 16 * 1024 * 1024,
+            "maxMessageSizeBytes": 48000000,
+            "maxWriteBatchSize": 100000,
+            "localTime": now(),
+            "logicalSessionTimeoutMinutes": 30,
+            "connectionId": next(self.connection_ids),
+            "minWireVersion": 0,
+            "maxWireVersion": 21,
+            "readOnly": False,
+            "ok": 1.0,
+        }
+
+    def cmd_hello(self, database, command):
+        return self.hello()
+
+    cmd_ismaster = cmd_isMaster = cmd_hello
+
+    def cmd_ping(self, database, command):
+        return {}
+
+    def cmd_buildInfo(self, database, command):
+        return {"version": "7.0.0", "versionArray": [7, 0, 0, 0], "bits": 64, "maxBsonObjectSize": 16 * 1024 * 1024}
+
+    cmd_buildinfo = cmd_buildInfo
+
+    def cmd_getParameter(self, database, command):
+        return {"featureCompatibilityVersion": {"version": "7.0"}}
+
+    def cmd_serverStatus(self, database, command):
+        return {"version": "7.0.0", "process": "fake_mongo", "uptime": 0}
+
+    def cmd_endSessions(self, database, command):
+        return {}
+
+    def cmd_listDatabases(self, database, command):
+        names = [name for name, found in self.databases.items() if found.collections]
+        if command.get("nameOnly"):
+            return {"databases": [{"name": name} for name in names]}
+        return {"databases": [{"name": name, "sizeOnDisk": 0, "empty": False} for name in names], "totalSize": 0}
+
+    def cmd_dropDatabase(self, database, command):
+        self.databases.pop(database.name, None)
+        return {"dropped": database.name}
+
+    # ------------------------------------------
+    # Colecciones e índices
+    # ------------------------------------------
+
+    def _namespace(self, database, name):
+        return f"{database.name}.{name}"
+
+    def cmd_listCollections(self, database, command):
+        entries = [
+            {
+                "name": name,
+                "type": "collection",
+                "options": collection.options,
+                "info": {"readOnly": False},
+                "idIndex": {"v": 2, "key": {"_id": 1}, "name": "_id_"},
+            }
+            for name, collection in database.collections.items()
+        ]
+        entries = [entry for entry in entries if matches(entry, command.get("filter") or {})]
+        if command.get("nameOnly"):
+            entries = [{"name": entry["name"], "type": entry["type"]} for entry in entries]
+        return self._cursor(f"{database.name}.$cmd.listCollections", entries, (command.get("cursor") or {}).get("batchSize"))
+
+    def cmd_create(self, database, command):
+        name = command["create"]
+        if database.collection(name) is not None:
+            raise MongoError(f"Collection {database.name}.{name} already exists.", code=48, code_name="NamespaceExists")
+        options = {key: value for key, value in command.items() if key not in ("create", "lsid", "$db", "$readPreference")}
+        database.collections[name] = Collection(name, options)
+        return {}
+
+    def cmd_drop(self, database, command):
+        name = command["drop"]
+        if database.collections.pop(name, None) is None:
+            raise MongoError("ns not found", code=26, code_name="NamespaceNotFound")
+        return {"ns": self._namespace(database, name), "nIndexesWas": 1}
+
+    def cmd_collMod(self, database, command):
+        collection = database.collection(command["collMod"])
+        if collection is None:
+            raise MongoError("ns does not exist", code=26, code_name="NamespaceNotFound")
+        for key in ("validator", "validationLevel", "validationAction"):
+            if key in command:
+                collection.options[key] = command[key]
+        return {}
+
+    def cmd_listIndexes(self, database, command):
+        collection = database.collection(command["listIndexes"])
+        if collection is None:
+            raise MongoError("ns does not exist", code=26, code_name="NamespaceNotFound")
+        return self._cursor(self._namespace(database, collection.name), list(collection.indexes))
+
+    def cmd_createIndexes(self, database, command):
+        created = database.collection(command["createIndexes"]) is None
+        collection = database.collection(command["createIndexes"], create=True)
+        before = len(collection.indexes)
+        for spec in command["indexes"]:
+            spec = {"v": 2, **spec}
+            existing = next((index for index in collection.indexes if index["name"] == spec["name"]), None)
+            if existing is not None:
+                if dict(existing["key"]) != dict(spec["key"]):
+                    raise MongoError(f"Index with name: {spec['name']} already exists with a different key",
+                                     code=86, code_name="IndexKeySpecsConflict")
+                continue
+            if spec.get("unique"):
+                seen = set()
+                for doc in collection.docs.values():
+                    key = collection._unique_key(spec, doc)
+                    if key is not None and key in seen:
+                        raise MongoError(f"E11000 duplicate key error index: {spec['name']}", code=11000,
+                                         code_name="DuplicateKey")
+                    seen.add(key)
+            collection.indexes.append(spec)
+        return {
+            "numIndexesBefore": before,
+            "numIndexesAfter": len(collection.indexes),
+            "createdCollectionAutomatically": created,
+        }
+
+    def cmd_dropIndexes(self, database, command):
+        collection = database.collection(command["dropIndexes"])
+        if collection is None:
+            raise MongoError("ns not found", code=26, code_name="NamespaceNotFound")
+        wanted = command["index"]
+        before = len(collection.indexes)
+        if wanted == "*":
+            collection.indexes = collection.indexes[:1]
+        else:
+            names = wanted if isinstance(wanted, list) else [wanted]
+            remaining = [
+                index for index in collection.indexes
+                if index["name"] not in names and (not isinstance(wanted, dict) or dict(index["key"]) != dict(wanted))
+            ]
+            if len(remaining) == before:
+                raise MongoError(f"index not found with name [{wanted}]", code=27, code_name="IndexNotFound")
+            collection.indexes = remaining
+        return {"nIndexesWas": before}
+
+    # ------------------------------------------
+    # Lecturas
+    # ------------------------------------------
+
+    def _variables(self, command):
+        return {"NOW": now(), **(command.get("let") or {})}
+
+    def _find_docs(self, database, command):
+        collection = database.collection(command["find"])
+        docs = collection.find(command.get("filter")) if collection else []
+        if command.get("sort"):
+            docs = sort_docs(docs, command["sort"])
+        skip = command.get("skip") or 0
+        limit = abs(command.get("limit") or 0)
+        docs = docs[skip:skip + limit] if limit else docs[skip:]
+        if command.get("projection"):
+            variables = self._variables(command)
+            docs = [project(doc, command["projection"], variables, find=True) for doc in docs]
+        return docs
+
+    def cmd_find(self, database, command):
+        docs = self._find_docs(database, command)
+        batch_size = command.get("batchSize")
+        if command.get("singleBatch") or (command.get("limit") or 0) < 0:
+            batch_size = len(docs)
+        return self._cursor(self._namespace(database, command["find"]), docs, batch_size)
+
+    def cmd_aggregate(self, database, command):
+        name = command["aggregate"]
+        collection = database.collection(name) if isinstance(name, str) else None
+        docs = collection.all() if collection else []
+        docs = run(docs, command["pipeline"], database, self._variables(command))
+        batch_size = (command.get("cursor") or {}).get("batchSize")
+        return self._cursor(self._namespace(database, name), docs, batch_size)
+
+    def cmd_count(self, database, command):
+        collection = database.collection(command["count"])
+        docs = collection.find(command.get("query")) if collection else []
+        skip = command.get("skip") or 0
+        limit = command.get("limit") or 0
+        docs = docs[skip:skip + limit] if limit else docs[skip:]
+        return {"n": len(docs)}
+
+    def cmd_distinct(self, database, command):
+        collection = database.collection(command["distinct"])
+        docs = collection.find(command.get("query")) if collection else []
+        values, seen = [], set()
+        for doc in docs:
+            for value in traverse(doc, command["key"].split(".")):
+                for item in (value if isinstance(value, list) else [value]):
+                    if item is MISSING:
+                        continue
+                    key = hashable(item)
+                    if key not in seen:
+                        seen.add(key)
+                        values.append(item)
+        return {"values": values}
+
+    def cmd_explain(self, database, command):
+        explained = command["explain"]
+        name = next(iter(explained))
+        return {
+            "queryPlanner": {
+                "namespace": self._namespace(database, explained[name]),
+                "winningPlan": {"stage": "COLLSCAN"},
+                "rejectedPlans": [],
+            },
+            "command": explained,
+        }
+
+    # ------------------------------------------
+    # Escrituras
+    # ------------------------------------------
+
+    @staticmethod
+    def _write_error(index, error):
+        return {"index": index, "code": error.code, "errmsg": str(error)}
+
+    def cmd_insert(self, database, command):
+        collection = database.collection(command["insert"], create=True)
+        ordered = command.get("ordered", True)
+        inserted, errors = 0, []
+        for index, doc in enumerate(command.get("documents", [])):
+            try:
+                collection.insert(doc)
+                inserted += 1
+            except MongoError as error:
+                errors.append(self._write_error(index, error))
+                if ordered:
+                    break
+        reply = {"n": inserted}
+        if errors:
+            reply["writeErrors"] = errors
+        return reply
+
+    def _update_one(self, database, collection, spec, variables):
+        query = spec.get("q") or {}
+        update = spec["u"]
+        array_filters = spec.get("arrayFilters")
+        targets = collection.find(query)
+        if targets and not spec.get("multi"):
+            if spec.get("sort"):
+                targets = sort_docs(targets, spec["sort"])
+            targets = targets[:1]
+        matched = modified = 0
+        for doc in targets:
+            new = updates.apply(doc, update, query, array_filters, database=database, variables=variables)
+            matched += 1
+            if new != doc or list(new) != list(doc):
+                collection.replace(doc, new)
+                modified += 1
+        upserted = None
+        if not targets and spec.get("upsert"):
+            seed = updates.upsert_seed(query)
+            if updates.is_replacement(update):
+                new = updates.apply(seed, update, query)
+                if "_id" not in new and "_id" in seed:
+                    new = {"_id": seed["_id"], **new}
+            else:
+                new = updates.apply(seed, update, query, array_filters, inserting=True, database=database,
+                                    variables=variables)
+            new = collection.insert(new)
+            upserted = new["_id"]
+        return matched, modified, upserted
+
+    def cmd_update(self, database, command):
+        collection = database.collection(command["update"], create=True)
+        ordered = command.get("ordered", True)
+        variables = self._variables(command)
+        matched = modified = 0
+        upserted, errors = [], []
+        for index, spec in enumerate(command.get("updates", [])):
+            try:
+                n, m, upserted_id = self._update_one(database, collection, spec, variables)
+            except MongoError as error:
+                errors.append(self._write_error(index, error))
+                if ordered:
+                    break
+                continue
+            matched += n
+            modified += m
+            if upserted_id is not None:
+                upserted.append({"index": index, "_id": upserted_id})
+        reply = {"n": matched + len(upserted), "nModified": modified}
+        if upserted:
+            reply["upserted"] = upserted
+        if errors:
+            reply["writeErrors"] = errors
+        return reply
+
+    def cmd_delete(self, database, command):
+        collection = database.collection(command["delete"])
+        deleted = 0
+        for spec in command.get("deletes", []):
+            if collection is None:
+                continue
+            targets = collection.find(spec.get("q") or {})
+            if spec.get("limit"):
+                targets = targets[:1]
+            for doc in targets:
+                collection.delete(doc)
+                deleted += 1
+        return {"n": deleted}
+
+    def cmd_findAndModify(self, database, command):
+        collection = database.collection(command["findAndModify"], create=True)
+        query = command.get("query") or {}
+        targets = collection.find(query)
+        if command.get("sort"):
+            targets = sort_docs(targets, command["sort"])
+        doc = targets[0] if targets else None
+        fields = command.get("fields")
+        variables = self._variables(command)
+
+        def shaped(value):
+            if value is None or not fields:
+                return value
+            return project(value, fields, variables, find=True)
+
+        if command.get("remove"):
+            if doc is not None:
+                collection.delete(doc)
+            return {"value": shaped(doc), "lastErrorObject": {"n": int(doc is not None)}}
+
+        update = command.get("update")
+        if doc is not None:
+            new = updates.apply(doc, update, query, command.get("arrayFilters"), database=database, variables=variables)
+            collection.replace(doc, new)
+            return {
+                "value": shaped(new if command.get("new") else doc),
+                "lastErrorObject": {"n": 1, "updatedExisting": True},
+            }
+        if command.get("upsert"):
+            seed = updates.upsert_seed(query)
+            new = collection.insert(updates.apply(
+                seed, update, query, command.get("arrayFilters"), inserting=True, database=database, variables=variables,
+            ))
+            return {
+                "value": shaped(new) if command.get("new") else None,
+                "lastErrorObject": {"n": 1, "updatedExisting": False, "upserted": new["_id"]},
+            }
+        return {"value": None, "lastErrorObject": {"n": 0, "updatedExisting": False}}
+
+    cmd_findandmodify = cmd_findAndModify
+
@@ -0,0 +1,914 @@
+import datetime
+import math
+
+from bson import Decimal128, ObjectId
+
+from .values import (
+    MISSING, MongoError, SortKey, compare, compile_regex, get_path, hashable, is_number, naive_utc,
+    number, type_name, truthy,
+)
+
+
+# ==========================================
+# EXPRESIONES DE AGREGACIÓN
+# ==========================================
+# evaluate(expr, doc, variables) resuelve "$campo", "$$variable", literales,
+# objetos y operadores ({"$op": args}). Los operadores que faltan responden
+# con un error de comando en vez de devolver algo inventado.
+
+def now():
+    value = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def evaluate(expr, doc, variables=None):
+    scope = {"NOW": None, **(variables or {})}
+    scope.setdefault("ROOT", doc)
+    scope["CURRENT"] = doc
+    return _eval(expr, scope)
+
+
+def _variable(name, scope):
+    head, _, rest = name.partition(".")
+    if head == "REMOVE":
+        return MISSING
+    if head == "NOW":
+        if scope.get("NOW") is None:
+            scope["NOW"] = now()
+        value = scope["NOW"]
+    elif head in scope:
+        value = scope[head]
+    else:
+        raise MongoError(f"Use of undefined variable: {head}", code=17276)
+    return get_path(value, rest) if rest else value
+
+
+def _eval(expr, scope):
+    if isinstance(expr, str):
+        if expr.startswith("$$"):
+            return _variable(expr[2:], scope)
+        if expr.startswith("$"):
+            return get_path(scope["CURRENT"], expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [_none(_eval(item, scope)) for item in expr]
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            (key, args), = expr.items()
+            if key.startswith("$"):
+                operator = OPERATORS.get(key)
+                if operator is None:
+                    raise MongoError(f"Unrecognized expression '{key}'", code=168, code_name="InvalidPipelineOperator")
+                return operator(args, scope)
+        result = {}
+        for key, value in expr.items():
+            value = _eval(value, scope)
+            if value is not MISSING:
+                result[key] = value
+        return result
+    return expr
+
+
+def _none(value):
+    return None if value is MISSING else value
+
+
+def _args(args, scope):
+    if not isinstance(args, list):
+        args = [args]
+    return [_eval(arg, scope) for arg in args]
+
+
+def _single(args, scope):
+    if isinstance(args, list):
+        if len(args) != 1:
+            raise MongoError("Expression takes exactly 1 argument", code=16020)
+        args = args[0]
+    return _eval(args, scope)
+
+
+def _nullish(value):
+    return value is None or value is MISSING
+
+
+def _num(value):
+    value = number(value)
+    return value
+
+
+# ------------------------------------------
+# Aritmética
+# ------------------------------------------
+
+def _add(args, scope):
+    values = _args(args, scope)
+    if any(_nullish(value) for value in values):
+        return None
+    date = None
+    total = 0
+    for value in values:
+        if isinstance(value, datetime.datetime):
+            date = value
+        elif is_number(value):
+            total += _num(value)
+        else:
+            raise MongoError(f"$add only supports numeric or date types, not {type_name(value)}", code=16554)
+    if date is not None:
+        return date + datetime.timedelta(milliseconds=total)
+    return total
+
+
+def _subtract(args, scope):
+    a, b = _args(args, scope)
+    if _nullish(a) or _nullish(b):
+        return None
+    if isinstance(a, datetime.datetime) and isinstance(b, datetime.datetime):
+        return int((naive_utc(a) - naive_utc(b)).total_seconds() * 1000)
+    if isinstance(a, datetime.datetime):
+        return a - datetime.timedelta(milliseconds=_num(b))
+    return _num(a) - _num(b)
+
+
+def _multiply(args, scope):
+    values = _args(args, scope)
+    if any(_nullish(value) for value in values):
+        return None
+    result = 1
+    for value in values:
+        result *= _num(value)
+    return result
+
+
+def _divide(args, scope):
+    a, b = _args(args, scope)
+    if _nullish(a) or _nullish(b):
+        return None
+    if _num(b) == 0:
+        raise MongoError("can't $divide by zero", code=16608)
+    return _num(a) / _num(b)
+
+
+def _mod(args, scope):
+    a, b = _args(args, scope)
+    if _nullish(a) or _nullish(b):
+        return None
+    return math.fmod(_num(a), _num(b)) if isinstance(a, float) or isinstance(b, float) else int(math.fmod(a, b))
+
+
+def _unary_math(function):
+    def operator(args, scope):
+        value = _single(args, scope)
+        if _nullish(value):
+            return None
+        return function(_num(value))
+    return operator
+
+
+def _round(function):
+    def operator(args, scope):
+        values = _args(args, scope)
+        value, places = values[0], (values[1] if len(values) > 1 else 0)
+        if _nullish(value):
+            return None
+        value = _num(value)
+        if function == "round":
+            result = round(value, places)
+        else:
+            factor = 10 ** places
+            result = math.trunc(value * factor) / factor
+        if isinstance(value, int) and places >= 0:
+            return value
+        return float(result) if isinstance(value, float) else result
+    return operator
+
+
+def _pow(args, scope):
+    a, b = _args(args, scope)
+    if _nullish(a) or _nullish(b):
+        return None
+    return _num(a) ** _num(b)
+
+
+# ------------------------------------------
+# Comparación y lógica
+# ------------------------------------------
+
+def _comparison(test):
+    def operator(args, scope):
+        a, b = _args(args, scope)
+        return test(compare(a, b))
+    return operator
+
+
+def _cmp(args, scope):
+    a, b = _args(args, scope)
+    return compare(a, b)
+
+
+def _and(args, scope):
+    return all(truthy(_eval(arg, scope)) for arg in (args if isinstance(args, list) else [args]))
+
+
+def _or(args, scope):
+    return any(truthy(_eval(arg, scope)) for arg in (args if isinstance(args, list) else [args]))
+
+
+def _not(args, scope):
+    return not truthy(_single(args, scope))
+
+
+def _cond(args, scope):
+    if isinstance(args, dict):
+        condition, then, otherwise = args["if"], args["then"], args["else"]
+    else:
+        condition, then, otherwise = args
+    return _eval(then if truthy(_eval(condition, scope)) else otherwise, scope)
+
+
+def _if_null(args, scope):
+    for arg in args:
+        value = _eval(arg, scope)
+        if not _nullish(value):
+            return value
+    return _eval(args[-1], scope)
+
+
+def _switch(args, scope):
+    for branch in args["branches"]:
+        if truthy(_eval(branch["case"], scope)):
+            return _eval(branch["then"], scope)
+    if "default" not in args:
+        raise MongoError("$switch could not find a matching branch for an input", code=40066)
+    return _eval(args["default"], scope)
+
+
+def _let(args, scope):
+    inner = dict(scope)
+    for name, value in args["vars"].items():
+        inner[name] = _eval(value, scope)
+    return _eval(args["in"], inner)
+
+
+# ------------------------------------------
+# Arrays
+# ------------------------------------------
+
+def _array(value, operator):
+    if not isinstance(value, list):
+        raise MongoError(f"{operator}'s argument must be an array, but is {type_name(value)}", code=28765)
+    return value
+
+
+def _in(args, scope):
+    value, array = _args(args, scope)
+    return any(compare(value, item) == 0 for item in _array(array, "$in"))
+
+
+def _size(args, scope):
+    value = _single(args, scope)
+    return len(_array(value, "$size"))
+
+
+def _array_elem_at(args, scope):
+    array, index = _args(args, scope)
+    if _nullish(array) or _nullish(index):
+        return None
+    array = _array(array, "$arrayElemAt")
+    index = int(index)
+    if -len(array) <= index < len(array):
+        return array[index]
+    return MISSING
+
+
+def _first(args, scope):
+    value = _single(args, scope)
+    if _nullish(value):
+        return None
+    return _array(value, "$first")[0] if value else MISSING
+
+
+def _last(args, scope):
+    value = _single(args, scope)
+    if _nullish(value):
+        return None
+    return _array(value, "$last")[-1] if value else MISSING
+
+
+def _slice(args, scope):
+    values = _args(args, scope)
+    array = values[0]
+    if _nullish(array):
+        return None
+    array = _array(array, "$slice")
+    if len(values) == 2:
+        n = int(values[1])
+        return array[:n] if n >= 0 else array[n:]
+    position, n = int(values[1]), int(values[2])
+    if position < 0:
+        position = max(len(array) + position, 0)
+    return array[position:position + n]
+
+
+def _concat_arrays(args, scope):
+    result = []
+    for value in _args(args, scope):
+        if _nullish(value):
+            return None
+        result.extend(_array(value, "$concatArrays"))
+    return result
+
+
+def _filter(args, scope):
+    array = _eval(args["input"], scope)
+    if _nullish(array):
+        return None
+    name = args.get("as", "this")
+    limit = _eval(args["limit"], scope) if "limit" in args else None
+    result = []
+    inner = dict(scope)
+    for item in _array(array, "$filter"):
+        inner[name] = item
+        if truthy(_eval(args["cond"], inner)):
+            result.append(item)
+            if limit is not None and len(result) >= limit:
+                break
+    return result
+
+
+def _map(args, scope):
+    array = _eval(args["input"], scope)
+    if _nullish(array):
+        return None
+    name = args.get("as", "this")
+    inner = dict(scope)
+    result = []
+    for item in _array(array, "$map"):
+        inner[name] = item
+        result.append(_none(_eval(args["in"], inner)))
+    return result
+
+
+def _reduce(args, scope):
+    array = _eval(args["input"], scope)
+    if _nullish(array):
+        return None
+    value = _eval(args["initialValue"], scope)
+    inner = dict(scope)
+    for item in _array(array, "$reduce"):
+        inner["this"], inner["value"] = item, value
+        value = _eval(args["in"], inner)
+    return value
+
+
+def _sort_array(args, scope):
+    array = _eval(args["input"], scope)
+    if _nullish(array):
+        return None
+    sort_by = args["sortBy"]
+    array = list(_array(array, "$sortArray"))
+    if isinstance(sort_by, dict):
+        for field, direction in reversed(list(sort_by.items())):
+            array.sort(key=lambda item: SortKey(get_path(item, field)), reverse=direction < 0)
+    else:
+        array.sort(key=SortKey, reverse=sort_by < 0)
+    return array
+
+
+def _is_array(args, scope):
+    return isinstance(_single(args, scope), list)
+
+
+def _index_of_array(args, scope):
+    values = _args(args, scope)
+    array, target = values[0], values[1]
+    if _nullish(array):
+        return None
+    start = int(values[2]) if len(values) > 2 else 0
+    end = int(values[3]) if len(values) > 3 else len(array)
+    for index in range(start, min(end, len(array))):
+        if compare(array[index], target) == 0:
+            return index
+    return -1
+
+
+def _reverse_array(args, scope):
+    value = _single(args, scope)
+    if _nullish(value):
+        return None
+    return list(reversed(_array(value, "$reverseArray")))
+
+
+def _set_is_subset(args, scope):
+    a, b = _args(args, scope)
+    keys = {hashable(item) for item in _array(b, "$setIsSubset")}
+    return all(hashable(item) in keys for item in _array(a, "$setIsSubset"))
+
+
+def _set_intersection(args, scope):
+    arrays = _args(args, scope)
+    if any(_nullish(array) for array in arrays):
+        return None
+    result, seen = [], set()
+    others = [{hashable(item) for item in array} for array in arrays[1:]]
+    for item in arrays[0]:
+        key = hashable(item)
+        if key not in seen and all(key in other for other in others):
+            seen.add(key)
+            result.append(item)
+    return result
+
+
+def _set_union(args, scope):
+    arrays = _args(args, scope)
+    if any(_nullish(array) for array in arrays):
+        return None
+    result, seen = [], set()
+    for array in arrays:
+        for item in array:
+            key = hashable(item)
+            if key not in seen:
+                seen.add(key)
+                result.append(item)
+    return result
+
+
+def _any_element_true(args, scope):
+    return any(truthy(item) for item in _array(_single(args, scope), "$anyElementTrue"))
+
+
+def _all_elements_true(args, scope):
+    return all(truthy(item) for item in _array(_single(args, scope), "$allElementsTrue"))
+
+
+# ------------------------------------------
+# Acumuladores como expresiones ($sum, $avg, $min, $max)
+# ------------------------------------------
+
+def _operands(args, scope):
+    values = _args(args, scope)
+    if not isinstance(args, list) or len(args) == 1:
+        value = values[0]
+        if isinstance(value, list):
+            return value
+    return values
+
+
+def sum_numbers(values):
+    total = 0
+    for value in values:
+        if is_number(value):
+            total += _num(value)
+    return total
+
+
+def _sum(args, scope):
+    return sum_numbers(_operands(args, scope))
+
+
+def _avg(args, scope):
+    numbers = [_num(value) for value in _operands(args, scope) if is_number(value)]
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+def _extreme(sign):
+    def operator(args, scope):
+        values = [value for value in _operands(args, scope) if not _nullish(value)]
+        if not values:
+            return None
+        result = values[0]
+        for value in values[1:]:
+            if compare(value, result) * sign > 0:
+                result = value
+        return result
+    return operator
+
+
+# ------------------------------------------
+# Strings
+# ------------------------------------------
+
+def _string(value, operator):
+    if not isinstance(value, str):
+        raise MongoError(f"{operator} requires a string argument, found: {type_name(value)}", code=16702)
+    return value
+
+
+def _concat(args, scope):
+    values = _args(args, scope)
+    if any(_nullish(value) for value in values):
+        return None
+    return "".join(_string(value, "$concat") for value in values)
+
+
+def _case(function):
+    def operator(args, scope):
+        value = _single(args, scope)
+        if _nullish(value):
+            return ""
+        return function(value if isinstance(value, str) else to_string(value))
+    return operator
+
+
+def _substr(args, scope):
+    value, start, length = _args(args, scope)
+    if _nullish(value):
+        return ""
+    value = value if isinstance(value, str) else to_string(value)
+    start, length = int(start), int(length)
+    return value[start:] if length < 0 else value[start:start + length]
+
+
+def _str_len(args, scope):
+    return len(_string(_single(args, scope), "$strLenCP"))
+
+
+def _index_of_cp(args, scope):
+    values = _args(args, scope)
+    value, target = values[0], values[1]
+    if _nullish(value):
+        return None
+    start = int(values[2]) if len(values) > 2 else 0
+    end = int(values[3]) if len(values) > 3 else len(value)
+    return value.find(target, start, end)
+
+
+def _regex_args(args, scope):
+    value = _eval(args["input"], scope)
+    regex = compile_regex(_eval(args["regex"], scope), _eval(args.get("options", ""), scope))
+    return value, regex
+
+
+def _regex_match(args, scope):
+    value, regex = _regex_args(args, scope)
+    return isinstance(value, str) and bool(regex.search(value))
+
+
+def _regex_find(args, scope):
+    value, regex = _regex_args(args, scope)
+    if not isinstance(value, str):
+        return None
+    found = regex.search(value)
+    if not found:
+        return None
+    return {"match": found.group(0), "idx": found.start(), "captures": list(found.groups())}
+
+
+def _replace(count):
+    def operator(args, scope):
+        value, find, replacement = (_eval(args[key], scope) for key in ("input", "find", "replacement"))
+        if _nullish(value) or _nullish(find) or _nullish(replacement):
+            return None
+        return value.replace(find, replacement, count)
+    return operator
+
+
+def _split(args, scope):
+    value, delimiter = _args(args, scope)
+    if _nullish(value):
+        return None
+    return value.split(delimiter)
+
+
+def _trim(function):
+    def operator(args, scope):
+        value = _eval(args["input"], scope)
+        if _nullish(value):
+            return None
+        chars = _eval(args["chars"], scope) if "chars" in args else None
+        return getattr(value, function)(chars)
+    return operator
+
+
+# ------------------------------------------
+# Conversión y tipos
+# ------------------------------------------
+
+def date_string(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def to_string(value):
+    if _nullish(value):
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return date_string(naive_utc(value))
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if is_number(value):
+        return str(_num(value))
+    raise MongoError(f"Unsupported conversion from {type_name(value)} to string", code=241, code_name="ConversionFailure")
+
+
+_DATE_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d",
+)
+
+_MONGO_FORMAT = {"%L": "%f", "%Z": "", "%z": "%z"}
+
+
+def parse_date(value, date_format=None):
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+0000"
+    formats = _DATE_FORMATS
+    if date_format:
+        converted = date_format
+        for mongo, python in _MONGO_FORMAT.items():
+            converted = converted.replace(mongo, python)
+        formats = (converted,)
+    for candidate in formats:
+        try:
+            return naive_utc(datetime.datetime.strptime(value, candidate))
+        except ValueError:
+            continue
+    raise MongoError(f"Error parsing date string '{value}'", code=241, code_name="ConversionFailure")
+
+
+def convert(value, to):
+    if _nullish(value):
+        return None
+    if to in ("string", 2):
+        return to_string(value)
+    if to in ("int", 16, "long", 18):
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                raise MongoError(f"Failed to parse number '{value}'", code=241, code_name="ConversionFailure")
+        if isinstance(value, datetime.datetime):
+            return int(naive_utc(value).replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+        return int(_num(value))
+    if to in ("double", 1, "decimal", 19):
+        if isinstance(value, str):
+            try:
+                result = float(value)
+            except ValueError:
+                raise MongoError(f"Failed to parse number '{value}'", code=241, code_name="ConversionFailure")
+        else:
+            result = float(_num(value))
+        return Decimal128(str(result)) if to in ("decimal", 19) else result
+    if to in ("bool", 8):
+        return truthy(value)
+    if to in ("date", 9):
+        if isinstance(value, datetime.datetime):
+            return value
+        if isinstance(value, str):
+            return parse_date(value)
+        if isinstance(value, ObjectId):
+            return value.generation_time.replace(tzinfo=None)
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(milliseconds=_num(value))
+    if to in ("objectId", 7):
+        if isinstance(value, ObjectId):
+            return value
+        try:
+            return ObjectId(value)
+        except Exception:
+            raise MongoError(f"Failed to parse objectId '{value}'", code=241, code_name="ConversionFailure")
+    raise MongoError(f"Unsupported conversion to {to}", code=241, code_name="ConversionFailure")
+
+
+def _convert(args, scope):
+    value = _eval(args["input"], scope)
+    try:
+        if _nullish(value) and "onNull" in args:
+            return _eval(args["onNull"], scope)
+        return convert(value, _eval(args["to"], scope))
+    except MongoError:
+        if "onError" in args:
+            return _eval(args["onError"], scope)
+        raise
+
+
+def _to(to):
+    def operator(args, scope):
+        return convert(_single(args, scope), to)
+    return operator
+
+
+def _type(args, scope):
+    return type_name(_single(args, scope))
+
+
+# ------------------------------------------
+# Fechas
+# ------------------------------------------
+
+def _date_part(function):
+    def operator(args, scope):
+        value = _eval(args["date"], scope) if isinstance(args, dict) else _single(args, scope)
+        if _nullish(value):
+            return None
+        return function(naive_utc(value))
+    return operator
+
+
+def _date_to_string(args, scope):
+    value = _eval(args["date"], scope)
+    if _nullish(value):
+        return _eval(args["onNull"], scope) if "onNull" in args else None
+    value = naive_utc(value)
+    date_format = args.get("format", "%Y-%m-%dT%H:%M:%S.%LZ")
+    result = date_format.replace("%L", f"{value.microsecond // 1000:03d}")
+    return value.strftime(result)
+
+
+def _date_from_string(args, scope):
+    value = _eval(args["dateString"], scope)
+    try:
+        if _nullish(value):
+            return _eval(args["onNull"], scope) if "onNull" in args else None
+        return parse_date(value, args.get("format"))
+    except MongoError:
+        if "onError" in args:
+            return _eval(args["onError"], scope)
+        raise
+
+
+def _date_trunc(args, scope):
+    value = _eval(args["date"], scope)
+    if _nullish(value):
+        return None
+    value = naive_utc(value)
+    unit = _eval(args["unit"], scope)
+    if unit == "year":
+        return value.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    if unit == "month":
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if unit == "week":
+        value -= datetime.timedelta(days=(value.weekday() + 1) % 7)
+        unit = "day"
+    if unit == "day":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    if unit == "minute":
+        return value.replace(second=0, microsecond=0)
+    if unit == "second":
+        return value.replace(microsecond=0)
+    raise MongoError(f"unsupported unit {unit}", code=5439014)
+
+
+# ------------------------------------------
+# Objetos
+# ------------------------------------------
+
+def _get_field(args, scope):
+    if isinstance(args, dict) and "field" in args:
+        field = _eval(args["field"], scope)
+        source = _eval(args.get("input", "$$CURRENT"), scope)
+    else:
+        field, source = _eval(args, scope), scope["CURRENT"]
+    if not isinstance(source, dict):
+        return MISSING if _nullish(source) else None
+    return source.get(field, MISSING)
+
+
+def _set_field(args, scope):
+    field = _eval(args["field"], scope)
+    source = _eval(args["input"], scope)
+    value = _eval(args["value"], scope)
+    if _nullish(source):
+        return None
+    result = dict(source)
+    if value is MISSING:
+        result.pop(field, None)
+    else:
+        result[field] = value
+    return result
+
+
+def _merge_objects(args, scope):
+    result = {}
+    for value in _operands(args, scope):
+        if isinstance(value, dict):
+            result.update(value)
+    return result
+
+
+def _object_to_array(args, scope):
+    value = _single(args, scope)
+    if _nullish(value):
+        return None
+    return [{"k": key, "v": item} for key, item in value.items()]
+
+
+def _array_to_object(args, scope):
+    value = _single(args, scope)
+    if _nullish(value):
+        return None
+    result = {}
+    for item in value:
+        if isinstance(item, dict):
+            result[item["k"]] = item["v"]
+        else:
+            result[item[0]] = item[1]
+    return result
+
+
+OPERATORS = {
+    "$literal": lambda args, scope: args,
+    "$add": _add,
+    "$subtract": _subtract,
+    "$multiply": _multiply,
+    "$divide": _divide,
+    "$mod": _mod,
+    "$abs": _unary_math(abs),
+    "$floor": _unary_math(lambda value: math.floor(value) if isinstance(value, float) else value),
+    "$ceil": _unary_math(lambda value: math.ceil(value) if isinstance(value, float) else value),
+    "$sqrt": _unary_math(math.sqrt),
+    "$exp": _unary_math(math.exp),
+    "$ln": _unary_math(math.log),
+    "$log10": _unary_math(math.log10),
+    "$round": _round("round"),
+    "$trunc": _round("trunc"),
+    "$pow": _pow,
+    "$eq": _comparison(lambda c: c == 0),
+    "$ne": _comparison(lambda c: c != 0),
+    "$gt": _comparison(lambda c: c > 0),
+    "$gte": _comparison(lambda c: c >= 0),
+    "$lt": _comparison(lambda c: c < 0),
+    "$lte": _comparison(lambda c: c <= 0),
+    "$cmp": _cmp,
+    "$and": _and,
+    "$or": _or,
+    "$not": _not,
+    "$cond": _cond,
+    "$ifNull": _if_null,
+    "$switch": _switch,
+    "$let": _let,
+    "$in": _in,
+    "$size": _size,
+    "$arrayElemAt": _array_elem_at,
+    "$first": _first,
+    "$last": _last,
+    "$slice": _slice,
+    "$concatArrays": _concat_arrays,
+    "$filter": _filter,
+    "$map": _map,
+    "$reduce": _reduce,
+    "$sortArray": _sort_array,
+    "$isArray": _is_array,
+    "$indexOfArray": _index_of_array,
+    "$reverseArray": _reverse_array,
+    "$setIsSubset": _set_is_subset,
+    "$setIntersection": _set_intersection,
+    "$setUnion": _set_union,
+    "$anyElementTrue": _any_element_true,
+    "$allElementsTrue": _all_elements_true,
+    "$sum": _sum,
+    "$avg": _avg,
+    "$min": _extreme(-1),
+    "$max": _extreme(1),
+    "$concat": _concat,
+    "$toLower": _case(str.lower),
+    "$toUpper": _case(str.upper),
+    "$substr": _substr,
+    "$substrCP": _substr,
+    "$substrBytes": _substr,
+    "$strLenCP": _str_len,
+    "$strLenBytes": lambda args, scope: len(_string(_single(args, scope), "$strLenBytes").encode()),
+    "$indexOfCP": _index_of_cp,
+    "$regexMatch": _regex_match,
+    "$regexFind": _regex_find,
+    "$replaceAll": _replace(-1),
+    "$replaceOne": _replace(1),
+    "$split": _split,
+    "$trim": _trim("strip"),
+    "$ltrim": _trim("lstrip"),
+    "$rtrim": _trim("rstrip"),
+    "$toString": lambda args, scope: to_string(_single(args, scope)),
+    "$toInt": _to("int"),
+    "$toLong": _to("long"),
+    "$toDouble": _to("double"),
+    "$toDecimal": _to("decimal"),
+    "$toBool": _to("bool"),
+    "$toDate": _to("date"),
+    "$toObjectId": _to("objectId"),
+    "$convert": _convert,
+    "$type": _type,
+    "$isNumber": lambda args, scope: is_number(_single(args, scope)),
+    "$year": _date_part(lambda value: value.year),
+    "$month": _date_part(lambda value: value.month),
+    "$dayOfMonth": _date_part(lambda value: value.day),
+    "$hour": _date_part(lambda value: value.hour),
+    "$minute": _date_part(lambda value: value.minute),
+    "$second": _date_part(lambda value: value.second),
+    "$millisecond": _date_part(lambda value: value.microsecond // 1000),
+    "$dayOfWeek": _date_part(lambda value: value.isoweekday() % 7 + 1),
+    "$dayOfYear": _date_part(lambda value: value.timetuple().tm_yday),
+    "$dateToString": _date_to_string,
+    "$dateFromString": _date_from_string,
+    "$dateTrunc": _date_trunc,
+    "$getField": _get_field,
+    "$setField": _set_field,
+    "$mergeObjects": _merge_objects,
+    "$objectToArray": _object_to_array,
+    "$arrayToObject": _array_to_object,
+}
@@ -0,0 +1,509 @@
+from .expressions import evaluate, sum_numbers
+from .query import is_operator_dict, match_values, matches
+from .values import (
+    MISSING, MongoError, SortKey, compare, get_path, hashable, is_number, number, set_path, traverse,
+    unset_path,
+)
+
+
+# ==========================================
+# PIPELINES DE AGREGACIÓN
+# ==========================================
+# run(docs, pipeline, database, variables) aplica las etapas en orden sobre
+# listas de documentos. Las etapas nunca modifican sus entradas (devuelven
+# copias superficiales), así que los documentos guardados se pueden pasar
+# tal cual.
+
+def run(docs, pipeline, database, variables=None):
+    variables = dict(variables or {})
+    for stage in pipeline:
+        if len(stage) != 1:
+            raise MongoError("A pipeline stage specification object must contain exactly one field.", code=40323)
+        (name, spec), = stage.items()
+        handler = STAGES.get(name)
+        if handler is None:
+            raise MongoError(f"Unrecognized pipeline stage name: '{name}'", code=40324)
+        docs = handler(list(docs), spec, database, variables)
+    return list(docs)
+
+
+# ------------------------------------------
+# Proyección (find y $project)
+# ------------------------------------------
+
+def _is_inclusion(value):
+    return value is True or (is_number(value) and not isinstance(value, bool) and number(value) != 0)
+
+
+def _is_exclusion(value):
+    return value is False or (is_number(value) and number(value) == 0)
+
+
+def _flatten_spec(spec, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}; las expresiones quedan como hojas."""
+    flat = {}
+    for key, value in spec.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value and not is_operator_dict(value):
+            flat.update(_flatten_spec(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def project(doc, spec, variables=None, find=False):
+    if not spec:
+        return doc
+    spec = _flatten_spec(spec)
+    special = {
+        path: value for path, value in spec.items()
+        if find and isinstance(value, dict) and ("$slice" in value or "$elemMatch" in value)
+    }
+    id_spec = spec.get("_id", True)
+    keep_id = not _is_exclusion(id_spec)
+    id_expression = None if _is_inclusion(id_spec) or _is_exclusion(id_spec) else id_spec
+    rest = {path: value for path, value in spec.items() if path not in special and path != "_id"}
+
+    if rest:
+        exclusion = all(_is_exclusion(value) for value in rest.values())
+    else:
+        exclusion = id_expression is None and (bool(special) or not keep_id)
+
+    if exclusion:
+        result = doc
+        for path in rest:
+            result = unset_path(result, path)
+        if not keep_id:
+            result = unset_path(result, "_id")
+    else:
+        result = {}
+        if keep_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for path, value in rest.items():
+            if _is_inclusion(value):
+                result = _include(doc, result, path.split("."))
+            else:
+                computed = evaluate(value, doc, variables)
+                if computed is not MISSING:
+                    result = set_path(result, path, computed)
+        if id_expression is not None:
+            result = dict(result)
+            result["_id"] = evaluate(id_expression, doc, variables)
+
+    for path, value in special.items():
+        current = get_path(doc, path)
+        if "$slice" in value:
+            if not isinstance(current, list):
+                if exclusion and current is not MISSING:
+                    continue
+                if current is not MISSING:
+                    result = set_path(result, path, current)
+                continue
+            argument = value["$slice"]
+            if isinstance(argument, list):
+                skip, limit = argument
+                if skip < 0:
+                    skip = max(len(current) + skip, 0)
+                sliced = current[skip:skip + limit]
+            else:
+                sliced = current[:argument] if argument >= 0 else current[argument:]
+            result = set_path(result, path, sliced)
+        else:
+            found = [
+                item for item in (current if isinstance(current, list) else [])
+                if (matches(item, value["$elemMatch"], variables) if isinstance(item, dict)
+                    else match_values([item], value["$elemMatch"], variables))
+            ]
+            if found:
+                result = set_path(result, path, found[:1])
+            else:
+                result = unset_path(result, path)
+    return result
+
+
+def _include(source, target, parts):
+    head, rest = parts[0], parts[1:]
+    if not isinstance(source, dict) or head not in source:
+        return target
+    value = source[head]
+    target = dict(target)
+    if not rest:
+        target[head] = value
+        return target
+    if isinstance(value, dict):
+        target[head] = _include(value, target.get(head, {}), rest)
+    elif isinstance(value, list):
+        existing = target.get(head)
+        items = []
+        for index, item in enumerate(value):
+            if isinstance(item, dict):
+                base = existing[index] if isinstance(existing, list) and index < len(existing) else {}
+                items.append(_include(item, base, rest))
+            elif isinstance(item, list):
+                items.append(item)
+        target[head] = items
+    return target
+
+
+# ------------------------------------------
+# Orden
+# ------------------------------------------
+
+def sort_value(doc, path, descending):
+    values = []
+    for value in traverse(doc, path.split(".")):
+        if isinstance(value, list):
+            values.extend(value or [MISSING])
+        else:
+            values.append(value)
+    values = [None if value is MISSING else value for value in values] or [None]
+    chosen = values[0]
+    for value in values[1:]:
+        result = compare(value, chosen)
+        if (descending and result > 0) or (not descending and result < 0):
+            chosen = value
+    return chosen
+
+
+def sort_docs(docs, spec):
+    docs = list(docs)
+    for path, direction in reversed(list(spec.items())):
+        if isinstance(direction, dict):
+            continue
+        descending = direction < 0
+        docs.sort(key=lambda doc: SortKey(sort_value(doc, path, descending)), reverse=descending)
+    return docs
+
+
+# ------------------------------------------
+# Etapas
+# ------------------------------------------
+
+def _match(docs, spec, database, variables):
+    return [doc for doc in docs if matches(doc, spec, variables)]
+
+
+def _project(docs, spec, database, variables):
+    return [project(doc, spec, variables) for doc in docs]
+
+
+def _add_fields(docs, spec, database, variables):
+    result = []
+    for doc in docs:
+        new = doc
+        for path, expression in _flatten_spec(spec).items():
+            value = evaluate(expression, doc, variables)
+            new = unset_path(new, path) if value is MISSING else set_path(new, path, value)
+        result.append(new)
+    return result
+
+
+def _unset(docs, spec, database, variables):
+    paths = [spec] if isinstance(spec, str) else spec
+    result = []
+    for doc in docs:
+        for path in paths:
+            doc = unset_path(doc, path)
+        result.append(doc)
+    return result
+
+
+def _sort(docs, spec, database, variables):
+    return sort_docs(docs, spec)
+
+
+def _limit(docs, spec, database, variables):
+    return docs[:spec]
+
+
+def _skip(docs, spec, database, variables):
+    return docs[spec:]
+
+
+def _count(docs, spec, database, variables):
+    return [{spec: len(docs)}] if docs else []
+
+
+def _unwind(docs, spec, database, variables):
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"][1:]
+    preserve = spec.get("preserveNullAndEmptyArrays", False)
+    index_field = spec.get("includeArrayIndex")
+    result = []
+    for doc in docs:
+        value = get_path(doc, path)
+        if isinstance(value, list) and value:
+            for index, item in enumerate(value):
+                new = set_path(doc, path, item)
+                if index_field:
+                    new = set_path(new, index_field, index)
+                result.append(new)
+        elif isinstance(value, list) or value is None or value is MISSING:
+            if preserve:
+                new = doc if not isinstance(value, list) else unset_path(doc, path)
+                if index_field:
+                    new = set_path(new, index_field, None)
+                result.append(new)
+        else:
+            new = doc
+            if index_field:
+                new = set_path(new, index_field, None)
+            result.append(new)
+    return result
+
+
+def _field_values(doc, path):
+    values = []
+    for value in traverse(doc, path.split(".")):
+        if isinstance(value, list):
+            values.extend(value)
+        values.append(None if value is MISSING else value)
+    return values
+
+
+def _lookup(docs, spec, database, variables):
+    foreign = database.collection_docs(spec["from"]) if "from" in spec else []
+    local_field, foreign_field = spec.get("localField"), spec.get("foreignField")
+    pipeline = spec.get("pipeline")
+    positions = {id(item): position for position, item in enumerate(foreign)}
+    index = None
+    if local_field is not None:
+        index = {}
+        for item in foreign:
+            for value in _field_values(item, foreign_field):
+                index.setdefault(hashable(value), []).append(item)
+    result = []
+    for doc in docs:
+        if index is not None:
+            joined, seen = [], set()
+            for value in _field_values(doc, local_field):
+                for item in index.get(hashable(value), ()):
+                    if id(item) not in seen:
+                        seen.add(id(item))
+                        joined.append(item)
+            joined.sort(key=lambda item: positions[id(item)])
+        else:
+            joined = foreign
+        if pipeline is not None:
+            inner = dict(variables)
+            for name, expression in spec.get("let", {}).items():
+                inner[name] = evaluate(expression, doc, variables)
+            inner.pop("ROOT", None)
+            joined = run(joined, pipeline, database, inner)
+        result.append(set_path(doc, spec["as"], list(joined)))
+    return result
+
+
+def _union_with(docs, spec, database, variables):
+    if isinstance(spec, str):
+        spec = {"coll": spec}
+    other = database.collection_docs(spec["coll"])
+    if spec.get("pipeline"):
+        other = run(other, spec["pipeline"], database, variables)
+    return docs + list(other)
+
+
+def _facet(docs, spec, database, variables):
+    return [{name: run(docs, pipeline, database, variables) for name, pipeline in spec.items()}]
+
+
+def _replace_root(docs, spec, database, variables):
+    expression = spec["newRoot"] if "newRoot" in spec else spec
+    result = []
+    for doc in docs:
+        value = evaluate(expression, doc, variables)
+        if not isinstance(value, dict):
+            raise MongoError("'newRoot' expression must evaluate to an object", code=40228)
+        result.append(value)
+    return result
+
+
+def _replace_with(docs, spec, database, variables):
+    return _replace_root(docs, {"newRoot": spec}, database, variables)
+
+
+# ------------------------------------------
+# $group
+# ------------------------------------------
+
+class _Accumulator:
+    def __init__(self, operator, expression):
+        self.operator = operator
+        self.expression = expression
+        self.values = []
+
+    def add(self, doc, variables):
+        if self.operator == "$count":
+            self.values.append(1)
+        else:
+            self.values.append(evaluate(self.expression, doc, variables))
+
+    def result(self):
+        values = self.values
+        present = [value for value in values if value is not MISSING]
+        operator = self.operator
+        if operator in ("$sum", "$count"):
+            return sum_numbers(values if operator == "$sum" else present)
+        if operator == "$avg":
+            numbers = [number(value) for value in values if is_number(value)]
+            return sum(numbers) / len(numbers) if numbers else None
+        if operator in ("$min", "$max"):
+            candidates = [value for value in present if value is not None]
+            if not candidates:
+                return None
+            chosen = candidates[0]
+            for value in candidates[1:]:
+                result = compare(value, chosen)
+                if (operator == "$max" and result > 0) or (operator == "$min" and result < 0):
+                    chosen = value
+            return chosen
+        if operator == "$first":
+            return None if not values or values[0] is MISSING else values[0]
+        if operator == "$last":
+            return None if not values or values[-1] is MISSING else values[-1]
+        if operator == "$push":
+            return present
+        if operator == "$addToSet":
+            seen, unique = set(), []
+            for value in present:
+                key = hashable(value)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(value)
+            return unique
+        if operator == "$mergeObjects":
+            merged = {}
+            for value in present:
+                if isinstance(value, dict):
+                    merged.update(value)
+            return merged
+        raise MongoError(f"unknown group operator '{operator}'", code=15952)
+
+
+def _group(docs, spec, database, variables):
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc, variables)
+        if key is MISSING:
+            key = None
+        group = groups.get(hashable(key))
+        if group is None:
+            group = groups[hashable(key)] = (key, {
+                field: _Accumulator(*next(iter(accumulator.items())))
+                for field, accumulator in spec.items() if field != "_id"
+            })
+        for accumulator in group[1].values():
+            accumulator.add(doc, variables)
+    return [
+        {"_id": key, **{field: accumulator.result() for field, accumulator in accumulators.items()}}
+        for key, accumulators in groups.values()
+    ]
+
+
+def _bucket_auto(docs, spec, database, variables):
+    """Cubetas de tamaño parecido; un mismo valor nunca queda repartido en dos."""
+    keyed = sorted(
+        ((evaluate(spec["groupBy"], doc, variables), doc) for doc in docs),
+        key=lambda pair: SortKey(pair[0]),
+    )
+    keyed = [(None if value is MISSING else value, doc) for value, doc in keyed]
+    if not keyed:
+        return []
+    buckets_wanted = spec["buckets"]
+    size = max(-(-len(keyed) // buckets_wanted), 1)
+    output = spec.get("output", {"count": {"$sum": 1}})
+    buckets, start = [], 0
+    while start < len(keyed):
+        end = min(start + size, len(keyed))
+        while end < len(keyed) and compare(keyed[end][0], keyed[end - 1][0]) == 0:
+            end += 1
+        buckets.append(keyed[start:end])
+        start = end
+    result = []
+    for position, bucket in enumerate(buckets):
+        upper = buckets[position + 1][0][0] if position + 1 < len(buckets) else bucket[-1][0]
+        accumulators = {field: _Accumulator(*next(iter(accumulator.items()))) for field, accumulator in output.items()}
+        for _, doc in bucket:
+            for accumulator in accumulators.values():
+                accumulator.add(doc, variables)
+        result.append({
+            "_id": {"min": bucket[0][0], "max": upper},
+            **{field: accumulator.result() for field, accumulator in accumulators.items()},
+        })
+    return result
+
+
+# ------------------------------------------
+# Etapas de escritura ($merge, $out)
+# ------------------------------------------
+
+def _target(spec):
+    if isinstance(spec, dict):
+        return spec.get("coll")
+    return spec
+
+
+def _merge(docs, spec, database, variables):
+    if isinstance(spec, str):
+        spec = {"into": spec}
+    target = database.collection(_target(spec["into"]), create=True)
+    on = spec.get("on", "_id")
+    on = [on] if isinstance(on, str) else list(on)
+    when_matched = spec.get("whenMatched", "merge")
+    when_not_matched = spec.get("whenNotMatched", "insert")
+    for doc in docs:
+        existing = next(
+            (item for item in target.all() if all(compare(get_path(item, field), get_path(doc, field)) == 0 for field in on)),
+            None,
+        )
+        if existing is None:
+            if when_not_matched == "insert":
+                target.insert(doc)
+            elif when_not_matched == "fail":
+                raise MongoError("$merge could not find a matching document", code=13113)
+            continue
+        if when_matched == "replace":
+            new = dict(doc)
+            new["_id"] = existing["_id"]
+        elif when_matched == "merge":
+            new = {**existing, **doc}
+        elif when_matched == "keepExisting":
+            continue
+        elif when_matched == "fail":
+            raise MongoError("E11000 duplicate key error", code=11000, code_name="DuplicateKey")
+        else:
+            new = run([existing], when_matched, database, {**variables, "new": doc})[0]
+        target.replace(existing, new)
+    return []
+
+
+def _out(docs, spec, database, variables):
+    target = database.collection(_target(spec), create=True)
+    target.clear()
+    for doc in docs:
+        target.insert(doc)
+    return []
+
+
+STAGES = {
+    "$match": _match,
+    "$project": _project,
+    "$addFields": _add_fields,
+    "$set": _add_fields,
+    "$unset": _unset,
+    "$sort": _sort,
+    "$limit": _limit,
+    "$skip": _skip,
+    "$count": _count,
+    "$unwind": _unwind,
+    "$lookup": _lookup,
+    "$unionWith": _union_with,
+    "$facet": _facet,
+    "$replaceRoot": _replace_root,
+    "$replaceWith": _replace_with,
+    "$group": _group,
+    "$bucketAuto": _bucket_auto,
+    "$merge": _merge,
+    "$out": _out,
+}
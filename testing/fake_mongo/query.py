@@ -0,0 +1,155 @@
+from .values import (
+    MISSING, MongoError, bracket, compare, compile_regex, equal, is_regex, traverse, truthy, type_matches,
+)
+
+
+# ==========================================
+# FILTROS DE CONSULTA (find, $match, update, delete)
+# ==========================================
+# Un campo cumple la condición si la cumple alguno de sus valores
+# candidatos: el valor mismo o, si es un array, cualquiera de sus elementos.
+
+def matches(doc, query, variables=None):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, part, variables) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part, variables) for part in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, part, variables) for part in condition):
+                return False
+        elif key == "$expr":
+            from .expressions import evaluate
+            if not truthy(evaluate(condition, doc, variables)):
+                return False
+        elif key == "$comment":
+            continue
+        elif key.startswith("$"):
+            raise MongoError(f"unknown top level operator: {key}", code=2)
+        elif not match_field(doc, key, condition, variables):
+            return False
+    return True
+
+
+def is_operator_dict(condition):
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def match_field(doc, path, condition, variables=None):
+    values = list(traverse(doc, path.split(".")))
+    return match_values(values, condition, variables)
+
+
+def match_values(values, condition, variables=None):
+    if is_operator_dict(condition):
+        return all(
+            _operator(values, operator, argument, condition, variables)
+            for operator, argument in condition.items()
+            if operator != "$options"
+        )
+    return _eq(values, condition)
+
+
+def _expanded(values):
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def _value_eq(value, target):
+    if is_regex(target):
+        if isinstance(value, str):
+            return bool(compile_regex(target).search(value))
+        return is_regex(value) and value.pattern == target.pattern
+    if target is None:
+        return value is None or value is MISSING
+    return value is not MISSING and equal(value, target)
+
+
+def _eq(values, target):
+    return any(_value_eq(value, target) for value in _expanded(values))
+
+
+def _compare(values, target, test):
+    for value in _expanded(values):
+        if value is MISSING:
+            value = None
+        # Solo se comparan valores del mismo tipo (bracket), como en MongoDB
+        if value is None and target is None:
+            if test(0):
+                return True
+            continue
+        if value is None or target is None:
+            continue
+        if bracket(value) != bracket(target):
+            continue
+        if test(compare(value, target)):
+            return True
+    return False
+
+
+def _operator(values, operator, argument, condition, variables):
+    if operator == "$eq":
+        return _eq(values, argument)
+    if operator == "$ne":
+        return not _eq(values, argument)
+    if operator == "$gt":
+        return _compare(values, argument, lambda c: c > 0)
+    if operator == "$gte":
+        return _compare(values, argument, lambda c: c >= 0)
+    if operator == "$lt":
+        return _compare(values, argument, lambda c: c < 0)
+    if operator == "$lte":
+        return _compare(values, argument, lambda c: c <= 0)
+    if operator == "$in":
+        return any(_eq(values, target) for target in argument)
+    if operator == "$nin":
+        return not any(_eq(values, target) for target in argument)
+    if operator == "$exists":
+        return any(value is not MISSING for value in values) == bool(argument)
+    if operator == "$type":
+        wanted = argument if isinstance(argument, list) else [argument]
+        return any(
+            type_matches(value, item)
+            for value in _expanded(values) if value is not MISSING
+            for item in wanted
+        )
+    if operator == "$regex":
+        regex = compile_regex(argument, condition.get("$options", ""))
+        return any(isinstance(value, str) and regex.search(value) for value in _expanded(values))
+    if operator == "$size":
+        return any(isinstance(value, list) and len(value) == argument for value in values)
+    if operator == "$all":
+        if not argument:
+            return False
+        return all(
+            match_values(values, item, variables) if is_operator_dict(item) else _eq(values, item)
+            for item in argument
+        )
+    if operator == "$elemMatch":
+        for value in values:
+            if not isinstance(value, list):
+                continue
+            for element in value:
+                if is_operator_dict(argument) and not any(key in argument for key in ("$and", "$or", "$nor")):
+                    if match_values([element], argument, variables):
+                        return True
+                elif isinstance(element, dict) and matches(element, argument, variables):
+                    return True
+        return False
+    if operator == "$not":
+        if is_regex(argument):
+            return not _operator(values, "$regex", argument, {}, variables)
+        return not match_values(values, argument, variables)
+    if operator == "$mod":
+        divisor, remainder = argument
+        return any(
+            isinstance(value, (int, float)) and not isinstance(value, bool) and int(value) % divisor == remainder
+            for value in _expanded(values)
+        )
+    if operator == "$comment":
+        return True
+    raise MongoError(f"unknown operator: {operator}", code=2)
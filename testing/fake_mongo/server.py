@@ -0,0 +1,140 @@
+import socketserver
+import struct
+import threading
+
+import bson
+from bson.codec_options import CodecOptions
+
+from .engine import Engine
+
+
+# ==========================================
+# SERVIDOR DEL PROTOCOLO DE MONGODB
+# ==========================================
+# Atiende OP_MSG (todos los comandos) y OP_QUERY (solo el handshake
+# hello/isMaster que pymongo manda al abrir cada conexión). Responde como
+# un mongod 7.0 standalone: sin replica set, así que el backend no usa
+# transacciones.
+
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+
+CHECKSUM_PRESENT = 1
+MORE_TO_COME = 2
+
+CODEC_OPTIONS = CodecOptions(tz_aware=False)
+
+_HEADER = struct.Struct("<iiii")
+
+
+def _read_exactly(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("conexión cerrada")
+        data += chunk
+    return data
+
+
+def _cstring(data, offset):
+    end = data.index(b"\x00", offset)
+    return data[offset:end].decode(), end + 1
+
+
+def _parse_op_msg(body):
+    flags = struct.unpack_from("<I", body)[0]
+    end = len(body) - (4 if flags & CHECKSUM_PRESENT else 0)
+    offset = 4
+    command = None
+    sequences = {}
+    while offset < end:
+        kind = body[offset]
+        offset += 1
+        if kind == 0:
+            size = struct.unpack_from("<i", body, offset)[0]
+            command = bson.decode(body[offset:offset + size], CODEC_OPTIONS)
+            offset += size
+        else:
+            size = struct.unpack_from("<i", body, offset)[0]
+            section_end = offset + size
+            identifier, position = _cstring(body, offset + 4)
+            docs = []
+            while position < section_end:
+                doc_size = struct.unpack_from("<i", body, position)[0]
+                docs.append(bson.decode(body[position:position + doc_size], CODEC_OPTIONS))
+                position += doc_size
+            sequences[identifier] = docs
+            offset = section_end
+    command.update(sequences)
+    return flags, command
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        engine = self.server.engine
+        while True:
+            try:
+                header = _read_exactly(self.request, _HEADER.size)
+            except (ConnectionError, OSError):
+                return
+            length, request_id, _, opcode = _HEADER.unpack(header)
+            try:
+                body = _read_exactly(self.request, length - _HEADER.size)
+            except (ConnectionError, OSError):
+                return
+
+            if opcode == OP_QUERY:
+                collection, offset = _cstring(body, 4)
+                offset += 8
+                size = struct.unpack_from("<i", body, offset)[0]
+                query = bson.decode(body[offset:offset + size], CODEC_OPTIONS)
+                if "$query" in query:
+                    query = query["$query"]
+                reply = engine.execute(collection.split(".")[0], query)
+                payload = struct.pack("<iqii", 0, 0, 0, 1) + bson.encode(reply)
+                self._send(request_id, OP_REPLY, payload)
+            elif opcode == OP_MSG:
+                flags, command = _parse_op_msg(body)
+                reply = engine.execute(command.get("$db", "admin"), command)
+                if not flags & MORE_TO_COME:
+                    self._send(request_id, OP_MSG, struct.pack("<IB", 0, 0) + bson.encode(reply))
+            else:
+                return
+
+    def _send(self, response_to, opcode, payload):
+        header = _HEADER.pack(_HEADER.size + len(payload), 0, response_to, opcode)
+        self.request.sendall(header + payload)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeMongoServer:
+    """
+    mongod en memoria para las pruebas. start() lo levanta en un puerto libre
+    de localhost y devuelve la URI para MONGO_DB_HOST / settings HOST.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.engine = Engine()
+        self._server = _Server((host, port), _Handler)
+        self._server.engine = self.engine
+        self._thread = None
+
+    @property
+    def uri(self):
+        host, port = self._server.server_address[:2]
+        return f"mongodb://{host}:{port}/?directConnection=true"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-mongo", daemon=True)
+        self._thread.start()
+        return self.uri
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
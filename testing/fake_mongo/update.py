@@ -0,0 +1,261 @@
+import datetime
+
+from bson import Timestamp
+
+from .expressions import now
+from .pipeline import run, sort_docs
+from .query import is_operator_dict, match_field, match_values, matches
+from .values import (
+    MISSING, MongoError, SortKey, compare, get_path, hashable, is_number, number, set_path, unset_path,
+)
+
+
+# ==========================================
+# UPDATES (update, findAndModify)
+# ==========================================
+# apply(doc, update, ...) devuelve un documento nuevo; el original no se
+# toca. Soporta operadores ($set, $inc, $push, ...), el posicional "$",
+# "$[]" / "$[id]" con arrayFilters, updates con pipeline y reemplazos.
+
+def is_replacement(update):
+    return isinstance(update, dict) and not any(key.startswith("$") for key in update)
+
+
+def apply(doc, update, query=None, array_filters=None, inserting=False, database=None, variables=None):
+    if isinstance(update, list):
+        result = run([doc], update, database, variables)
+        return result[0]
+    if is_replacement(update):
+        new = dict(update)
+        if "_id" in doc:
+            new = {"_id": doc["_id"], **{key: value for key, value in new.items() if key != "_id"}}
+        return new
+    for operator, fields in update.items():
+        handler = OPERATORS.get(operator)
+        if handler is None:
+            raise MongoError(f"Unknown modifier: {operator}", code=9, code_name="FailedToParse")
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, argument in fields.items():
+            for concrete in _expand_path(doc, path, query, array_filters or []):
+                doc = handler(doc, concrete, argument, variables)
+    return doc
+
+
+# ------------------------------------------
+# Rutas: "$", "$[]", "$[id]"
+# ------------------------------------------
+
+def _positional_index(doc, array_path, query):
+    array = get_path(doc, array_path)
+    if not isinstance(array, list):
+        raise MongoError("The positional operator did not find the match needed from the query.", code=2)
+    relevant = {
+        key: condition for key, condition in (query or {}).items()
+        if key == array_path or key.startswith(array_path + ".")
+    }
+    for index, element in enumerate(array):
+        probe = set_path(doc, array_path, [element])
+        if all(match_field(probe, key, condition) for key, condition in relevant.items()):
+            return index
+    raise MongoError("The positional operator did not find the match needed from the query.", code=2)
+
+
+def _filter_matches(element, identifier, array_filters):
+    conditions = {}
+    for array_filter in array_filters:
+        for key, condition in array_filter.items():
+            head, _, rest = key.partition(".")
+            if head == identifier:
+                conditions[rest] = condition
+    if not conditions:
+        raise MongoError(f"No array filter found for identifier '{identifier}'", code=2)
+    for key, condition in conditions.items():
+        if key:
+            if not isinstance(element, dict) or not match_field(element, key, condition):
+                return False
+        elif not match_values([element], condition):
+            return False
+    return True
+
+
+def _expand_path(doc, path, query, array_filters):
+    parts = path.split(".")
+    for position, part in enumerate(parts):
+        if part == "$" or part.startswith("$["):
+            prefix = ".".join(parts[:position])
+            suffix = parts[position + 1:]
+            if part == "$":
+                indexes = [_positional_index(doc, prefix, query)]
+            else:
+                array = get_path(doc, prefix)
+                if not isinstance(array, list):
+                    return []
+                identifier = part[2:-1]
+                indexes = [
+                    index for index, element in enumerate(array)
+                    if not identifier or _filter_matches(element, identifier, array_filters)
+                ]
+            expanded = []
+            for index in indexes:
+                concrete = ".".join([*parts[:position], str(index), *suffix])
+                expanded.extend(_expand_path(doc, concrete, query, array_filters))
+            return expanded
+    return [path]
+
+
+# ------------------------------------------
+# Operadores
+# ------------------------------------------
+
+def _set(doc, path, value, variables):
+    return set_path(doc, path, value)
+
+
+def _unset(doc, path, value, variables):
+    return unset_path(doc, path)
+
+
+def _numeric(operator, function):
+    def handler(doc, path, value, variables):
+        if not is_number(value):
+            raise MongoError(f"Cannot {operator} with non-numeric argument", code=14, code_name="TypeMismatch")
+        current = get_path(doc, path)
+        if current is MISSING:
+            current = 0
+        elif not is_number(current):
+            raise MongoError(f"Cannot apply {operator} to a value of non-numeric type", code=14, code_name="TypeMismatch")
+        return set_path(doc, path, function(number(current), number(value)))
+    return handler
+
+
+def _extreme(sign):
+    def handler(doc, path, value, variables):
+        current = get_path(doc, path)
+        if current is MISSING or compare(value, current) * sign > 0:
+            return set_path(doc, path, value)
+        return doc
+    return handler
+
+
+def _rename(doc, path, target, variables):
+    value = get_path(doc, path)
+    if value is MISSING:
+        return doc
+    return set_path(unset_path(doc, path), target, value)
+
+
+def _current_date(doc, path, value, variables):
+    stamp = (variables or {}).get("NOW") or now()
+    if isinstance(value, dict) and value.get("$type") == "timestamp":
+        return set_path(doc, path, Timestamp(int(stamp.replace(tzinfo=datetime.timezone.utc).timestamp()), 1))
+    return set_path(doc, path, stamp)
+
+
+def _array_at(doc, path):
+    current = get_path(doc, path)
+    if current is MISSING or current is None:
+        return []
+    if not isinstance(current, list):
+        raise MongoError(f"The field '{path}' must be an array", code=2)
+    return list(current)
+
+
+def _push(doc, path, value, variables):
+    array = _array_at(doc, path)
+    if isinstance(value, dict) and "$each" in value:
+        items = list(value["$each"])
+        position = value.get("$position")
+        if position is None:
+            array.extend(items)
+        else:
+            array[position:position] = items
+        if "$sort" in value:
+            spec = value["$sort"]
+            if isinstance(spec, dict):
+                array = sort_docs(array, spec)
+            else:
+                array.sort(key=SortKey, reverse=spec < 0)
+        if "$slice" in value:
+            limit = value["$slice"]
+            array = array[:limit] if limit >= 0 else array[limit:]
+    else:
+        array.append(value)
+    return set_path(doc, path, array)
+
+
+def _add_to_set(doc, path, value, variables):
+    array = _array_at(doc, path)
+    items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+    keys = {hashable(item) for item in array}
+    for item in items:
+        if hashable(item) not in keys:
+            keys.add(hashable(item))
+            array.append(item)
+    return set_path(doc, path, array)
+
+
+def _pull(doc, path, condition, variables):
+    array = get_path(doc, path)
+    if not isinstance(array, list):
+        return doc
+
+    def removed(element):
+        if is_operator_dict(condition):
+            return match_values([element], condition)
+        if isinstance(condition, dict) and isinstance(element, dict):
+            return matches(element, condition)
+        return compare(element, condition) == 0
+
+    return set_path(doc, path, [element for element in array if not removed(element)])
+
+
+def _pull_all(doc, path, values, variables):
+    array = get_path(doc, path)
+    if not isinstance(array, list):
+        return doc
+    keys = {hashable(value) for value in values}
+    return set_path(doc, path, [element for element in array if hashable(element) not in keys])
+
+
+def _pop(doc, path, value, variables):
+    array = get_path(doc, path)
+    if not isinstance(array, list) or not array:
+        return doc
+    return set_path(doc, path, array[1:] if value < 0 else array[:-1])
+
+
+OPERATORS = {
+    "$set": _set,
+    "$setOnInsert": _set,
+    "$unset": _unset,
+    "$inc": _numeric("increment", lambda current, value: current + value),
+    "$mul": _numeric("multiply", lambda current, value: current * value),
+    "$min": _extreme(-1),
+    "$max": _extreme(1),
+    "$rename": _rename,
+    "$currentDate": _current_date,
+    "$push": _push,
+    "$addToSet": _add_to_set,
+    "$pull": _pull,
+    "$pullAll": _pull_all,
+    "$pop": _pop,
+}
+
+
+def upsert_seed(query):
+    """Documento base de un upsert: los campos de igualdad del filtro."""
+    doc = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for part in condition:
+                for path, value in upsert_seed(part).items():
+                    doc = set_path(doc, path, value)
+        elif key.startswith("$"):
+            continue
+        elif is_operator_dict(condition):
+            if "$eq" in condition:
+                doc = set_path(doc, key, condition["$eq"])
+        else:
+            doc = set_path(doc, key, condition)
+    return doc
@@ -0,0 +1,348 @@
+import datetime
+import re
+
+from bson import Decimal128, Int64, ObjectId, Regex
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.timestamp import Timestamp
+
+
+# ==========================================
+# VALORES BSON: ORDEN, TIPOS Y RUTAS
+# ==========================================
+# Reglas de comparación de MongoDB: primero el "bracket" del tipo
+# (null < números < strings < objetos < arrays < ... < fechas) y luego el
+# valor. Los campos ausentes se representan con MISSING.
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+
+MISSING = _Missing()
+
+
+class MongoError(Exception):
+    """Error de comando: el servidor lo responde con ok: 0."""
+
+    def __init__(self, message, code=2, code_name="BadValue"):
+        super().__init__(message)
+        self.code = code
+        self.code_name = code_name
+
+
+def is_number(value):
+    return isinstance(value, (int, float, Decimal128)) and not isinstance(value, bool)
+
+
+def number(value):
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    return value
+
+
+def bracket(value):
+    if value is MISSING:
+        return 0
+    if isinstance(value, MinKey):
+        return 1
+    if value is None:
+        return 2
+    if is_number(value):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, dict):
+        return 5
+    if isinstance(value, (list, tuple)):
+        return 6
+    if isinstance(value, (bytes, bytearray)):
+        return 7
+    if isinstance(value, ObjectId):
+        return 8
+    if isinstance(value, bool):
+        return 9
+    if isinstance(value, datetime.datetime):
+        return 10
+    if isinstance(value, Timestamp):
+        return 11
+    if isinstance(value, (Regex, re.Pattern)):
+        return 12
+    if isinstance(value, MaxKey):
+        return 13
+    return 14
+
+
+def _cmp(a, b):
+    return (a > b) - (a < b)
+
+
+def naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def compare(a, b):
+    """-1, 0 o 1 con el orden total de BSON."""
+    ba, bb = bracket(a), bracket(b)
+    if ba != bb:
+        return _cmp(ba, bb)
+    if ba in (0, 1, 2, 13):
+        return 0
+    if ba == 3:
+        return _cmp(number(a), number(b))
+    if ba == 5:
+        items_a, items_b = list(a.items()), list(b.items())
+        for (ka, va), (kb, vb) in zip(items_a, items_b):
+            result = _cmp(bracket(va), bracket(vb)) or _cmp(ka, kb) or compare(va, vb)
+            if result:
+                return result
+        return _cmp(len(items_a), len(items_b))
+    if ba == 6:
+        for va, vb in zip(a, b):
+            result = compare(va, vb)
+            if result:
+                return result
+        return _cmp(len(a), len(b))
+    if ba == 8:
+        return _cmp(a.binary, b.binary)
+    if ba == 10:
+        return _cmp(naive_utc(a), naive_utc(b))
+    if ba == 11:
+        return _cmp((a.time, a.inc), (b.time, b.inc))
+    if ba == 12:
+        return _cmp(a.pattern, b.pattern)
+    return _cmp(a, b)
+
+
+def equal(a, b):
+    return compare(a, b) == 0
+
+
+class SortKey:
+    """Envoltorio para ordenar con sorted() usando compare()."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return compare(self.value, other.value) < 0
+
+    def __eq__(self, other):
+        return compare(self.value, other.value) == 0
+
+
+def hashable(value):
+    """Clave hashable con la misma igualdad que compare() (para $group, índices)."""
+    if is_number(value):
+        value = number(value)
+        return (3, float(value))
+    if isinstance(value, dict):
+        return (5, tuple((key, hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (6, tuple(hashable(item) for item in value))
+    if isinstance(value, datetime.datetime):
+        return (10, naive_utc(value))
+    if isinstance(value, Regex):
+        return (12, value.pattern, value.flags)
+    if isinstance(value, re.Pattern):
+        return (12, value.pattern, value.flags)
+    if value is MISSING:
+        return (2, None)
+    return (bracket(value), value)
+
+
+# ------------------------------------------
+# Tipos ($type)
+# ------------------------------------------
+
+TYPE_ALIASES = {
+    1: "double", 2: "string", 3: "object", 4: "array", 5: "binData", 6: "undefined", 7: "objectId",
+    8: "bool", 9: "date", 10: "null", 11: "regex", 16: "int", 17: "timestamp", 18: "long",
+    19: "decimal", -1: "minKey", 127: "maxKey",
+}
+
+
+def type_name(value):
+    if value is MISSING:
+        return "missing"
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, Int64):
+        return "long"
+    if isinstance(value, int):
+        return "int" if -2**31 <= value < 2**31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, (bytes, bytearray)):
+        return "binData"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime.datetime):
+        return "date"
+    if isinstance(value, Timestamp):
+        return "timestamp"
+    if isinstance(value, (Regex, re.Pattern)):
+        return "regex"
+    if isinstance(value, MinKey):
+        return "minKey"
+    if isinstance(value, MaxKey):
+        return "maxKey"
+    return "unknown"
+
+
+def type_matches(value, wanted):
+    wanted = TYPE_ALIASES.get(wanted, wanted)
+    if wanted == "number":
+        return is_number(value)
+    return type_name(value) == wanted
+
+
+def truthy(value):
+    if value is MISSING or value is None or value is False:
+        return False
+    if is_number(value):
+        return number(value) != 0
+    return True
+
+
+# ------------------------------------------
+# Regex
+# ------------------------------------------
+
+_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+
+
+def compile_regex(pattern, options=""):
+    if isinstance(pattern, re.Pattern):
+        flags = pattern.flags
+        pattern = pattern.pattern
+    elif isinstance(pattern, Regex):
+        flags = pattern.flags
+        pattern = pattern.pattern
+    else:
+        flags = 0
+    for option in options or "":
+        flags |= _FLAGS.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def is_regex(value):
+    return isinstance(value, (Regex, re.Pattern))
+
+
+# ------------------------------------------
+# Rutas con puntos
+# ------------------------------------------
+
+def get_path(value, path):
+    """Valor en `path` con la semántica de las expresiones ("$a.b" sobre arrays)."""
+    parts = path.split(".") if isinstance(path, str) else path
+    for i, part in enumerate(parts):
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list):
+            found = []
+            for item in value:
+                if isinstance(item, (dict, list)):
+                    result = get_path(item, parts[i:])
+                    if result is not MISSING:
+                        found.append(result)
+            return found
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def traverse(value, parts):
+    """
+    Valores candidatos de una ruta para las consultas: recorre los arrays de
+    subdocumentos y admite índices numéricos. Produce MISSING donde la ruta
+    no existe.
+    """
+    if not parts:
+        yield value
+        return
+    head, rest = parts[0], parts[1:]
+    if isinstance(value, dict):
+        if head in value:
+            yield from traverse(value[head], rest)
+        else:
+            yield MISSING
+    elif isinstance(value, list):
+        if head.isdigit() and int(head) < len(value):
+            yield from traverse(value[int(head)], rest)
+        found = False
+        for item in value:
+            if isinstance(item, dict):
+                found = True
+                yield from traverse(item, parts)
+        if not found and not head.isdigit():
+            yield MISSING
+    else:
+        yield MISSING
+
+
+def set_path(doc, path, value):
+    """Copia de `doc` con `value` en `path` (crea los subdocumentos que falten)."""
+    parts = path.split(".")
+    return _set(doc, parts, value)
+
+
+def _set(container, parts, value):
+    head, rest = parts[0], parts[1:]
+    if isinstance(container, list) and head.isdigit():
+        index = int(head)
+        new = list(container)
+        while len(new) <= index:
+            new.append(None)
+        new[index] = _set(new[index] if isinstance(new[index], (dict, list)) else {}, rest, value) if rest else value
+        return new
+    new = dict(container) if isinstance(container, dict) else {}
+    if rest:
+        current = new.get(head)
+        new[head] = _set(current if isinstance(current, (dict, list)) else {}, rest, value)
+    else:
+        new[head] = value
+    return new
+
+
+def unset_path(doc, path):
+    parts = path.split(".")
+    return _unset(doc, parts)
+
+
+def _unset(container, parts):
+    head, rest = parts[0], parts[1:]
+    if isinstance(container, list):
+        if head.isdigit() and int(head) < len(container):
+            new = list(container)
+            new[int(head)] = None if not rest else _unset(new[int(head)], rest)
+            return new
+        return container
+    if not isinstance(container, dict) or head not in container:
+        return container
+    new = dict(container)
+    if rest:
+        new[head] = _unset(new[head], rest)
+    else:
+        del new[head]
+    return new
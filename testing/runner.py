@@ -0,0 +1,81 @@
+import logging
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .fake_mongo import FakeMongoServer
+
+
+# ==========================================
+# RUNNER DE PRUEBAS
+# ==========================================
+# La referencia es un mongod real: MONGO_TEST_HOST=mongodb://... (el runner
+# crea y borra la base test_<NAME> como siempre). Es lo que debe correr en
+# CI, porque los pipelines de la app ($merge, $bucketAuto, updates con
+# pipeline, collMod) solo se validan de verdad contra el servidor.
+#
+# Sin MONGO_TEST_HOST, como alternativa para desarrollo sin mongod, se usa
+# testing.fake_mongo: un servidor del protocolo de MongoDB en memoria que se
+# levanta en un puerto libre de localhost y se apaga al terminar.
+#
+# Los cachés de versiones y de fragmentos pasan a locmem durante las
+# pruebas: con los de archivo, bump() y clear() tocarían el caché compartido
+# del entorno de desarrollo (cache/versiones, cache/fragmentos). El log
+# por request (core.requests) queda en WARNING aunque REQUEST_LOG esté
+# encendido en el entorno.
+
+DEFAULT_NAME = "catequesis"
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+
+
+def test_caches():
+    return {
+        **settings.CACHES,
+        "versions": {"BACKEND": LOCMEM, "LOCATION": "test-versiones"},
+        "fragments": {"BACKEND": LOCMEM, "LOCATION": "test-fragmentos"},
+    }
+
+
+class MongoTestRunner(DiscoverRunner):
+    server = None
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Un solo proceso: un caché de versiones por proceso es correcto aquí
+        self._settings = override_settings(
+            CACHES=test_caches(),
+            SILENCED_SYSTEM_CHECKS=[*settings.SILENCED_SYSTEM_CHECKS, "core.E001"],
+        )
+        self._settings.enable()
+        self._request_log = logging.getLogger("core.requests")
+        self._request_log_level = self._request_log.level
+        self._request_log.setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs):
+        self._request_log.setLevel(self._request_log_level)
+        self._settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        host = os.getenv("MONGO_TEST_HOST")
+        if not host:
+            self.server = FakeMongoServer()
+            host = self.server.start()
+            self.log("MONGO_TEST_HOST no definido: se usa testing.fake_mongo (en CI usar un mongod real).")
+        for alias in connections:
+            settings_dict = connections[alias].settings_dict
+            settings_dict["HOST"] = host
+            settings_dict["NAME"] = settings_dict.get("NAME") or DEFAULT_NAME
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        try:
+            super().teardown_databases(old_config, **kwargs)
+        finally:
+            if self.server is not None:
+                connections.close_all()
+                self.server.stop()